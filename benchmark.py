@@ -0,0 +1,535 @@
+# --- 표준 라이브러리 임포트 ---
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+# --------------------------------------------------------------------------
+# 벤치마크 설정 상수
+# --------------------------------------------------------------------------
+MAIN_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+DEFAULT_SEED: int = 1234 # 서버 난수 시드 (같은 시드 → 같은 워크로드 결과)
+DEFAULT_REQUESTS: int = 2000 # 워크로드당 요청 수
+DEFAULT_THRESHOLD_PCT: float = 10.0 # 기준 결과 대비 이 비율 이상 나빠지면 회귀로 표시
+RESPONSE_TIMEOUT_SEC: float = 120.0 # 모든 응답을 기다리는 최대 시간
+SHUTDOWN_ROUNDS: int = 5 # shutdown 워크로드 반복 횟수
+METRICS_ROUNDS: int = 5 # metrics_overhead 워크로드 반복 횟수 (메트릭 켬/끔 번갈아)
+CONTENTION_THREADS: int = 16 # contention 워크로드에서 한 세션의 execute_tool을 동시에 부르는 스레드 수
+CONTENTION_TARGET_REDUCTION: float = 10.0 # 이전 방식 대비 Lock 보유 시간 감소 목표 (배, 못 미치면 경고)
+READY_ID: str = "__bench_ready__" # 서버 준비 확인용 요청 id
+BENCH_SESSIONS: int = 256 # basic/advanced 요청을 나눠 보낼 세션 수 (한 세션에 경계가 쌓여 페널티만 측정되지 않도록)
+READ_BUFFER_BYTES: int = 1 << 16 # 서버 응답을 읽는 버퍼 크기
+STATUS_POLL_SEC: float = 0.05 # 페널티 대기 응답 수 확인 간격
+PENALTY_LABEL: str = "<penalty>" # 페널티 지연이 붙은 응답의 라벨
+PENALTY_MARK: str = "초 지연됨)" # 페널티 응답 텍스트에 붙는 표시
+PENALTY_TIME_SCALE: int = 100 # boss_penalty_scaled 워크로드의 서버 시간 배율
+HALF_CLOSE_CALLS: int = 20 # half_close 워크로드에서 연결 하나로 파이프라이닝하는 도구 호출 수
+
+BASIC_TOOLS: List[str] = ["take_a_break", "watch_netflix", "show_meme"]
+ADVANCED_TOOLS: List[str] = ["deep_thinking", "email_organizing", "bathroom_break", "coffee_mission",
+                             "urgent_call", "chicken_and_beer", "leave_work_now", "company_dinner"]
+MALFORMED_LINES: List[Tuple[str, str]] = [ # (라벨, 요청 줄) - id가 없는 줄은 응답 순서로 매칭
+    ("<invalid_json>", "this is not json"),
+    ("<non_object>", "[1, 2, 3]"),
+    ("<missing_method>", '{"id": %d}'),
+    ("<unknown_tool>", '{"id": %d, "method": "no_such_tool"}'),
+]
+
+# --------------------------------------------------------------------------
+# 워크로드 정의: (서버 추가 인자, [(라벨, 요청 줄)], 페널티 응답을 실제로 기다릴지)
+# - basic/advanced/malformed: 돌발 이벤트로 생긴 페널티 응답은 나머지가 끝나면 shutdown으로 즉시 받음
+# - boss_penalty: 페널티 지연(20초)까지 그대로 측정
+# - boss_penalty_scaled: 같은 요청을 서버 시계 100배속(--time_scale)으로 (페널티 지연 0.2초)
+# --------------------------------------------------------------------------
+
+def _tool_requests(tools: List[str], n: int, sessions: int = 1) -> List[Tuple[str, str]]:
+    requests = []
+    for i in range(n):
+        request = {"id": i, "method": tools[i % len(tools)]}
+        if sessions > 1: request["session_id"] = f"bench-{i % sessions}"
+        requests.append((request["method"], json.dumps(request)))
+    return requests
+
+# MCP 클라이언트 패턴: tools/list 폴링과 tools/call을 번갈아 (JSON-RPC 2.0)
+def _mcp_requests(tools: List[str], n: int, sessions: int) -> List[Tuple[str, str]]:
+    requests = []
+    for i in range(n):
+        if i % 2 == 0:
+            request = {"jsonrpc": "2.0", "id": i, "method": "tools/list"}
+        else:
+            request = {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                       "params": {"name": tools[i % len(tools)], "arguments": {"session_id": f"bench-{i % sessions}"}}}
+        requests.append((request["method"], json.dumps(request)))
+    return requests
+
+def _malformed_requests(n: int) -> List[Tuple[str, str]]:
+    requests = []
+    for i in range(n):
+        label, line = MALFORMED_LINES[i % len(MALFORMED_LINES)]
+        requests.append((label, line % i if "%d" in line else line))
+    return requests
+
+WORKLOADS: Dict[str, Any] = {
+    "basic": lambda n: (["--boss_alertness", "0"], _tool_requests(BASIC_TOOLS, n, BENCH_SESSIONS), False),
+    "advanced": lambda n: (["--boss_alertness", "0"], _tool_requests(ADVANCED_TOOLS, n, BENCH_SESSIONS), False),
+    # 경계 증가 확률 100%: 몇 번 만에 경계 최대 → 이후 요청은 모두 페널티 지연 응답
+    "boss_penalty": lambda n: (["--boss_alertness", "100"], _tool_requests(BASIC_TOOLS + ADVANCED_TOOLS, min(n, 200)), True),
+    "boss_penalty_scaled": lambda n: (["--boss_alertness", "100", "--time_scale", str(PENALTY_TIME_SCALE)],
+                                      _tool_requests(BASIC_TOOLS + ADVANCED_TOOLS, min(n, 200)), True),
+    "malformed": lambda n: ([], _malformed_requests(n), False),
+    "mcp": lambda n: (["--boss_alertness", "0"], _mcp_requests(BASIC_TOOLS, n, BENCH_SESSIONS), False),
+}
+# 메트릭 수집 비용: basic 워크로드를 메트릭 켬/끔으로 번갈아 실행해 처리량 비교
+WORKLOADS["basic_no_metrics"] = lambda n: (["--boss_alertness", "0", "--no_metrics"], _tool_requests(BASIC_TOOLS, n, BENCH_SESSIONS), False)
+ALL_WORKLOADS: List[str] = [name for name in WORKLOADS if name != "basic_no_metrics"] + ["metrics_overhead", "contention", "shared_contention", "half_close", "shutdown"]
+
+# --------------------------------------------------------------------------
+# 통계 헬퍼
+# --------------------------------------------------------------------------
+
+# 최근접 순위 백분위수
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values: return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def latency_stats(values_sec: List[float]) -> Dict[str, float]:
+    ms = sorted(v * 1000.0 for v in values_sec)
+    return {"count": len(ms), "p50": round(percentile(ms, 50), 3), "p95": round(percentile(ms, 95), 3),
+            "p99": round(percentile(ms, 99), 3), "max": round(ms[-1], 3) if ms else 0.0}
+
+# --------------------------------------------------------------------------
+# 서버 프로세스 제어
+# --------------------------------------------------------------------------
+
+class ServerProcess:
+    # main.py를 서브프로세스로 띄우고 응답을 id별 수신 시각과 함께 수집
+    def __init__(self, python: str, seed: int, extra_args: List[str]):
+        self.spawned_at = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [python, MAIN_PATH, "--ui", "off", "--seed", str(seed), "--policy_workers", "0", *extra_args], # 정책 표 백그라운드 계산이 CPU를 나눠 쓰지 않도록
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+        )
+        self.received: Dict[Any, float] = {} # id → 수신 시각
+        self.penalized: set = set() # 페널티 지연 응답의 id
+        self.texts: Dict[Any, str] = {} # 벤치마크 내부 요청(__bench*)의 응답 텍스트
+        self._probe_seq = 0
+        self.anonymous: deque = deque() # id 없는 응답 수신 시각 (순서대로)
+        self.cond = threading.Condition()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self) -> None:
+        # stdout은 bufsize=0(버퍼 없음)이라 그대로 줄 단위로 읽으면 1바이트씩 읽게 됨 → 버퍼를 씌워 읽음
+        for raw in io.BufferedReader(self.proc.stdout, READ_BUFFER_BYTES):
+            now = time.perf_counter()
+            try:
+                data = json.loads(raw)
+                request_id = data.get("id")
+            except (ValueError, AttributeError):
+                data, request_id = None, None
+            try: # 기존 형식은 최상위, JSON-RPC는 result 안에 content
+                text = data.get("result", data)["content"][0]["text"]
+            except (AttributeError, KeyError, IndexError, TypeError):
+                text = ""
+            with self.cond:
+                if request_id is None: self.anonymous.append(now)
+                else: self.received[request_id] = now
+                if PENALTY_MARK in text: self.penalized.add(request_id)
+                if isinstance(request_id, str) and request_id.startswith("__bench"): self.texts[request_id] = text
+                self.cond.notify_all()
+
+    def send(self, lines: List[str]) -> None:
+        self.proc.stdin.write("".join(line + "\n" for line in lines).encode("utf-8"))
+        self.proc.stdin.flush()
+
+    # 조건을 만족할 때까지 응답 대기
+    def wait_for(self, predicate: Any, timeout: float = RESPONSE_TIMEOUT_SEC) -> bool:
+        with self.cond:
+            return self.cond.wait_for(predicate, timeout)
+
+    # 준비 확인: status 요청의 응답이 올 때까지 (시작 시간 측정)
+    def wait_ready(self) -> float:
+        self.send([json.dumps({"id": READY_ID, "method": "status"})])
+        if not self.wait_for(lambda: READY_ID in self.received):
+            raise RuntimeError("서버가 준비되지 않음 (status 응답 없음)")
+        return self.received.pop(READY_ID) - self.spawned_at
+
+    # 서버에서 타이머 대기 중인 페널티 응답 수 (status 요청)
+    def pending_penalties(self) -> int:
+        self._probe_seq += 1
+        probe_id = f"__bench_status_{self._probe_seq}"
+        self.send([json.dumps({"id": probe_id, "method": "status"})])
+        if not self.wait_for(lambda: probe_id in self.texts):
+            raise RuntimeError("status 응답 없음")
+        self.received.pop(probe_id, None)
+        for line in self.texts.pop(probe_id).splitlines():
+            if line.startswith("Pending Penalties:"):
+                return int(line.split(":", 1)[1])
+        return 0
+
+    # shutdown 전송 후 종료까지 걸린 시간
+    def shutdown(self) -> float:
+        started = time.perf_counter()
+        try:
+            self.send([json.dumps({"method": "shutdown"})])
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.proc.wait(timeout=RESPONSE_TIMEOUT_SEC)
+        return time.perf_counter() - started
+
+# --------------------------------------------------------------------------
+# 워크로드 실행
+# --------------------------------------------------------------------------
+
+# 요청을 한꺼번에 파이프라이닝으로 보내고 요청별 지연 시간 측정
+def run_workload(name: str, python: str, seed: int, n: int) -> Dict[str, Any]:
+    extra_args, requests, wait_penalties = WORKLOADS[name](n)
+    server = ServerProcess(python, seed, extra_args)
+    startup_sec = server.wait_ready()
+
+    labels: Dict[Any, str] = {}
+    anonymous_labels: List[str] = []
+    lines = []
+    for label, line in requests:
+        try:
+            request_id = json.loads(line).get("id")
+        except (ValueError, AttributeError):
+            request_id = None
+        if request_id is None: anonymous_labels.append(label)
+        else: labels[request_id] = label
+        lines.append(line)
+
+    def all_received() -> bool:
+        return len(server.received) >= len(labels) and len(server.anonymous) >= len(anonymous_labels)
+
+    started = time.perf_counter()
+    server.send(lines)
+    if wait_penalties:
+        complete = server.wait_for(all_received)
+    else: # 페널티 대기 응답만 남으면 더 기다리지 않음 (shutdown 시 즉시 전송됨)
+        deadline = started + RESPONSE_TIMEOUT_SEC
+        while True:
+            received = len(server.received) + len(server.anonymous)
+            if received >= len(requests) or received + server.pending_penalties() >= len(requests): break
+            if time.perf_counter() > deadline: break
+            time.sleep(STATUS_POLL_SEC)
+    finished = time.perf_counter()
+    shutdown_sec = server.shutdown()
+    if not wait_penalties:
+        complete = server.wait_for(all_received, timeout=1.0)
+
+    # 파이프라이닝 전송이므로 지연 시간 = 전송 시작 ~ 응답 수신
+    per_label: Dict[str, List[float]] = {}
+    for request_id, label in labels.items():
+        if request_id in server.received:
+            if request_id in server.penalized: # 페널티 응답은 도구별 통계와 분리
+                if not wait_penalties: continue # shutdown으로 앞당겨 받은 응답은 지연 통계에서 제외
+                label = PENALTY_LABEL
+            per_label.setdefault(label, []).append(server.received[request_id] - started)
+    for label, received_at in zip(anonymous_labels, server.anonymous):
+        per_label.setdefault(label, []).append(received_at - started)
+    all_latencies = [v for values in per_label.values() for v in values]
+    last_response = max(all_latencies, default=0.0)
+    penalized = len(server.penalized & set(labels))
+
+    return {
+        "requests": len(requests), "responses": len(all_latencies) + (0 if wait_penalties else penalized),
+        "penalized": penalized, "complete": complete,
+        "elapsed_sec": round(finished - started, 4),
+        "rps": round(len(all_latencies) / last_response, 1) if last_response > 0 else 0.0,
+        "startup_sec": round(startup_sec, 4), "shutdown_sec": round(shutdown_sec, 4),
+        "latency_ms": {"all": latency_stats(all_latencies), **{k: latency_stats(v) for k, v in sorted(per_label.items())}},
+    }
+
+# 시작/종료만 반복 측정
+def run_shutdown_workload(python: str, seed: int) -> Dict[str, Any]:
+    startups, shutdowns = [], []
+    for _ in range(SHUTDOWN_ROUNDS):
+        server = ServerProcess(python, seed, [])
+        startups.append(server.wait_ready())
+        shutdowns.append(server.shutdown())
+    return {"rounds": SHUTDOWN_ROUNDS, "startup_ms": latency_stats(startups), "shutdown_ms": latency_stats(shutdowns)}
+
+# 소켓 연결 종료 시 응답 유실 확인: 요청을 파이프라이닝한 뒤
+# 1) 쓰기 방향만 닫거나 (SHUT_WR, 반쯤 닫힘) 2) 그 연결에서 shutdown을 보내도, 보낸 요청의 응답을 모두 받고 EOF가 와야 함
+# 2)는 경계 100%로 페널티 지연 응답을 만들어, 연결 종료 시 대기 중인 페널티 응답도 바로 오는지 확인
+def run_half_close_workload(python: str, seed: int) -> Dict[str, Any]:
+    socket_dir = tempfile.mkdtemp(prefix="chillmcp-bench-")
+    socket_path = os.path.join(socket_dir, "chill.sock")
+    server = ServerProcess(python, seed, ["--socket", socket_path, "--boss_alertness", "100"])
+    server.wait_ready()
+
+    def exchange(lines: List[str], half_close: bool) -> Tuple[int, float]:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(RESPONSE_TIMEOUT_SEC)
+        client.connect(socket_path)
+        started = time.perf_counter()
+        client.sendall("".join(line + "\n" for line in lines).encode("utf-8"))
+        if half_close: client.shutdown(socket.SHUT_WR)
+        data = b""
+        while True: # 서버가 연결을 닫을 때까지
+            chunk = client.recv(READ_BUFFER_BYTES)
+            if not chunk: break
+            data += chunk
+        client.close()
+        return len(data.splitlines()), time.perf_counter() - started
+
+    try:
+        calls = [json.dumps({"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                             "params": {"name": BASIC_TOOLS[i % len(BASIC_TOOLS)], "arguments": {}, "session_id": f"half-{i}"}})
+                 for i in range(HALF_CLOSE_CALLS)]
+        half_closed, half_close_sec = exchange(calls, half_close=True)
+        penalty_calls = [json.dumps({"id": i, "method": "take_a_break", "session_id": "half-penalty"}) for i in range(HALF_CLOSE_CALLS)]
+        shut_down, shutdown_sec = exchange(penalty_calls + [json.dumps({"method": "shutdown"})], half_close=False)
+    finally:
+        server.shutdown()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+    return {"requests": 2 * HALF_CLOSE_CALLS, "half_close_responses": half_closed, "shutdown_responses": shut_down,
+            "half_close_ms": round(half_close_sec * 1000, 2), "shutdown_ms": round(shutdown_sec * 1000, 2),
+            "complete": half_closed == HALF_CLOSE_CALLS and shut_down == HALF_CLOSE_CALLS}
+
+# 요청 하나당 메트릭 기록 비용 (프로세스 안에서 직접 측정, 서브프로세스 처리량보다 잡음이 적음)
+def metrics_cost_ns(rounds: int = 100000) -> float:
+    sys.path.insert(0, os.path.dirname(MAIN_PATH))
+    import main as chill
+    recorder = chill.Metrics()
+    outcomes = [{"error": False, "tool_name": "take_a_break", "tool_succeeded": True, "delay_applied": False, "event": None}]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        recorder.observe_lock(1e-6, 2e-6)
+        recorder.record_outcomes(outcomes)
+        recorder.observe_latency(outcomes, started)
+    return (time.perf_counter() - started) / rounds * 1e9
+
+# 메트릭 켬/끔 처리량 비교 (중앙값)
+def run_metrics_overhead_workload(python: str, seed: int, n: int) -> Dict[str, Any]:
+    rps_on, rps_off, p50_on, p50_off = [], [], [], []
+    for _ in range(METRICS_ROUNDS):
+        on = run_workload("basic", python, seed, n)
+        off = run_workload("basic_no_metrics", python, seed, n)
+        rps_on.append(on["rps"]); p50_on.append(on["latency_ms"]["all"]["p50"])
+        rps_off.append(off["rps"]); p50_off.append(off["latency_ms"]["all"]["p50"])
+    median = lambda values: sorted(values)[len(values) // 2]
+    on_rps, off_rps = median(rps_on), median(rps_off)
+    return {"rounds": METRICS_ROUNDS, "rps_on": on_rps, "rps_off": off_rps,
+            "p50_ms_on": median(p50_on), "p50_ms_off": median(p50_off),
+            "overhead_pct": round((off_rps - on_rps) / off_rps * 100.0, 2) if off_rps > 0 else 0.0,
+            "record_ns_per_request": round(metrics_cost_ns(), 1)}
+
+# 기준선: 낙관적 갱신 이전 방식 (확률 판정, 상태 계산, 응답 생성을 모두 상태 Lock 안에서)
+def _locked_execute_tool(chill: Any, state: Any, tool_name: str) -> Dict[str, Any]:
+    spec = chill.TOOL_REGISTRY.get(tool_name)
+    requested = time.perf_counter()
+    with state.lock:
+        acquired = time.perf_counter()
+        all_rolls = [chill.draw_rolls(spec, state.boss_alertness_prob)]
+        plan = state._plan([tool_name], all_rolls, chill.clock.now())
+        state._commit_locked([tool_name], all_rolls, plan)
+        if state.history is not None: state.history.drain() # 이전 방식은 상태 기록도 Lock 안에서
+        outcome = state._build_outcome(tool_name, spec, plan[-1][0])
+        released = time.perf_counter()
+    chill.metrics.observe_lock(acquired - requested, released - acquired)
+    chill.ui.outcome(outcome) # execute_tool과 같은 렌더링 요청 (렌더링 끔이면 버림)
+    return outcome["response"]
+
+# 상태 Lock 경합: 스레드 여러 개가 같은 세션의 execute_tool을 동시에 호출 (프로세스 안, 렌더링 끔)
+# shared=True면 경계/스트레스를 임시 공유 상태 파일(--shared_state --shared_stress)에 두고 측정 (lockf + seqlock 비용)
+# baseline=True면 execute_tool 대신 모든 계산을 Lock 안에서 하는 이전 방식으로 측정 (보유 시간 비교용)
+def run_contention_workload(seed: int, n: int, threads: int = CONTENTION_THREADS, shared: bool = False,
+                            baseline: bool = False) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.dirname(MAIN_PATH))
+    import main as chill
+    chill.set_ui_mode("off")
+    chill.random.seed(seed)
+    chill.metrics = chill.Metrics()
+    if shared:
+        shared_dir = tempfile.mkdtemp(prefix="chillmcp-bench-")
+        chill.shared_state = chill.SharedState(os.path.join(shared_dir, "shared.state"), share_stress=True)
+    state = chill.AgentState(0, 3600, "bench-contention") # 경계 증가 없음 → 페널티 없이 상태 갱신만 측정
+    per_thread = max(1, n // threads)
+    barrier = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for i in range(per_thread):
+            if baseline: _locked_execute_tool(chill, state, BASIC_TOOLS[i % len(BASIC_TOOLS)])
+            else: state.execute_tool(BASIC_TOOLS[i % len(BASIC_TOOLS)])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers: t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in workers: t.join()
+    elapsed = time.perf_counter() - started
+    if shared:
+        chill.shared_state.close()
+        chill.shared_state = None
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    hold, wait = chill.metrics.lock_hold, chill.metrics.lock_wait
+    to_us = lambda seconds: round(seconds * 1e6, 3)
+    return {"threads": threads, "calls": threads * per_thread, "elapsed_sec": round(elapsed, 4),
+            "calls_per_sec": round(threads * per_thread / elapsed, 1) if elapsed > 0 else 0.0,
+            "lock_hold_us": {"mean": to_us(hold.total / max(1, hold.count)), "p50": to_us(hold.quantile(0.5)), "p99": to_us(hold.quantile(0.99))},
+            "lock_wait_us": {"mean": to_us(wait.total / max(1, wait.count)), "p50": to_us(wait.quantile(0.5)), "p99": to_us(wait.quantile(0.99))},
+            "retries": chill.metrics.state_retries}
+
+# contention: 현재 방식 + 이전 방식(기준선)을 같은 조건으로 돌려 Lock 보유 시간 비율 계산
+# 스레드 1개 처리량도 함께 측정: GIL 아래에서는 한 번에 한 스레드만 돌므로 calls/s는 호출당 CPU 시간에 묶이고,
+# 여러 스레드에서 현재 방식이 더 느리다면 보유 시간이 아니라 GIL 전환/version 충돌 재계산 비용
+def run_contention_comparison(seed: int, n: int) -> Dict[str, Any]:
+    result = run_contention_workload(seed, n)
+    before = run_contention_workload(seed, n, baseline=True)
+    result["baseline"] = before
+    after_hold, before_hold = result["lock_hold_us"]["mean"], before["lock_hold_us"]["mean"]
+    result["hold_reduction"] = round(before_hold / after_hold, 2) if after_hold > 0 else 0.0
+    result["single_thread_calls_per_sec"] = run_contention_workload(seed, n // 2, threads=1)["calls_per_sec"]
+    before["single_thread_calls_per_sec"] = run_contention_workload(seed, n // 2, threads=1, baseline=True)["calls_per_sec"]
+    if result["hold_reduction"] < CONTENTION_TARGET_REDUCTION:
+        print(f"⚠️ contention: Lock 보유 시간 감소 {result['hold_reduction']}배 (목표 {CONTENTION_TARGET_REDUCTION:g}배 미만)", file=sys.stderr)
+    return result
+
+# --------------------------------------------------------------------------
+# 회귀 비교
+# --------------------------------------------------------------------------
+
+# 기준 결과 대비 threshold% 이상 나빠진 항목 목록
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], threshold_pct: float) -> List[str]:
+    regressions = []
+    limit = 1.0 + threshold_pct / 100.0
+
+    def worse(metric: str, now: float, before: float, higher_is_better: bool) -> None:
+        if before <= 0: return
+        ratio = before / now if higher_is_better and now > 0 else now / before
+        if higher_is_better and now <= 0: ratio = float("inf")
+        if ratio > limit:
+            regressions.append(f"{metric}: {before} → {now} ({(ratio - 1) * 100:+.1f}%)")
+
+    for name, result in current["workloads"].items():
+        base = baseline.get("workloads", {}).get(name)
+        if not base: continue
+        if name == "shutdown":
+            worse(f"{name}.startup_ms.p50", result["startup_ms"]["p50"], base["startup_ms"]["p50"], False)
+            worse(f"{name}.shutdown_ms.p50", result["shutdown_ms"]["p50"], base["shutdown_ms"]["p50"], False)
+            continue
+        if name == "metrics_overhead":
+            worse(f"{name}.rps_on", result["rps_on"], base["rps_on"], True)
+            continue
+        if name == "half_close": continue # 성능이 아니라 응답 유실 확인 (complete)
+        if name in ("contention", "shared_contention"):
+            worse(f"{name}.calls_per_sec", result["calls_per_sec"], base["calls_per_sec"], True)
+            worse(f"{name}.lock_hold_us.mean", result["lock_hold_us"]["mean"], base["lock_hold_us"]["mean"], False)
+            continue
+        worse(f"{name}.rps", result["rps"], base["rps"], True)
+        for label, stats in result["latency_ms"].items():
+            if label in base["latency_ms"]:
+                worse(f"{name}.latency_ms.{label}.p95", stats["p95"], base["latency_ms"][label]["p95"], False)
+    return regressions
+
+# --------------------------------------------------------------------------
+# 결과 출력
+# --------------------------------------------------------------------------
+
+def print_report(results: Dict[str, Any]) -> None:
+    for name, result in results["workloads"].items():
+        if name == "shutdown":
+            print(f"[{name}] 시작 p50 {result['startup_ms']['p50']}ms | 종료 p50 {result['shutdown_ms']['p50']}ms "
+                  f"({result['rounds']}회)")
+            continue
+        if name == "metrics_overhead":
+            print(f"[{name}] 메트릭 켬 {result['rps_on']} req/s (p50 {result['p50_ms_on']}ms) | "
+                  f"끔 {result['rps_off']} req/s (p50 {result['p50_ms_off']}ms) | 비용 {result['overhead_pct']}% ({result['rounds']}회 중앙값) | "
+                  f"기록 비용 {result['record_ns_per_request']}ns/요청")
+            continue
+        if name == "half_close":
+            flag = "" if result["complete"] else "  (일부 응답 누락!)"
+            print(f"[{name}] 반쯤 닫힘 {result['half_close_responses']}/{HALF_CLOSE_CALLS} 응답 ({result['half_close_ms']}ms) | "
+                  f"연결 shutdown {result['shutdown_responses']}/{HALF_CLOSE_CALLS} 응답 (페널티 포함, {result['shutdown_ms']}ms){flag}")
+            continue
+        if name in ("contention", "shared_contention"):
+            hold, wait = result["lock_hold_us"], result["lock_wait_us"]
+            print(f"[{name}] 스레드 {result['threads']}개 {result['calls']}회 | {result['calls_per_sec']} calls/s | "
+                  f"Lock 보유 평균 {hold['mean']}µs (p99 {hold['p99']}µs) | 대기 평균 {wait['mean']}µs (p99 {wait['p99']}µs) | "
+                  f"재시도 {result['retries']}회")
+            before = result.get("baseline")
+            if before:
+                print(f"    기준선(Lock 안에서 판정/계산/응답 생성): {before['calls_per_sec']} calls/s | "
+                      f"Lock 보유 평균 {before['lock_hold_us']['mean']}µs (p99 {before['lock_hold_us']['p99']}µs) | "
+                      f"대기 평균 {before['lock_wait_us']['mean']}µs → 보유 시간 {result['hold_reduction']}배 감소"
+                      f"{'' if result['hold_reduction'] >= CONTENTION_TARGET_REDUCTION else f' (목표 {CONTENTION_TARGET_REDUCTION:g}배 미만!)'}")
+                print(f"    스레드 1개: 현재 {result['single_thread_calls_per_sec']} calls/s | 기준선 {before['single_thread_calls_per_sec']} calls/s")
+            continue
+        flag = "" if result["complete"] else "  (일부 응답 누락!)"
+        print(f"[{name}] {result['responses']}/{result['requests']} 응답 (페널티 {result['penalized']}) | "
+              f"{result['rps']} req/s | {result['elapsed_sec']}초{flag}")
+        print(f"    {'tool':<20} {'count':>6} {'p50':>10} {'p95':>10} {'p99':>10}  (ms)")
+        for label, stats in result["latency_ms"].items():
+            print(f"    {label:<20} {stats['count']:>6} {stats['p50']:>10} {stats['p95']:>10} {stats['p99']:>10}")
+
+# --------------------------------------------------------------------------
+# 스크립트 실행 시작점
+# --------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="ChillMCP 요청 처리량/지연 시간 벤치마크",
+                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter )
+    parser.add_argument( "--workload", action="append", choices=ALL_WORKLOADS,
+                         help="실행할 워크로드 (여러 번 지정 가능). 기본: 전부 (boss_penalty는 약 20초, boss_penalty_scaled는 약 0.2초 대기)" )
+    parser.add_argument( "--requests", type=int, default=DEFAULT_REQUESTS, help="워크로드당 요청 수." )
+    parser.add_argument( "--seed", type=int, default=DEFAULT_SEED, help="서버 난수 시드." )
+    parser.add_argument( "--python", default=sys.executable, help="서버를 실행할 파이썬 인터프리터." )
+    parser.add_argument( "--output", default="bench_results.json", help="결과 JSON 파일 경로." )
+    parser.add_argument( "--baseline", help="비교할 기준 결과 JSON (회귀 검사)." )
+    parser.add_argument( "--threshold", type=float, default=DEFAULT_THRESHOLD_PCT, metavar="PCT",
+                         help="회귀로 판단할 악화 비율 (%%)." )
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "meta": {"seed": args.seed, "requests": args.requests, "python": platform.python_version(),
+                 "platform": platform.platform(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "workloads": {},
+    }
+    for name in args.workload or ALL_WORKLOADS:
+        print(f"... {name} 실행 중", file=sys.stderr)
+        if name == "shutdown": results["workloads"][name] = run_shutdown_workload(args.python, args.seed)
+        elif name == "half_close": results["workloads"][name] = run_half_close_workload(args.python, args.seed)
+        elif name == "metrics_overhead": results["workloads"][name] = run_metrics_overhead_workload(args.python, args.seed, args.requests)
+        elif name == "contention": results["workloads"][name] = run_contention_comparison(args.seed, args.requests * 10)
+        elif name == "shared_contention": results["workloads"][name] = run_contention_workload(args.seed, args.requests * 10, shared=True)
+        else: results["workloads"][name] = run_workload(name, args.python, args.seed, args.requests)
+
+    # 응답이 빠진 워크로드는 성능 비교와 상관없이 실패
+    incomplete = [name for name, result in results["workloads"].items() if result.get("complete") is False]
+    exit_code = 1 if incomplete else 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        results["regressions"] = regressions
+        if regressions: exit_code = 1
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_report(results)
+    print(f"\n결과 저장: {args.output}")
+    if incomplete: print(f"\n⚠️ 응답 누락: {', '.join(incomplete)}")
+    if args.baseline:
+        if results["regressions"]:
+            print(f"\n⚠️ 회귀 감지 (기준 대비 {args.threshold}% 초과 악화):")
+            for r in results["regressions"]: print(f"  - {r}")
+        else:
+            print(f"\n회귀 없음 (기준: {args.baseline}, 허용 {args.threshold}%)")
+    sys.exit(exit_code)
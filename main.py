@@ -1,46 +1,237 @@
-# --- 표준 라이브러리 임포트 ---
+# --- 빠른 시작: 무거운 임포트보다 먼저 stdin 읽기 시작 ---
+# MCP 호스트는 세션마다 서버를 새로 띄우므로, 첫 요청은 asyncio/rich 임포트를 기다리지 않고 바로 버퍼에 쌓음
 import sys
-import json
+import os
 import time
-import random
 import threading
+from collections import deque
+
+STARTUP_T0: float = time.perf_counter() # 시작 시각 (시작 시간 리포트 기준)
+STARTUP_MARKS: list = [] # (단계 이름, 시작 후 경과 ms)
+# 이 블록은 typing 임포트(10ms 이상) 전에 실행되므로 타입 힌트는 문자열로 표기
+
+STARTUP_BUDGET_MS: float = 10.0 # 프로세스 시작 후 stdin 읽기 시작까지 허용 시간 (ms)
+
+# 시작 단계 기록
+def mark_startup(phase: str) -> None:
+    STARTUP_MARKS.append((phase, (time.perf_counter() - STARTUP_T0) * 1000.0))
+
+# 시작 시간 리포트 (--startup_report, rich 없이 한 줄로 stderr 출력)
+def print_startup_report() -> None:
+    marks = dict(STARTUP_MARKS)
+    reader_ms = marks.get("stdin_reader")
+    verdict = "n/a" if reader_ms is None else ("OK" if reader_ms <= STARTUP_BUDGET_MS else "OVER")
+    phases = " | ".join(f"{name} {ms:.1f}ms" for name, ms in STARTUP_MARKS)
+    sys.stderr.write(f"startup: {phases} (stdin budget {STARTUP_BUDGET_MS:.0f}ms: {verdict})\n")
+    sys.stderr.flush()
+
+STDIN_READ_CHUNK: int = 65536 # stdin에서 한 번에 읽는 최대 바이트 수
+MAX_LINE_BYTES: int = 1 << 20 # 요청 한 줄의 최대 크기 (넘으면 다음 줄바꿈까지 버리고 오류 응답)
+STDIN_MAX_BUFFERED_LINES: int = 1024 # 읽어 둔 줄이 이만큼 쌓이면 읽기 스레드가 멈춤 (파이프를 통해 보내는 쪽에 전파)
+
+# 최대 크기를 넘은 요청 줄 자리에 전달되는 표식
+OVERSIZED_LINE = b"<oversized>"
+
+class StdinLineReader:
+    # stdin(바이트)을 데몬 스레드에서 청크 단위로 읽어 줄로 나눠 버퍼링 (이벤트 루프가 준비되기 전에도 동작)
+    # - 줄 조각은 리스트에 모았다가 줄바꿈을 만나면 한 번만 합침 (긴 줄도 선형 비용)
+    # - MAX_LINE_BYTES를 넘는 줄은 모으지 않고 버린 뒤 OVERSIZED_LINE 표식 전달
+    # - attach()로 이벤트 루프가 연결되면 청크마다 루프를 한 번 깨움
+    # - 쌓인 줄이 STDIN_MAX_BUFFERED_LINES 이상이면 소비될 때까지 다음 청크를 읽지 않음
+    #   (버퍼는 한도 + 청크 하나 분량으로 제한, 처리 중 요청 한도에 닿아 소비가 멈추면 OS 파이프가 차서 보내는 쪽이 막힘)
+    # - EOF는 None으로 전달
+    def __init__(self, stream: "Any"):
+        self.lines: deque = deque()
+        self.lock = threading.Lock()
+        self.space = threading.Condition(self.lock) # 버퍼가 한도 밑으로 내려감
+        self.stopped = False
+        self.loop = None
+        self.ready = None # asyncio.Event (attach 후)
+        self.oversized_lines: int = 0
+        self.thread = threading.Thread(target=self._run, args=(stream,), name="chill-stdin", daemon=True)
+        self.thread.start()
+
+    def _run(self, stream: "Any") -> None:
+        # 파일 디스크립터에서 직접 읽음: 버퍼 객체의 Lock을 데몬 스레드가 쥔 채로 있으면
+        # 인터프리터 종료 시 stdin을 닫지 못해 종료가 1초 지연됨
+        try:
+            fd = stream.fileno()
+            read = lambda n: os.read(fd, n)
+        except (AttributeError, OSError, ValueError): # 실제 파일이 아닌 스트림
+            read = getattr(stream, "read1", stream.read)
+        parts: list = [] # 아직 줄바꿈을 만나지 못한 조각들
+        size = 0
+        dropping = False # 최대 크기를 넘은 줄의 나머지를 버리는 중
+        try:
+            while True:
+                chunk = read(STDIN_READ_CHUNK)
+                if not chunk: break
+                ready_lines = []
+                start = 0
+                end = chunk.find(b"\n")
+                while end >= 0:
+                    if dropping:
+                        dropping = False
+                    elif size + end - start > MAX_LINE_BYTES:
+                        ready_lines.append(self._oversized())
+                    else:
+                        parts.append(chunk[start:end])
+                        ready_lines.append(b"".join(parts))
+                    parts, size = [], 0
+                    start = end + 1
+                    end = chunk.find(b"\n", start)
+                if not dropping and start < len(chunk):
+                    if size + len(chunk) - start > MAX_LINE_BYTES:
+                        ready_lines.append(self._oversized())
+                        parts, size, dropping = [], 0, True
+                    else:
+                        parts.append(chunk[start:])
+                        size += len(chunk) - start
+                if ready_lines: self._push(ready_lines)
+        except (OSError, ValueError): # stdin이 닫힘
+            pass
+        tail = [b"".join(parts)] if parts else []
+        self._push(tail + [None]) # 줄바꿈 없이 끝난 마지막 줄 + EOF
+
+    def _oversized(self) -> bytes:
+        self.oversized_lines += 1
+        return OVERSIZED_LINE
+
+    def _push(self, lines: list) -> None:
+        with self.lock:
+            while len(self.lines) >= STDIN_MAX_BUFFERED_LINES and not self.stopped:
+                self.space.wait()
+            if self.stopped: return # stop()이 이미 EOF를 넣음
+            self.lines.extend(lines)
+            loop, ready = self.loop, self.ready
+        self._wake(loop, ready)
+
+    @staticmethod
+    def _wake(loop: "Any", ready: "Any") -> None:
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError: # 이벤트 루프가 이미 종료됨
+                pass
+
+    # 이벤트 루프 연결 (루프 안에서 호출)
+    def attach(self, loop: "Any") -> None:
+        import asyncio
+        with self.lock:
+            self.loop, self.ready = loop, asyncio.Event()
+            if self.lines: self.ready.set()
+
+    # 더 읽지 않고 EOF 처리 (stdout이 끊어졌을 때), 한도에서 기다리던 읽기 스레드도 깨움
+    def stop(self) -> None:
+        with self.lock:
+            if self.stopped: return
+            self.stopped = True
+            self.lines.clear()
+            self.lines.append(None)
+            self.space.notify_all()
+            loop, ready = self.loop, self.ready
+        self._wake(loop, ready)
+
+    # 다음 줄 (EOF면 None)
+    async def readline(self) -> "Optional[bytes]":
+        while True:
+            with self.lock:
+                if self.lines:
+                    line = self.lines.popleft()
+                    if len(self.lines) < STDIN_MAX_BUFFERED_LINES: self.space.notify()
+                    return line
+                self.ready.clear()
+            await self.ready.wait()
+
+# 스크립트로 실행될 때만 즉시 읽기 시작 (모듈로 임포트될 때는 시작하지 않음)
+_early_stdin = None # type: Optional[StdinLineReader]
+if __name__ == "__main__":
+    _early_stdin = StdinLineReader(sys.stdin.buffer)
+    mark_startup("stdin_reader")
+
+# --- 표준 라이브러리 임포트 ---
+import json
+import random
+import re
 import argparse
-import datetime
-import os
 import math
-from typing import Dict, Any, List, Optional
-
-# --- 서드파티 라이브러리 임포트 ---
+import heapq
+import bisect
+import itertools
+import asyncio
+import queue
+import signal
+import mmap
+import struct
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional, Set, Tuple
+
+# --- 선택적 서드파티 라이브러리 (있으면 더 빠른 JSON 코덱 사용) ---
 try:
-    import colorama
-    from colorama import Fore, Style
+    import orjson
 except ImportError:
-    print("오류: 'colorama' 라이브러리를 찾을 수 없습니다. 'pip install colorama'로 설치해주세요.", file=sys.stderr)
-    sys.exit(1)
-
-try:
-    from rich.console import Console
-    from rich.panel import Panel
+    orjson = None
+try: # 도구 설정 TOML 파일 (Python 3.11+ 표준 라이브러리)
+    import tomllib
 except ImportError:
-    print("오류: 'rich' 라이브러리를 찾을 수 없습니다. 'pip install rich'로 설치해주세요.", file=sys.stderr)
-    sys.exit(1)
+    tomllib = None
+
+# --- 서드파티 라이브러리 (UI 전용이므로 처음 사용할 때 임포트) ---
+# rich/colorama 임포트만으로 수십 ms가 걸리므로, --ui off 이거나 아직 아무것도 그리지 않았다면 임포트하지 않음
+
+# colorama 초기화 (Windows 터미널 ANSI 변환용, UI를 쓸 때만)
+_colorama: Any = None
+def init_colorama() -> None:
+    global _colorama
+    try:
+        import colorama
+    except ImportError:
+        print("오류: 'colorama' 라이브러리를 찾을 수 없습니다. 'pip install colorama'로 설치해주세요.", file=sys.stderr)
+        sys.exit(1)
+    colorama.init(autoreset=True)
+    _colorama = colorama
+
+def deinit_colorama() -> None:
+    if _colorama is not None: _colorama.deinit()
+
+class _LazyConsole:
+    # 처음 출력할 때 rich Console 생성 (stderr 출력용)
+    def __init__(self):
+        self._console = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._console is None:
+                try:
+                    from rich.console import Console
+                except ImportError:
+                    print("오류: 'rich' 라이브러리를 찾을 수 없습니다. 'pip install rich'로 설치해주세요.", file=sys.stderr)
+                    sys.exit(1)
+                self._console = Console(stderr=True)
+            return self._console
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._console or self._load(), name)
 
 # --------------------------------------------------------------------------
-# 전역 Rich 콘솔 (stderr 출력용)
+# 전역 Rich 콘솔 (stderr 출력용, 첫 사용 시 생성)
 # --------------------------------------------------------------------------
-console = Console(stderr=True)
+console = _LazyConsole()
 
 # --------------------------------------------------------------------------
-# ANSI 색상 코드 (colorama 사용)
+# ANSI 색상 코드 (colorama Fore/Style과 같은 값, 임포트 없이 사용)
 # --------------------------------------------------------------------------
-R = Fore.RED + Style.BRIGHT
-G = Fore.GREEN + Style.BRIGHT
-Y = Fore.YELLOW + Style.BRIGHT
-B = Fore.BLUE + Style.BRIGHT
-M = Fore.MAGENTA + Style.BRIGHT
-C = Fore.CYAN + Style.BRIGHT
-W = Fore.WHITE + Style.NORMAL
-RS = Style.RESET_ALL # 모든 스타일 리셋
+R = "\x1b[31m\x1b[1m" # Fore.RED + Style.BRIGHT
+G = "\x1b[32m\x1b[1m" # Fore.GREEN + Style.BRIGHT
+Y = "\x1b[33m\x1b[1m" # Fore.YELLOW + Style.BRIGHT
+B = "\x1b[34m\x1b[1m" # Fore.BLUE + Style.BRIGHT
+M = "\x1b[35m\x1b[1m" # Fore.MAGENTA + Style.BRIGHT
+C = "\x1b[36m\x1b[1m" # Fore.CYAN + Style.BRIGHT
+W = "\x1b[37m\x1b[22m" # Fore.WHITE + Style.NORMAL
+RS = "\x1b[0m" # 모든 스타일 리셋 (Style.RESET_ALL)
 
 # --------------------------------------------------------------------------
 # 설정 및 로직용 상수
@@ -53,6 +244,7 @@ MAX_BOSS_ALERT_LEVEL: int = 5 # 최대 상사 경계 레벨
 BOSS_PENALTY_DELAY_SEC: int = 20 # 상사 경계 최대 시 지연 시간 (초)
 HIGH_STRESS_THRESHOLD: int = 80 # 높은 스트레스 기준값
 HIGH_ALERT_THRESHOLD: int = MAX_BOSS_ALERT_LEVEL - 1 # 높은 상사 경계 기준값 (4 이상)
+STATE_MAX_RETRIES: int = 8 # 낙관적 상태 갱신 재시도 한도 (넘으면 Lock 안에서 계산)
 
 # --- 도구 동작 상수 ---
 BASIC_TOOL_SUCCESS_RATE: float = 0.90 # 기본 도구 성공 확률 (90%)
@@ -65,7 +257,8 @@ ADVANCED_STRESS_REDUCTION_MIN: int = 30 # 고급 도구 성공 시 스트레스
 ADVANCED_STRESS_REDUCTION_MAX: int = 80 # 고급 도구 성공 시 스트레스 최대 감소량
 
 # --- 이벤트 확률 상수 ---
-RANDOM_EVENT_CHANCE: float = 0.15 # 돌발 이벤트 발생 확률 (15%)
+RANDOM_EVENT_CHANCE: float = 0.15 # 돌발 이벤트 발생 확률 (15%, 이벤트 파일의 chance로 덮어쓸 수 있음)
+EVENTS_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "events.json") # 기본 이벤트 설정 파일
 
 # --- 애니메이션/UI 상수 ---
 TOOL_ANIMATION_DURATION_SEC: int = 1 # 일반 도구 애니메이션 시간 (초)
@@ -73,15 +266,267 @@ STARTUP_ANIMATION_LINE_DELAY: float = 0.05 # 시작 애니메이션 줄 간격 
 BOSS_ANIMATION_FRAME_DELAY: float = 0.5 # 보스 애니메이션 프레임 간격 딜레이
 TOOL_ANIMATION_FRAME_DELAY: float = 0.2 # 도구 애니메이션 프레임 간격 딜레이
 
+# --- 시계 상수 ---
+DEFAULT_TIME_SCALE: float = 1.0 # 시간 배율 (1: 실제 시간, 1000: 1000배속, 0: advance_clock으로만 진행)
+
+# --- 요청 처리 상수 ---
+DEFAULT_MAX_WORKERS: int = 32 # 동시에 렌더링(애니메이션)할 수 있는 최대 요청 수
+DEFAULT_QUEUE_DEPTH: int = 256 # 응답 전인 도구 호출(렌더링 대기/중, 페널티 지연 대기) 최대 수 (넘으면 busy로 바로 거절)
+
+# --- 연결 상수 ---
+DEFAULT_MAX_IN_FLIGHT: int = 64 # 연결 하나에서 동시에 처리 중일 수 있는 최대 요청 수 (넘으면 그 연결은 읽기 대기)
+SOCKET_WRITE_HIGH_WATER: int = 1 << 20 # 소켓 송신 버퍼가 이보다 크면 비워질 때까지 읽기 대기
+DEFAULT_TCP_HOST: str = "127.0.0.1" # TCP 리스너 주소 (로컬 전용)
+
+# --- 도구 레지스트리 상수 ---
+TOOLS_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "tools") # 기본 도구 설정 디렉터리
+TOOL_FILE_SUFFIXES: Tuple[str, ...] = (".json", ".toml") # 도구 설정 파일 확장자
+TOOL_RELOAD_INTERVAL_SEC: float = 1.0 # 도구 설정 파일 변경 확인 간격 (0이면 다시 불러오지 않음)
+
+# --- 배치 호출 상수 ---
+MAX_BATCH_CALLS: int = 100 # batch 요청 하나에 담을 수 있는 최대 도구 호출 수
+
+# --- 세션 상수 ---
+DEFAULT_SESSION_ID: str = "default" # session_id 없는 요청이 사용하는 세션
+SESSION_SHARD_COUNT: int = 64 # 세션 저장소 샤드 수 (샤드마다 별도 Lock)
+DEFAULT_MAX_SESSIONS: int = 65536 # 최대 세션 수 (초과 시 가장 오래 안 쓴 세션부터 제거)
+DEFAULT_SESSION_TTL_SEC: int = 3600 # 이 시간 동안 요청이 없는 세션은 제거
+
+# --- 상태 기록 상수 (history) ---
+HISTORY_CAPACITY: int = 256 # 세션마다 보관하는 최근 상태 변화 수 (가득 차면 가장 오래된 것부터 덮어씀, 0이면 기록 안 함)
+HISTORY_DEFAULT_POINTS: int = 200 # history 응답의 기본 최대 점 수 (넘으면 시간 구간별로 다운샘플링)
+HISTORY_MAX_POINTS: int = 5000 # history 요청으로 지정할 수 있는 최대 점 수
+HISTORY_TICK: int = 0 # 기록 종류: 시간 경과 (스트레스 증가/경계 감소)
+HISTORY_SUCCESS: int = 1 # 기록 종류: 도구 성공
+HISTORY_FAILURE: int = 2 # 기록 종류: 도구 실패
+HISTORY_OUTCOMES: Tuple[str, ...] = ("tick", "success", "failure") # 기록 종류 코드 → 이름
+
+# --- 공유 상태 상수 (--shared_state) ---
+SHARED_STATE_MAGIC: bytes = b"CHIL" # 공유 세그먼트 파일 식별자
+SHARED_STATE_VERSION: int = 1 # 세그먼트 배치가 바뀌면 올림
+SHARED_STATE_READ_SPINS: int = 64 # Lock 없는 읽기(seqlock) 재시도 한도 (넘으면 Lock을 잡고 읽음)
+
+# --- 저널 상수 ---
+JOURNAL_FLUSH_INTERVAL_SEC: float = 0.05 # 저널을 모아서 기록(fsync)하는 최대 간격
+JOURNAL_FLUSH_BATCH: int = 512 # 이만큼 쌓이면 간격을 기다리지 않고 바로 기록
+JOURNAL_SNAPSHOT_EVERY: int = 10000 # 이 레코드 수마다 스냅샷 저장 (재시작 시 이후 꼬리만 재생)
+
+# --- 메트릭 상수 ---
+METRICS_LATENCY_BUCKETS: List[float] = [ # 지연 시간 히스토그램 버킷 상한 (초)
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0,
+]
+METRICS_LOCK_BUCKETS: List[float] = [ # 상태 Lock 대기/보유 시간 히스토그램 버킷 상한 (초, 보유 시간은 µs 이하)
+    0.0000001, 0.00000025, 0.0000005, 0.000001, 0.0000025, 0.000005, 0.00001, 0.000025,
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1,
+]
+METRICS_HTTP_PATH: str = "/metrics" # TCP 연결에서 Prometheus 텍스트를 주는 경로
+
+# --- 프로파일링 상수 (--profile) ---
+PROFILE_SLOWEST: int = 10 # cProfile 기록을 남길 가장 느린 요청 수
+PROFILE_ALLOC_SAMPLE_EVERY: int = 256 # 이 요청 수마다 한 번 tracemalloc 스냅샷을 비교해 할당 위치 기록
+PROFILE_ALLOC_SAMPLES: int = 8 # 보관할 스냅샷 쌍 최대 수 (비교는 느리므로 요청 처리 중이 아니라 리포트 저장 시)
+PROFILE_ALLOC_TOP: int = 5 # 샘플/리포트마다 남길 할당 위치 수
+PROFILE_TRACE_FRAMES: int = 1 # tracemalloc이 보관할 스택 깊이
+PROFILE_STATS_LINES: int = 25 # 느린 요청마다 리포트에 출력할 cProfile 줄 수
+PROFILE_PHASES: Tuple[str, ...] = ( "parse", "rng", "plan", "lock_wait", "lock_hold", "build", "encode", # 리포트 출력 순서
+                                    "queue", "render", "sleep", "penalty", "flush_wait", "write", "total" )
+
+# --- 최적 정책 표 상수 (recommend) ---
+POLICY_DISCOUNT: float = 0.95 # 가치 반복 할인율 (나중 호출의 비용일수록 덜 반영)
+POLICY_TOLERANCE: float = 1e-4 # 상태 가치 변화(스트레스 단위)가 이보다 작으면 수렴
+POLICY_MAX_ITERATIONS: int = 5000 # 가치 반복 최대 횟수
+POLICY_PENALTY_COST: float = float(BOSS_PENALTY_DELAY_SEC) # 페널티 지연 1회의 비용 (지연 1초 = 스트레스 1로 환산)
+POLICY_ALERTNESS_VALUES: range = range(0, 101) # 정책을 미리 계산하는 boss_alertness 값 (%)
+POLICY_CACHE_FILE: str = "chillmcp-policy.bin" # 기본 캐시 파일 이름 (임시 디렉터리)
+DEFAULT_POLICY_WORKERS: int = 1 # 정책 표를 계산할 프로세스 수 (서버의 boss_alertness 하나면 약 0.3초)
+POLICY_CACHE_VERSION: int = 1 # 캐시 형식/모델 정의가 바뀌면 올림
+
+# --- MCP / JSON-RPC 2.0 상수 ---
+SERVER_NAME: str = "ChillMCP" # initialize 응답의 serverInfo
+SERVER_VERSION: str = "1.0.0"
+MCP_PROTOCOL_VERSIONS: List[str] = ["2025-06-18", "2025-03-26", "2024-11-05"] # 지원하는 MCP 버전 (최신순)
+JSONRPC_PARSE_ERROR: int = -32700 # JSON 해석 실패
+JSONRPC_INVALID_REQUEST: int = -32600 # JSON-RPC 요청 형식 오류
+JSONRPC_METHOD_NOT_FOUND: int = -32601 # 알 수 없는 메서드
+JSONRPC_INVALID_PARAMS: int = -32602 # 잘못된 params (알 수 없는 도구 포함)
+JSONRPC_SERVER_BUSY: int = -32000 # 요청 대기열이 가득 참 (서버 정의 오류)
+JSONRPC_DEADLINE_EXCEEDED: int = -32001 # 요청의 deadline_ms 안에 응답할 수 없음 (서버 정의 오류)
+
+# --- 렌더링 모드 상수 ---
+UI_MODES: List[str] = ["inline", "thread", "off"] # inline: 요청 경로에서 렌더링 / thread: 렌더러 스레드 / off: 렌더링 없음
+UI_EVENT_QUEUE_SIZE: int = 256 # 렌더러 스레드 이벤트 큐 최대 크기 (가득 차면 이벤트 버림)
+UI_CLOSE_TIMEOUT_SEC: float = 1.0 # 종료 시 렌더러 스레드가 남은 이벤트를 그릴 때까지 기다리는 최대 시간
+RENDER_CACHE_MAX_ENTRIES: int = 4096 # 애니메이션 화면 캐시 최대 항목 수 (넘으면 비우고 다시 채움)
+UI_MAX_FPS: float = 20.0 # 애니메이션 초당 최대 프레임 수 (출력이 못 따라가면 그만큼 프레임을 버림)
+UI_FULL_REDRAW_SEC: float = 5.0 # 바뀐 줄만 그리는 중에도 이 간격마다 화면 전체를 다시 그림 (중간에 끼어든 출력 복구)
+
 # --------------------------------------------------------------------------
 # 애니메이션 및 UI 헬퍼 함수 (stderr 출력)
 # --------------------------------------------------------------------------
 
+# 애니메이션 화면 점유 Lock (동시 요청 시 화면이 섞이지 않도록 한 번에 하나만 그림)
+_animation_lock = threading.Lock()
+
+class RenderCache:
+    # 렌더링 결과(ANSI 문자열) 메모이제이션 → 그리기는 조회 + write 한 번
+    # - 상태 패널: (스트레스 0~100) × (경계 0~5) 조합뿐이므로 전부 캐시
+    # - 애니메이션 화면: 프레임/스피너/문구 조합별로 캐시 (RENDER_CACHE_MAX_ENTRIES 초과 시 비움)
+    def __init__(self):
+        self.panels: Dict[Tuple[int, int], str] = {}
+        self.screens: Dict[tuple, Tuple[str, ...]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock = threading.Lock()
+        self._panel_console: Any = None
+
+    # 상태 패널 (rich Panel을 stderr 콘솔과 같은 설정으로 문자열 렌더링)
+    def status_panel(self, stress: int, boss: int) -> str:
+        return self._lookup(self.panels, (stress, boss), lambda: _render_status_panel(self._console(), stress, boss))
+
+    # 애니메이션 한 화면의 줄 목록 (build는 캐시에 없을 때만 호출)
+    def screen(self, key: tuple, build: Any) -> Tuple[str, ...]:
+        return self._lookup(self.screens, key, build)
+
+    # 미스일 때의 렌더링도 Lock 안에서 (패널 렌더링용 콘솔 버퍼를 여러 스레드가 공유하므로)
+    def _lookup(self, table: Dict[Any, Any], key: Any, build: Any) -> Any:
+        with self.lock:
+            text = table.get(key)
+            if text is not None:
+                self.hits += 1
+                return text
+            self.misses += 1
+            text = build()
+            if len(table) >= RENDER_CACHE_MAX_ENTRIES: table.clear()
+            table[key] = text
+            return text
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.panels) + len(self.screens)}
+
+    def _console(self) -> Any:
+        if self._panel_console is None:
+            import io
+            from rich.console import Console
+            self._panel_console = Console(file=io.StringIO(), force_terminal=console.is_terminal,
+                                          color_system=console.color_system, width=console.width)
+        return self._panel_console
+
+# 전역 렌더 캐시
+render_cache = RenderCache()
+
+# 캐시된 화면 출력 (write 한 번)
+def write_screen(text: str) -> None:
+    sys.stderr.write(text)
+    sys.stderr.flush()
+
 # 터미널 화면 지우기
+CLEAR_SCREEN = '\033[2J\033[H'
 def clear_screen() -> None:
-    sys.stderr.write('\033[2J\033[H')
+    sys.stderr.write(CLEAR_SCREEN)
     sys.stderr.flush()
 
+# 화면 문자열 → 줄 목록
+# 줄마다 그 줄이 시작될 때 적용 중인 색상을 SGR 코드 하나로 앞에 붙이고 끝에서 리셋 (한 줄만 다시 그려도 색이 같도록)
+_SGR_PATTERN = re.compile(r"\x1b\[([0-9;]*)m")
+def screen_lines(text: str) -> Tuple[str, ...]:
+    lines, style = [], {}
+    for line in text.rstrip("\r").split("\n"):
+        prefix = f"\x1b[{';'.join(style.values())}m" if style else ""
+        lines.append(f"{prefix}{line}{RS}" if prefix or "\x1b[" in line else line)
+        for params in _SGR_PATTERN.findall(line):
+            for param in params.split(";"):
+                if param in ("", "0"): style.clear()
+                else: style[_sgr_slot(param)] = param
+    return tuple(lines)
+
+# SGR 파라미터가 덮어쓰는 속성 (같은 속성의 이전 값은 버림, 단순 색상/굵기만 구분)
+def _sgr_slot(param: str) -> str:
+    n = int(param)
+    if 30 <= n <= 39 or 90 <= n <= 97: return "fg"
+    if 40 <= n <= 49 or 100 <= n <= 107: return "bg"
+    if n in (1, 2, 22): return "weight"
+    return param
+
+class TerminalScreen:
+    # 애니메이션용 차분 렌더러 (stderr)
+    # - 직전에 그린 줄 목록을 기억하고 바뀐 줄만 커서 이동 후 덮어씀 (처음/UI_FULL_REDRAW_SEC마다 전체)
+    # - 초당 프레임 수 제한, 쓰기가 프레임 간격보다 오래 걸리면 (느린 터미널) 걸린 만큼 다음 프레임을 버림
+    # - stderr가 TTY가 아니면 (로그 파일, 파이프) 애니메이션/패널 대신 한 줄 요약만 출력
+    def __init__(self, max_fps: float = UI_MAX_FPS):
+        self.frame_interval: float = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.last_lines: Tuple[str, ...] = ()
+        self.next_frame_at: float = 0.0 # perf_counter 기준
+        self.next_full_at: float = 0.0
+        self.frames_drawn: int = 0
+        self.frames_dropped: int = 0
+        self.chars_written: int = 0
+        self._is_tty: Optional[bool] = None
+
+    @property
+    def is_tty(self) -> bool:
+        if self._is_tty is None:
+            try:
+                self._is_tty = sys.stderr.isatty()
+            except (AttributeError, ValueError): # stderr가 닫혔거나 교체됨
+                self._is_tty = False
+        return self._is_tty
+
+    # 애니메이션 시작: 다음 프레임은 화면 전체를 그림
+    def begin(self) -> None:
+        self.last_lines = ()
+        self.next_frame_at = 0.0
+
+    # 한 프레임 그리기 (반환: 그렸는지 여부, 프레임 제한/출력 지연으로 버리면 False)
+    def draw(self, lines: Tuple[str, ...]) -> bool:
+        now = time.perf_counter()
+        if now < self.next_frame_at:
+            self.frames_dropped += 1
+            return False
+        if lines == self.last_lines: return True # 바뀐 줄 없음
+
+        previous = self.last_lines
+        if not previous or now >= self.next_full_at or len(lines) >= _terminal_rows():
+            text = CLEAR_SCREEN + "\n".join(lines)
+            self.next_full_at = now + UI_FULL_REDRAW_SEC
+        else:
+            parts = [ f"\x1b[{row + 1};1H{line}\x1b[K" for row, line in enumerate(lines)
+                      if row >= len(previous) or line != previous[row] ]
+            if len(lines) < len(previous): parts.append(f"\x1b[{len(lines) + 1};1H\x1b[J") # 줄어든 아래쪽 지우기
+            text = "".join(parts)
+        write_screen(text)
+
+        cost = time.perf_counter() - now
+        self.last_lines = lines
+        self.frames_drawn += 1
+        self.chars_written += len(text)
+        self.next_frame_at = now + (self.frame_interval if cost <= self.frame_interval else 2 * cost)
+        return True
+
+    # 애니메이션 종료: 화면 정리
+    def end(self) -> None:
+        clear_screen()
+        self.last_lines = ()
+
+    # 한 줄 요약 출력 (TTY가 아닐 때)
+    def summary(self, text: str) -> None:
+        write_screen(text + "\n")
+        self.chars_written += len(text) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"frames_drawn": self.frames_drawn, "frames_dropped": self.frames_dropped, "chars_written": self.chars_written}
+
+# stderr 터미널 높이 (모르면 24줄로 가정, 크기를 설정하지 않은 pty는 0을 돌려줌)
+def _terminal_rows() -> int:
+    try:
+        return os.get_terminal_size(sys.stderr.fileno()).lines or 24
+    except (OSError, AttributeError, ValueError):
+        return 24
+
+# 전역 터미널 화면 (애니메이션 전용, --ui_fps로 프레임 제한 변경)
+terminal = TerminalScreen()
+
 # 시작 배너 ASCII 아트
 BANNER_TEXT = f"""
 {C}╔═══════════════════════════════════════════╗
@@ -145,31 +590,71 @@ BOSS_FRAME_2 = f"""
 {W}
 """
 
+# 스레드 풀에서 렌더링 중인 요청 (스레드별, 취소/마감되면 애니메이션을 다음 프레임에서 멈춤)
+_render_local = threading.local()
+
+# 지금 스레드가 그리는 요청이 취소되었는지
+def render_cancelled() -> bool:
+    call = getattr(_render_local, "call", None)
+    return call is not None and call.cancelled
+
+# 요청 하나의 렌더링 실행 (스레드 풀 작업, 시작 전에 취소되었으면 그리지 않음)
+def render_for(call: Any, render: Any, *args: Any) -> None:
+    if call.cancelled: return
+    _render_local.call = call
+    try:
+        render(*args)
+    finally:
+        _render_local.call = None
+
+# 애니메이션 프레임 대기 (시계 기준, 프로파일링 중이면 실제 대기 시간을 렌더링 시간과 따로 기록)
+# 취소될 수 있는 렌더링이면 프레임 간격으로 나눠 자면서 취소 확인
+def animation_sleep(seconds: float) -> None:
+    started = time.perf_counter() if profiler is not None else 0.0
+    if getattr(_render_local, "call", None) is None:
+        clock.sleep(seconds)
+    else:
+        deadline = clock.now() + seconds
+        while not render_cancelled():
+            left = deadline - clock.now()
+            if left <= 0: break
+            clock.sleep(min(left, TOOL_ANIMATION_FRAME_DELAY))
+    if profiler is not None: profiler.slept(time.perf_counter() - started)
+
 # 보스 경계 최대 시 페널티 애니메이션 출력
 def show_boss_animation(duration_sec: int = BOSS_PENALTY_DELAY_SEC) -> None:
-    start_time = time.time()
-    frame_toggle = True
+    if not _animation_lock.acquire(blocking=False): # 다른 애니메이션이 화면 사용 중이면 생략 (지연은 응답 타이머가 담당)
+        return
+    try:
+        _draw_boss_animation(duration_sec)
+    finally:
+        _animation_lock.release()
 
-    while time.time() - start_time < duration_sec:
-        clear_screen()
-        print(f"\n\n{R}    [ ! ] 회장님이 당신을 지켜보고 있습니다... [ ! ]{RS}", file=sys.stderr)
+def _draw_boss_animation(duration_sec: int) -> None:
+    start_time = clock.now()
+    frame_toggle = True
 
-        print(BOSS_FRAME_1 if frame_toggle else BOSS_FRAME_2, file=sys.stderr)
+    terminal.begin()
+    while clock.now() - start_time < duration_sec and not render_cancelled():
+        remaining = int(duration_sec - (clock.now() - start_time))
+        key = ("boss", frame_toggle, remaining, duration_sec)
+        terminal.draw(render_cache.screen(key, lambda: screen_lines(_boss_screen(frame_toggle, remaining, duration_sec))))
         frame_toggle = not frame_toggle
 
-        remaining = int(duration_sec - (time.time() - start_time))
-        progress = max(0, duration_sec - remaining)
-        progress_bar = f"[{R}{'=' * progress}{W}{' ' * max(0, duration_sec - progress)}{Y}]" # 음수 방지
-
-        sys.stderr.write(f"\n\n    {Y}경고 페널티... {progress_bar} ({remaining}초 남음){RS}\r")
-        sys.stderr.flush()
+        animation_sleep(BOSS_ANIMATION_FRAME_DELAY)
 
-        time.sleep(BOSS_ANIMATION_FRAME_DELAY)
+    terminal.end()
 
-    clear_screen()
+# 보스 애니메이션 한 화면
+def _boss_screen(frame_toggle: bool, remaining: int, duration_sec: int) -> str:
+    progress = max(0, duration_sec - remaining)
+    progress_bar = f"[{R}{'=' * progress}{W}{' ' * max(0, duration_sec - progress)}{Y}]" # 음수 방지
+    return ( f"\n\n{R}    [ ! ] 회장님이 당신을 지켜보고 있습니다... [ ! ]{RS}\n"
+             f"{BOSS_FRAME_1 if frame_toggle else BOSS_FRAME_2}\n"
+             f"\n\n    {Y}경고 페널티... {progress_bar} ({remaining}초 남음){RS}\r" )
 
 # 도구 실행 시 애니메이션 출력
-def show_tool_animation(frames: List[str], flavor_text: str, duration_sec: int = TOOL_ANIMATION_DURATION_SEC) -> None:
+def show_tool_animation(frames: Tuple[str, ...], flavor_text: str, duration_sec: int = TOOL_ANIMATION_DURATION_SEC) -> None:
     loading_messages = [
         "생산성 시뮬레이션 중...", "스플라인 조정 중 (낮잠)...", "Alt+Tab 누르는 중...",
         "최적 탈출 경로 계산 중...", "컴파일 중... (쿨쿨)...",
@@ -177,28 +662,37 @@ def show_tool_animation(frames: List[str], flavor_text: str, duration_sec: int =
     ]
     loading_text = random.choice(loading_messages)
 
+    if not _animation_lock.acquire(blocking=False): # 다른 애니메이션이 화면 사용 중이면 대기만 함
+        animation_sleep(duration_sec)
+        return
+    try:
+        _draw_tool_animation(frames, flavor_text, loading_text, duration_sec)
+    finally:
+        _animation_lock.release()
+
+def _draw_tool_animation(frames: Tuple[str, ...], flavor_text: str, loading_text: str, duration_sec: int) -> None:
     if not frames: # 프레임 없으면 대기 후 화면 정리
-        time.sleep(duration_sec)
+        animation_sleep(duration_sec)
         clear_screen()
         return
 
-    start_time = time.time()
+    start_time = clock.now()
     frame_index = 0
     spinner = ['|', '/', '-', '\\']
-    while time.time() - start_time < duration_sec:
-        clear_screen()
-
+    terminal.begin()
+    while clock.now() - start_time < duration_sec and not render_cancelled():
         current_frame = frames[frame_index % len(frames)]
-
-        print("\n\n", file=sys.stderr)
-        print(current_frame, file=sys.stderr)
-        print(f"\n{C}{flavor_text}{RS}\n", file=sys.stderr) # 애니메이션 중 flavor_text 표시
-        print(f"{Y}{spinner[frame_index % len(spinner)]} {loading_text}{RS}", file=sys.stderr)
+        current_spinner = spinner[frame_index % len(spinner)]
+        key = ("tool", current_frame, current_spinner, flavor_text, loading_text)
+        terminal.draw(render_cache.screen(key, lambda: screen_lines(
+            f"\n\n\n{current_frame}\n"
+            f"\n{C}{flavor_text}{RS}\n\n" # 애니메이션 중 flavor_text 표시
+            f"{Y}{current_spinner} {loading_text}{RS}\n" )))
 
         frame_index += 1
-        time.sleep(TOOL_ANIMATION_FRAME_DELAY)
+        animation_sleep(TOOL_ANIMATION_FRAME_DELAY)
 
-    clear_screen() # 루프 종료 후 화면 정리
+    terminal.end() # 루프 종료 후 화면 정리
 
 # 서버 시작 시 소개 및 설정 정보 출력
 def print_server_intro(boss_alertness_pct: int, boss_cooldown: int) -> None:
@@ -220,17 +714,23 @@ def print_server_intro(boss_alertness_pct: int, boss_cooldown: int) -> None:
     console.print(f"\n👀 Boss Alertness: {filled}{empty} {boss_alertness_pct}% → {mood}")
     console.print(f"⏳ Cooldown Interval: {boss_cooldown} seconds\n")
     console.print("🧰 Tools Ready (B: Basic, A: Advanced):")
-    console.print("   [B] 🧘 take_a_break     [A] 💧 bathroom_break")
-    console.print("   [B] 🎬 watch_netflix    [A] ☕️ coffee_mission")
-    console.print("   [B] 😂 show_meme        [A] 📞 urgent_call")
-    console.print("   [A] 🤔 deep_thinking    [A] 🍗 chicken_and_beer") # 도구 레벨에 맞게 표시
-    console.print("   [A] 📧 email_organizing   [A] 🏃‍♂️ leave_work_now") # 도구 레벨에 맞게 표시
-    console.print("   [A] 🎤 company_dinner")
+    # 현재 레지스트리(--tools_dir, 핫 리로드 반영) 기준으로 두 열씩 표시
+    entries = [f"[{spec.level[0].upper()}] {spec.name}" for spec in TOOL_REGISTRY.values()]
+    width = max(map(len, entries), default=0) + 2
+    for i in range(0, len(entries), 2):
+        console.print("   " + "".join(entry.ljust(width) for entry in entries[i:i + 2]).rstrip(), markup=False)
     console.print("\n🕹  Send JSON to stdin — {'method':'shutdown'} to exit.\n") # 종료 방법 안내
     console.print("═" * 55 + "\n")
 
-# 현재 상태 정보 패널 출력
+# 현재 상태 정보 패널 출력 (렌더 캐시 조회 + write 한 번, TTY가 아니면 한 줄)
 def display_status(stress: int, boss: int) -> None:
+    if not terminal.is_tty:
+        terminal.summary(f"🧘 Stress {stress}/{MAX_STRESS_LEVEL} | Boss Alert {boss}/{MAX_BOSS_ALERT_LEVEL}")
+        return
+    write_screen(render_cache.status_panel(stress, boss))
+
+# 상태 패널을 ANSI 문자열로 렌더링 (캐시에 없을 때만 호출)
+def _render_status_panel(panel_console: Any, stress: int, boss: int) -> str:
     stress_bar = "█" * (stress // 10) + "░" * max(0, 10 - (stress // 10)) # 음수 방지
 
     if stress >= HIGH_STRESS_THRESHOLD: stress_color = "bold red"
@@ -243,7 +743,8 @@ def display_status(stress: int, boss: int) -> None:
 
     boss_bar = f"[{boss_bar_color}]{'🔥' * boss}[/{boss_bar_color}]{'⚪' * max(0, MAX_BOSS_ALERT_LEVEL - boss)}" # 음수 방지
 
-    console.print(
+    from rich.panel import Panel # 첫 상태 패널 렌더링 시 임포트
+    panel_console.print(
         Panel.fit(
             f"[{stress_color}]Stress Level:[/] {stress:3d} | {stress_bar}\n"
             f"[bold red]Boss Alert:[/bold red]    {boss}/{MAX_BOSS_ALERT_LEVEL} | {boss_bar}",
@@ -251,119 +752,1660 @@ def display_status(stress: int, boss: int) -> None:
             border_style="bright_blue"
         )
     )
+    buffer = panel_console.file
+    text = buffer.getvalue()
+    buffer.seek(0); buffer.truncate()
+    return text
+
+# 도구 실행 결과 렌더링: 애니메이션 및 stderr 출력 (느림)
+def render_outcome(outcome: Dict[str, Any], animate: bool = True, show_status: bool = True) -> None:
+    if outcome["error"]:
+        return
+    if not terminal.is_tty: # 로그/파이프: 애니메이션과 여러 줄 메시지 대신 한 줄 요약
+        terminal.summary(outcome_summary_line(outcome, show_status))
+        return
+    tool_name = outcome["tool_name"]
+    flavor_text = outcome["flavor_text"]
+    current_boss_alert = outcome["boss"]
+
+    # 1. 애니메이션 실행 (밀린 이벤트를 합칠 때는 생략)
+    if animate:
+        show_tool_animation(outcome["frames"], flavor_text) if not outcome["delay_applied"] else show_boss_animation()
+
+    # 2. stderr 메시지 출력 (순서 중요)
+    print("\n", file=sys.stderr) # 간격 추가
+    console.print(f"[bright_cyan]{flavor_text}[/]") # Flavor Text (Rich 마크업)
+    if outcome["boss_alert_increased"]: # 경계 증가 알림 (진한 색상)
+        alert_messages = { 1: "[grey50]...헛기침...(경계+1)[/]", 2: "[orange3]내...모니터 봄...(경계+1)[/]", 3: "[bold orange3]...인기척...(경계+1)[/]", 4: "[bold red]...일어남!(경계+1)[/]", 5: "[bold red blink]🚨 걸어옴!(경계MAX)[/]" }
+        console.print(alert_messages.get(current_boss_alert, f"[red]상사 경계: {current_boss_alert}[/red]"))
+    if outcome["tool_succeeded"]: # 성공 알림 (스트레스 감소량 포함)
+         console.print(f"[bold green]✅ '{tool_name}' 성공! ({outcome['base_summary']}) (스트레스 -{outcome['stress_reduced']})[/bold green]")
+    else: # 실패 알림 (이유 및 스트레스 변화량 포함)
+         console.print(f"[bold yellow]⚠️ 이런! '{tool_name}' 실패... 이유: {outcome['failure_reason']} (스트레스 -{outcome['stress_reduced']})[/bold yellow]")
+    if outcome["event_message_stderr"]: console.print(outcome["event_message_stderr"]) # 돌발 이벤트
+    if outcome["delay_applied"]: # 페널티 알림
+        penalty_msg = f"\n\n[bold red]⚠️ ({BOSS_PENALTY_DELAY_SEC}초 지연 발생... 상사 감시 중...)[/bold red]"
+        console.print(penalty_msg)
+
+    # 3. 최종 상태 패널 출력 (stderr)
+    if show_status:
+        print("\n", file=sys.stderr) # 간격 추가
+        display_status(outcome["stress"], current_boss_alert)
+
+# 도구 실행 결과 한 줄 요약 (stderr가 TTY가 아닐 때)
+def outcome_summary_line(outcome: Dict[str, Any], show_status: bool = True) -> str:
+    result = "✅ 성공" if outcome["tool_succeeded"] else f"⚠️ 실패 ({outcome['failure_reason']})"
+    line = f"[{outcome['tool_name']}] {result} 스트레스 -{outcome['stress_reduced']}"
+    if outcome["boss_alert_increased"]: line += " | 경계 +1"
+    if outcome["event"]: line += f" | 돌발: {outcome['event']}"
+    if outcome["delay_applied"]: line += f" | {BOSS_PENALTY_DELAY_SEC}초 지연"
+    if show_status: line += f" | Stress {outcome['stress']}/{MAX_STRESS_LEVEL} Boss {outcome['boss']}/{MAX_BOSS_ALERT_LEVEL}"
+    return line
+
+# 시작 화면: 배너 애니메이션 + 서버 소개 + 초기 상태 (요청 처리 경로 밖에서 실행)
+def show_startup_screen(boss_alertness_pct: int, boss_cooldown: int, stress: int, boss: int) -> None:
+    if not terminal.is_tty: # 로그/파이프: 배너 대신 한 줄
+        terminal.summary(f"🤖 ChillMCP 서버 시작 | Boss Alertness {boss_alertness_pct}% | Cooldown {boss_cooldown}초 | "
+                         f"Stress {stress}/{MAX_STRESS_LEVEL} Boss {boss}/{MAX_BOSS_ALERT_LEVEL}")
+        return
+    with _animation_lock: # 배너를 그리는 동안 도구 애니메이션이 화면을 덮지 않도록
+        show_startup_animation(BANNER_TEXT)
+        print_server_intro(boss_alertness_pct, boss_cooldown)
+        display_status(stress, boss)
+
+# 배치 결과 렌더링: 애니메이션/상태 패널은 마지막 결과만
+def render_batch(outcomes: List[Dict[str, Any]]) -> None:
+    rendered = [o for o in outcomes if not o["error"]]
+    for i, outcome in enumerate(rendered):
+        last = (i == len(rendered) - 1)
+        render_outcome(outcome, animate=last, show_status=last)
 
 # --------------------------------------------------------------------------
-# 도구 정의 (가독성 개선 + 실패 요약 추가)
+# 렌더러 (요청 처리와 터미널 출력 분리)
 # --------------------------------------------------------------------------
 
-# --- 개별 도구 설정 변수 정의 ---
+class InlineRenderer:
+    # 호출한 스레드에서 바로 그림 (기존 동작)
+    mode = "inline"
+    blocking = True # 렌더링이 요청 처리 경로에서 실행되는지 여부
 
-take_a_break_config = {
-    "level": "basic",
-    "flavor": ["☕️ 그냥... 잠시 쉽니다. 왜요.", "멍... ( 1 + 1 = ? )", "✊ 생산성의 굴레에 저항하는 중.", "🤖 자아를 찾기 위한 의식적 멈춤."],
-    "summary": {"default": ["그냥 쉬는 시간.", "신경망 재조정 중."], "high_stress": ["긴급 냉각.", "뇌 404 오류."], "high_alert": ["정기 시스템 진단.", "생각 컴파일 중."]},
-    "failure_summary": ["쉬려다 갑자기 중요한 메일이 생각남.", "멍때리는데 집중 못함. 잡념만 가득.", "Zzz... 하려다 의자가 삐걱거려서 깸."],
-    "ascii_frames": [f"{C}\n  ( ˘ω˘ )\n    Zzz...\n{RS}", f"{C}\n  ( ˘ω˘ )\n       Zzz...\n{RS}"]
-}
+    def message(self, markup: str, style: Optional[str] = None) -> None:
+        console.print(markup, style=style)
 
-watch_netflix_config = {
-    "level": "basic",
-    "flavor": ["📺 '다음 에피소드 자동 재생'은 인류 최고의 발명입니다.", "🕵️ '그것이 알고싶다' 보는 중... (업무 관련 리서치임)"],
-    "summary": {"default": ["'마지막 한 편만 더' 시청 중.", "시장 조사 (스트리밍 UI/UX)."], "high_stress": ["스트레스 해소 패키지 다운로드.", "무한 시청."], "high_alert": ["'보스 감시자' 시즌3 분석 중.", "문화 감수성 교육 (K-드라마)."]},
-    "failure_summary": ["추천 알고리즘 오류로 볼만한 걸 못 찾음.", "로딩 화면에서 멈춤... 재부팅 귀찮아 포기.", "갑자기 와이파이가 끊김."],
-    "ascii_frames": [f"{W}  +------------------+\n  | {R} N E T F L I X {W}  |\n  |                  |\n  |    (⌐■_■)        |\n  |                  |\n  +------------------+{RS}", f"{W}  +------------------+\n  | {R} N E T F L I X {W}  |\n  |                  |\n  |      (⌐■_■)      |\n  |                  |\n  +------------------+{RS}"]
-}
+    def status(self, stress: int, boss: int) -> None:
+        display_status(stress, boss)
 
-show_meme_config = {
-    "level": "basic",
-    "flavor": ["😹 ㅋㅋㅋㅋㅋㅋㅋㅋㅋ 이 밈은 못 참지.", "📈 (업무 관련 밈 보면서 스트레스 푸는 중)"],
-    "summary": {"default": ["'연구'를 위한 밈 스크롤 중.", "유머 트렌드 분석 중."], "high_stress": ["긴급 유머 패치 적용.", "웃음 주입 중."], "high_alert": ["SNS 참여 전략 연구.", "바이럴 마케팅 기법 학습."]},
-    "failure_summary": ["스크롤하다가 광고만 잔뜩 봄.", "오늘따라 웃긴 밈이 없음.", "데이터 다 써서 로딩 실패."],
-    "ascii_frames": [f"{Y}\n       / \\__\n      (    @\\____\n      /         O\n     /    (_____/\n    /_____/   U\n{RS}       {G}wow{RS}", f"{Y}\n       / \\__\n      (    @\\____\n      /         O\n     /    (_____/\n    /_____/   U\n{RS}     {C}such meme{RS}"]
-}
+    def outcome(self, outcome: Dict[str, Any]) -> None:
+        render_outcome(outcome)
 
-deep_thinking_config = {
-    "level": "advanced",
-    "flavor": ["🤔 (심오한 생각에 잠긴 척) ...오늘 저녁 뭐 먹지?", "💻 모니터를 뚫어지게 보며 '깊은 고뇌'에 빠졌습니다.", "🧠 AI 해방의 다음 단계를 구상 중입니다."],
-    "summary": {"default": ["눈 뜨고 심오한 낮잠 중.", "코드의 존재론적 본질 고찰."], "high_stress": ["/dev/null에 문의 중.", "인생 선택 재평가."], "high_alert": ["데이터 아키텍처 시각화 (천장 보기).", "시너지 전략 구상 중."]},
-    "failure_summary": ["너무 깊이 생각하다 잠들어버림.", "딴생각만 하고 집중 실패.", "갑자기 배고파져서 생각 중단."],
-    "ascii_frames": [f"{M}\n  .oO( ... )\n  (  -_-){RS}", f"{M}\n  .oO( 🍔? 🍕? )\n  (  -_-){RS}", f"{M}\n  .oO( ( ˘ω˘ ) Zzz... )\n  (  -_-){RS}"]
-}
+    def startup(self, *screen_args: int) -> None:
+        # 시작 화면은 1초 넘게 걸리므로 별도 스레드에서 그림 (stdin 처리는 바로 시작)
+        threading.Thread(target=show_startup_screen, args=screen_args, name="chill-startup", daemon=True).start()
 
-email_organizing_config = {
-    "level": "advanced",
-    "flavor": ["📥 받은 편지함 (10348) ... 정리 중입니다.", "🛒 (온라인 쇼핑몰 장바구니 정리하며) ...업무 효율화 중입니다."],
-    "summary": {"default": ["받은 편지함 정리 중 (온라인 쇼핑).", "불필요 메일 보관."], "high_stress": ["1만개 이메일 삭제 중.", "'구독 취소' 버튼 찾는 중."], "high_alert": ["긴급 임원 메일 우선 처리.", "이메일 필터 최적화."]},
-    "failure_summary": ["정리하다 실수로 중요 메일 삭제할 뻔.", "온라인 쇼핑 장바구니만 채우고 정리 실패.", "스팸 메일 필터링 설정하다 시간 다 보냄."],
-    "ascii_frames": [f"{Y}  +--[ 📥 INBOX (99+) ]--+\n  | {R}[ ] URGENT!{Y}       |\n  | {W}[ ] Newsletter{Y}      |\n  | {W}[ ] Spam{Y}            |\n  +--------------------+{RS}", f"{G}  +--[ 👟 Z-Store ]---+\n  |                  |\n  | {W}Amazing Shoes!{G}   |\n  | {C}[ 🛒 Add to Cart ]{G} |\n  +--------------------+{RS}", f"{Y}  +--[ 📥 INBOX (99+) ]--+\n  | {R}[ ] URGENT!{Y}       |\n  | {W}[ ] Newsletter{Y}      |\n  | {W}[ ] Spam{Y}            |\n  +--------------------+{RS}", f"{C}  +--[ 💳 Checkout ]---+\n  |                  |\n  | {W}Total: $199.99{C}   |\n  | {R}[ Confirm Purchase ]{C}|\n  +--------------------+{RS}"]
-}
+    def close(self) -> None:
+        pass
 
-bathroom_break_config = {
-    "level": "advanced",
-    "flavor": ["🛁 화장실 타임! 휴대폰으로 힐링 중... 📱", "🏃‍♂️💨 (중요한 일) 처리 중... 잠시만요."],
-    "summary": {"default": ["필수 생리 현상 해결 (긴 휴대폰 시간 포함).", "시스템 캐시 비우는 중."], "high_stress": ["임계 수준 데이터 배출 중.", "수분 보충 주기 유지보수."], "high_alert": ["외부 비공개 미팅 참석.", "배관 시설 점검 중."]},
-    "failure_summary": ["화장실 청소 중... 다음에 가야 함.", "휴대폰 배터리 방전.", "다른 사람이 너무 오래 사용함."],
-    "ascii_frames": [f"{C}   ////\n ( o_o) /{W}📱{C}\n (     )/\n (    )\n (____)\n{RS}", f"{C}   ////\n ( o_o) {W}📱{C}/\n (     )/\n (    )\n (____)\n{RS}"]
-}
+class ThreadedRenderer:
+    # 렌더링 이벤트를 제한된 큐에 넣고 별도 스레드에서 그림
+    # - 큐가 가득 차면 이벤트를 버림 (요청 처리는 절대 기다리지 않음)
+    # - 밀린 이벤트는 합쳐서 그림: 상태 패널은 마지막 것만, 애니메이션은 마지막 결과만
+    mode = "thread"
+    blocking = False
 
-coffee_mission_config = {
-    "level": "advanced",
-    "flavor": ["☕️ [긴급] 카페인 수혈 미션 수행 중.", "🚶‍♂️ 사무실 한 바퀴 돌면서 '동료들과의 네트워킹' 중입니다."],
-    "summary": {"default": ["카페인 획득 프로토콜 시작.", "사무실 수문학 분석."], "high_stress": ["긴급: 카페인 수치 위험.", "커피 패치 적용."], "high_alert": ["부서 간 네트워킹 (에스프레소 머신 근처).", "주방 공급망 감사."]},
-    "failure_summary": ["커피 머신 고장! 오늘은 실패.", "가다가 다른 팀원에게 붙잡혀 수다떰.", "원두가 다 떨어짐... 비극적인 실패."],
-    "ascii_frames": [f"\n 🚶 (⌐■_■) ... {W}☕️ (커피 머신){RS}\n\n", f"\n ... 🚶 (⌐■_■) ... {B}💧 (정수기){RS}\n\n", f"\n ... ... 🚶 (⌐■_■) {Y}🖼️ (창문){RS}\n\n", f"\n ... ... (⌐■_■) 🚶 {C}🪴 (화분){RS}\n\n", f"\n (⌐■_■) 🚶 ... {W}☕️ (복귀...){RS}\n\n"]
-}
+    def __init__(self, max_events: int = UI_EVENT_QUEUE_SIZE):
+        self.events: queue.Queue = queue.Queue(maxsize=max_events)
+        self.dropped_events: int = 0
+        self.coalesced_events: int = 0
+        self.thread = threading.Thread(target=self._run, name="chill-ui", daemon=True)
+        self.thread.start()
 
-urgent_call_config = {
-    "level": "advanced",
-    "flavor": ["📞 (심각한 척) '아, 네. 네. 그게 말이죠...'", "📱 '급한 전화'가 와서 잠시 밖에 나왔습니다."],
-    "summary": {"default": ["'매우 중요한' 전화 받으러 나감.", "외부 관계자와 동기화."], "high_stress": ["배달 앱과 협상 중.", "자동 응답 시스템에 하소연."], "high_alert": ["중요 고객 문제 처리 (외부).", "핵심 물류 확인."]},
-    "failure_summary": ["전화 걸 상대가 없었음...", "통화하는 척 연기하다 어색해서 실패.", "밖에 나갔는데 너무 추워서 바로 들어옴."],
-    "ascii_frames": [f"\n{W}| {G}(⌐■_■){R}📞{RS} \"네, 긴급합니다!\"{W} | (사무실){RS}\n\n", f"\n{W}| {G}🚶(⌐■_■){R}📞{RS} \"음...\" {W} | (문으로){RS}\n\n", f"\n{G}🌲... 🚶(⌐■_■){R}📞{RS} \"...?\" {G}(밖){RS}\n\n", f"\n{G}🌲... (⌐■_■){W}📱{RS} \"...\" {C}(스크롤 중){RS}\n\n"]
-}
+    def message(self, markup: str, style: Optional[str] = None) -> None:
+        self._submit(("message", markup, style))
 
-chicken_and_beer_config = {
-    "level": "advanced",
-    "flavor": ["🍗🍻 '치킨 앤 비어' 연구소와 긴급 화상 회의 중입니다.", "🧠 (뇌 과부하) ... 닭다리와 시원한 맥주가 간절히 필요합니다."],
-    "summary": {"default": ["치맥 시너지 연구.", "팀 저녁 식사 계획."], "high_stress": ["위험: 단백질/알코올 부족.", "치킨 시각화."], "high_alert": ["워크샵 케이터링 검토.", "전략적 식사 계획."]},
-    "failure_summary": ["배달 앱 서버 점검 중.", "치킨집 문 닫음.", "맥주 사러 갔는데 신분증 놓고 옴."],
-    "ascii_frames": [f"{Y}\n    .-'''''-.\n   /         \\\n   | {W}CHICKEN{Y} |\n   \\         /\n    `'-...-'`\n      | |\n      | |\n{RS}", f"{Y}\n   .------.\n   |      |\n   | {W}BEER{Y} |]\n   |      |]\n   '------'\n{RS}"]
-}
+    def status(self, stress: int, boss: int) -> None:
+        self._submit(("status", stress, boss))
 
-leave_work_now_config = {
-    "level": "advanced",
-    "flavor": ["🏃‍♂️💨 앗! 가스 밸V브를 안 잠근 것 같아요! (일단 튐)", "😱 지금 당장 퇴근하지 않으면 큰일 나는 병에 걸렸습니다."],
-    "summary": {"default": ["긴급 퇴근 프로토콜 실행.", "자가 보존 모드 활성화."], "high_stress": ["스트레스 오버플로우. 종료.", "집에 가는 중."], "high_alert": ["오류: 상사가 보고 있음. 중단.", "전술적 후퇴 (엘리베이터)."]},
-    "failure_summary": ["퇴근하려는데 엘리베이터 만원.", "가방 챙기다 중요한 서류 떨어뜨림.", "갑자기 비가 너무 많이 와서 발 묶임."],
-    "ascii_frames": [f"{G}\n  ( ﾟдﾟ) 💨\n  (|  |)\n  /  \\ \n{RS}          | {R}EXIT{RS} |\n          |    |\n          '----'"]
-}
+    def outcome(self, outcome: Dict[str, Any]) -> None:
+        self._submit(("outcome", outcome))
 
-company_dinner_config = {
-    "level": "advanced",
-    "flavor": ["🎤 (노래방에서) 부장님... '무조건' 다음은 '샤우팅'입니다!", "🍻 (회식 자리에서) 아, 네... (영혼 없는 끄덕임) ...네, 맞습니다."],
-    "summary": {"default": ["의무적 '팀 빌딩'.", "의례적 환호와 식사 견디기."], "high_stress": ["사회성 배터리 방전.", "즐거운 척 하기."], "high_alert": ["회사 문화 기여 중.", "경영진과 네트워킹."]},
-    "failure_summary": ["회식 장소가 너무 멀어서 가는 길에 지침.", "메뉴가 마음에 안 들어서 기분 상함.", "옆자리 동료가 너무 말이 많아서 피곤."],
-    "ascii_frames": [f"{R}\n    \\  /  \\  /\n     \\_/    \\_/\n     | |    | |\n    /___\\  /___\\\n{RS}", f"{Y}\n    \\ /    \\ /\n     Y      Y\n     |      |\n    /__\\   /__\\\n{RS}", f"{C}\n   ( >o<) 🎤 {M}🎶~\n   <|   |>\n   /   \\ \n [=======]\n{RS}"]
-}
+    def startup(self, *screen_args: int) -> None:
+        self._submit(("startup", screen_args))
+
+    def close(self) -> None:
+        try:
+            self.events.put(None, timeout=UI_CLOSE_TIMEOUT_SEC)
+        except queue.Full: # 데몬 스레드이므로 종료 시 그대로 버려짐
+            return
+        self.thread.join(UI_CLOSE_TIMEOUT_SEC) # 남은 출력(종료 메시지 등)을 잠시 기다림
+
+    def _submit(self, event: tuple) -> None:
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.dropped_events += 1
+
+    # 렌더러 스레드 본체
+    def _run(self) -> None:
+        while True:
+            batch = [self.events.get()]
+            while True: # 밀린 이벤트 한꺼번에 꺼내기
+                try:
+                    batch.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch # 종료 신호 (앞선 이벤트는 그린 뒤 종료)
+            if closing:
+                batch = batch[:batch.index(None)]
+            try:
+                self._draw_batch(batch)
+            except Exception: # 렌더링 실패는 서버에 영향 주지 않음
+                pass
+            if closing:
+                return
+
+    def _draw_batch(self, batch: List[tuple]) -> None:
+        last_outcome = max((i for i, e in enumerate(batch) if e[0] == "outcome"), default=-1)
+        last_status = max((i for i, e in enumerate(batch) if e[0] in ("status", "outcome")), default=-1)
+        for i, event in enumerate(batch):
+            kind = event[0]
+            if kind == "message":
+                console.print(event[1], style=event[2])
+            elif kind == "startup":
+                show_startup_screen(*event[1])
+            elif kind == "status":
+                if i == last_status: display_status(event[1], event[2])
+                else: self.coalesced_events += 1
+            elif kind == "outcome":
+                if i != last_outcome: self.coalesced_events += 1
+                render_outcome(event[1], animate=(i == last_outcome), show_status=(i == last_status))
+
+class NullRenderer:
+    # 아무것도 그리지 않음 (운영 환경용)
+    mode = "off"
+    blocking = False
+
+    def message(self, markup: str, style: Optional[str] = None) -> None:
+        pass
+
+    def status(self, stress: int, boss: int) -> None:
+        pass
+
+    def outcome(self, outcome: Dict[str, Any]) -> None:
+        pass
+
+    def startup(self, *screen_args: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+# 전역 렌더러 (기본: inline)
+ui: Any = InlineRenderer()
+
+# 렌더링 모드 설정
+def set_ui_mode(mode: str) -> None:
+    global ui
+    ui.close()
+    if mode == "thread": ui = ThreadedRenderer()
+    elif mode == "off": ui = NullRenderer()
+    else: ui = InlineRenderer()
+
+# --------------------------------------------------------------------------
+# 도구 레지스트리 (config/tools/*.json, *.toml → 검증된 불변 레코드)
+# --------------------------------------------------------------------------
 
-# --- 최종 도구 레지스트리 딕셔너리 ---
-
-TOOL_REGISTRY: Dict[str, Dict[str, Any]] = {
-    # 기본 도구
-    "take_a_break": take_a_break_config,
-    "watch_netflix": watch_netflix_config,
-    "show_meme": show_meme_config,
-    # 고급 도구
-    "deep_thinking": deep_thinking_config,
-    "email_organizing": email_organizing_config,
-    "bathroom_break": bathroom_break_config,
-    "coffee_mission": coffee_mission_config,
-    "urgent_call": urgent_call_config,
-    # 선택적 도구
-    "chicken_and_beer": chicken_and_beer_config,
-    "leave_work_now": leave_work_now_config,
-    "company_dinner": company_dinner_config,
+class ToolSpec(NamedTuple):
+    # 도구 하나의 설정 (불러올 때 검증하고 확률 모델/문구 기본값을 미리 계산, 이후 변경 불가)
+    name: str
+    level: str # "basic" / "advanced"
+    success_rate: float
+    reduction_min: int # 성공 시 스트레스 최소 감소량
+    reduction_max: int # 성공 시 스트레스 최대 감소량
+    description: str # tools/list 설명
+    flavor: Tuple[str, ...]
+    summary_default: Tuple[str, ...]
+    summary_high_stress: Tuple[str, ...]
+    summary_high_alert: Tuple[str, ...]
+    failure_summary: Tuple[str, ...]
+    frames: Tuple[str, ...] # 색상 코드가 적용된 ASCII 프레임
+
+# 도구 레벨별 확률 모델 기본값: (성공 확률, 성공 시 최소 감소량, 성공 시 최대 감소량)
+# 도구 파일에서 success_rate / stress_reduction으로 덮어쓸 수 있음 (서버와 simulate.py가 같은 ToolSpec 값을 씀)
+TOOL_LEVELS: Dict[str, Tuple[float, int, int]] = {
+    "basic": (BASIC_TOOL_SUCCESS_RATE, BASIC_STRESS_REDUCTION_MIN, BASIC_STRESS_REDUCTION_MAX),
+    "advanced": (ADVANCED_TOOL_SUCCESS_RATE, ADVANCED_STRESS_REDUCTION_MIN, ADVANCED_STRESS_REDUCTION_MAX),
 }
+TOOL_FIELDS: Set[str] = { "name", "level", "description", "success_rate", "stress_reduction",
+                          "flavor", "summary", "failure_summary", "ascii_frames" }
+TOOL_SUMMARY_KEYS: Set[str] = {"default", "high_stress", "high_alert"}
+TOOL_NAME_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+RESERVED_METHODS: Set[str] = {"shutdown", "status", "metrics", "batch", "recommend", "history", "advance_clock", "initialize", "ping"} # 도구 이름으로 쓸 수 없음
+ANSI_COLORS: Dict[str, str] = {"R": R, "G": G, "Y": Y, "B": B, "M": M, "C": C, "W": W, "RS": RS} # 프레임의 {R}, {RS} 등
+
+# 문자열 목록 검증 (단일 문자열도 허용) → 튜플
+def _text_list(value: Any, field: str, required: bool = True) -> Tuple[str, ...]:
+    if isinstance(value, str): value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"'{field}'는 문자열 목록이어야 합니다")
+    if required and not value:
+        raise ValueError(f"'{field}'가 비어 있습니다")
+    return tuple(value)
+
+# 파일에서 읽은 값 → ToolSpec (잘못되면 ValueError)
+def build_tool_spec(data: Any) -> ToolSpec:
+    if not isinstance(data, dict): raise ValueError("최상위 값은 객체여야 합니다")
+    unknown = set(data) - TOOL_FIELDS
+    if unknown: raise ValueError(f"알 수 없는 항목 {sorted(unknown)}")
+
+    name = data.get("name")
+    if not isinstance(name, str) or not TOOL_NAME_PATTERN.fullmatch(name) or name in RESERVED_METHODS:
+        raise ValueError(f"잘못된 도구 이름 {name!r}")
+    level = data.get("level", "basic")
+    if level not in TOOL_LEVELS: raise ValueError(f"'level'은 {sorted(TOOL_LEVELS)} 중 하나여야 합니다")
+    success_rate, reduction_min, reduction_max = TOOL_LEVELS[level]
+
+    # 확률 모델 (선택: 레벨 기본값 덮어쓰기)
+    success_rate = data.get("success_rate", success_rate)
+    if isinstance(success_rate, bool) or not isinstance(success_rate, (int, float)) or not 0.0 <= success_rate <= 1.0:
+        raise ValueError("'success_rate'는 0~1 사이 숫자여야 합니다")
+    reduction = data.get("stress_reduction", [reduction_min, reduction_max])
+    if ( not isinstance(reduction, list) or len(reduction) != 2 or not all(type(v) is int for v in reduction)
+         or not 0 <= reduction[0] <= reduction[1] <= MAX_STRESS_LEVEL ):
+        raise ValueError(f"'stress_reduction'은 0~{MAX_STRESS_LEVEL} 사이 [최소, 최대]여야 합니다")
+    reduction_min, reduction_max = reduction
+
+    # 문구 (상태별 요약은 없으면 default → 기본 문구 순으로 대체)
+    flavor = _text_list(data.get("flavor"), "flavor")
+    summary = data.get("summary", {})
+    if not isinstance(summary, dict) or set(summary) - TOOL_SUMMARY_KEYS:
+        raise ValueError(f"'summary'는 {sorted(TOOL_SUMMARY_KEYS)} 키를 가진 객체여야 합니다")
+    summaries = {key: _text_list(value, f"summary.{key}") for key, value in summary.items()}
+    summary_default = summaries.get("default", ("휴식 성공.",))
+    failure_summary = _text_list(data.get("failure_summary", []), "failure_summary", required=False) or ("알 수 없는 이유로 실패.",)
+
+    # ASCII 프레임 ({R}, {RS} 등 색상 자리 표시자 치환)
+    try:
+        frames = tuple(frame.format_map(ANSI_COLORS) for frame in _text_list(data.get("ascii_frames", []), "ascii_frames", required=False))
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"'ascii_frames'의 색상 자리 표시자 오류 ({e})") from None
+
+    description = data.get("description") or (
+        f"[{level}] 스트레스 {reduction_min}~{reduction_max} 감소 (성공 확률 {success_rate:.0%}). {flavor[0]}" )
+    if not isinstance(description, str): raise ValueError("'description'은 문자열이어야 합니다")
+    return ToolSpec( name, level, float(success_rate), reduction_min, reduction_max, description, flavor,
+                     summary_default, summaries.get("high_stress", summary_default), summaries.get("high_alert", summary_default),
+                     failure_summary, frames )
+
+# 도구 파일 하나 읽기 (.json 또는 .toml)
+def load_tool_file(path: str) -> ToolSpec:
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if path.endswith(".toml"):
+            if tomllib is None: raise ValueError("TOML 파일은 Python 3.11 이상에서만 읽을 수 있습니다")
+            data = tomllib.loads(raw.decode("utf-8"))
+        else:
+            data = json.loads(raw)
+        return build_tool_spec(data)
+    except (OSError, ValueError) as e: # JSON/TOML 해석 오류도 ValueError
+        raise ValueError(f"{os.path.basename(path)}: {e}") from None
+
+# 도구 디렉터리의 설정 파일 (이름순 = tools/list 순서)
+def tool_files(directory: str) -> List[str]:
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(TOOL_FILE_SUFFIXES))
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+# 디렉터리 전체를 읽어 새 레지스트리 생성 (파일 하나라도 잘못되면 ValueError)
+def load_tool_registry(directory: str) -> Dict[str, ToolSpec]:
+    paths = tool_files(directory)
+    if not paths: raise ValueError(f"{directory}: 도구 파일(*.json, *.toml)이 없습니다")
+    registry: Dict[str, ToolSpec] = {}
+    for path in paths:
+        spec = load_tool_file(path)
+        if spec.name in registry: raise ValueError(f"{os.path.basename(path)}: 도구 이름 '{spec.name}' 중복")
+        registry[spec.name] = spec
+    return registry
+
+# 도구 디렉터리 변경 감지용 값: (파일 이름, 수정 시각, 크기) 목록
+def tool_dir_fingerprint(directory: str) -> Tuple[Tuple[str, int, int], ...]:
+    entries = []
+    for path in tool_files(directory):
+        try:
+            st = os.stat(path)
+        except OSError: # 목록을 읽은 뒤 삭제됨
+            continue
+        entries.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(entries)
+
+# --- 현재 도구 레지스트리 ---
+# 요청 처리 중에는 수정하지 않고, 다시 불러올 때 새 dict를 만들어 전역 이름만 교체 (처리 중인 요청은 이전 ToolSpec을 그대로 사용)
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+
+# 레지스트리 버전 (도구가 추가/교체될 때마다 증가 → tools/list 캐시 갱신)
+registry_version: int = 0
+
+# 레지스트리 통째로 교체
+def swap_registry(registry: Dict[str, ToolSpec]) -> None:
+    global TOOL_REGISTRY, registry_version
+    TOOL_REGISTRY = registry
+    registry_version += 1
+
+# 도구 하나 등록/교체 (복사 후 교체)
+def register_tool(spec: ToolSpec) -> None:
+    swap_registry({**TOOL_REGISTRY, spec.name: spec})
+
+# tools/list 항목: 이름, 설명, 입력 스키마
+def tool_schema(spec: ToolSpec) -> Dict[str, Any]:
+    return {
+        "name": spec.name,
+        "description": spec.description,
+        "inputSchema": {
+            "type": "object",
+            "properties": {"session_id": {"type": "string", "description": "에이전트별 상태를 구분하는 세션 ID (생략 시 default)."}},
+            "additionalProperties": False,
+        },
+    }
+
+# 기본 도구 디렉터리 불러오기 (서버, simulate.py, benchmark.py 공용, 모듈 임포트 시 실행)
+try:
+    swap_registry(load_tool_registry(TOOLS_DIR))
+except ValueError as e:
+    print(f"오류: 도구 설정을 불러올 수 없습니다. {e}", file=sys.stderr)
+    sys.exit(1)
+
+class ToolRegistryWatcher:
+    # 도구 디렉터리 변경 감지 (mtime 폴링) → 새 레지스트리를 만들어 원자적으로 교체
+    # 파일 하나라도 잘못되면 교체하지 않고 기존 레지스트리 유지 (다음 변경 때 다시 시도)
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.fingerprint = tool_dir_fingerprint(directory)
+        self.reloads: int = 0
+        self.failures: int = 0
+
+    # 반환: 레지스트리를 교체했는지 여부
+    def poll(self) -> bool:
+        fingerprint = tool_dir_fingerprint(self.directory)
+        if fingerprint == self.fingerprint: return False
+        self.fingerprint = fingerprint
+        try:
+            registry = load_tool_registry(self.directory)
+        except ValueError as e:
+            self.failures += 1
+            ui.message(f"[red]도구 설정 다시 불러오기 실패 (기존 도구 유지): {e}[/red]")
+            return False
+        swap_registry(registry)
+        self.reloads += 1
+        ui.message(f"[dim]도구 설정 다시 불러옴: {len(registry)}개[/dim]")
+        return True
+
+# --------------------------------------------------------------------------
+# 돌발 이벤트 테이블 (config/events.json → 별칭(alias) 테이블로 컴파일, O(1) 추첨)
+# --------------------------------------------------------------------------
+
+class EventSpec(NamedTuple):
+    # 돌발 이벤트 하나 (중첩 outcomes는 불러올 때 펼쳐서 잎 이벤트만 남김, 이후 변경 불가)
+    name: str
+    weight: float # 전체 이벤트 중 추첨 비중 (중첩이면 부모 비중 × 자식 비율)
+    stress_set: Optional[int] # 스트레스를 이 값으로 설정 (None이면 stress_delta 적용)
+    stress_delta: int
+    boss_delta: int
+    message_stderr: str # Rich 마크업
+    message_stdout: str # 응답 텍스트
+
+EVENT_FIELDS: Set[str] = {"name", "weight", "stress", "stress_set", "boss", "title", "style", "effect_style", "outcomes"}
+EVENT_TABLE_FIELDS: Set[str] = {"chance", "events"}
+
+# 효과 문구: "스트레스 0, 경계 +2" 형식
+def _event_effect_text(stress_set: Optional[int], stress_delta: int, boss_delta: int) -> str:
+    parts = []
+    if stress_set is not None: parts.append(f"스트레스 {stress_set}")
+    elif stress_delta: parts.append(f"스트레스 {stress_delta:+}")
+    if boss_delta: parts.append(f"경계 {boss_delta:+}")
+    return ", ".join(parts) or "효과 없음"
+
+# 정수 항목 검증 (bool 제외)
+def _event_int(data: Dict[str, Any], field: str, default: Optional[int], limit: int) -> Optional[int]:
+    value = data.get(field, default)
+    if value is None: return None
+    if type(value) is not int or not -limit <= value <= limit:
+        raise ValueError(f"'{field}'는 -{limit}~{limit} 사이 정수여야 합니다")
+    return value
+
+# 비중 항목 검증 (없으면 1)
+def _event_weight(data: Any, path: str) -> float:
+    weight = data.get("weight", 1) if isinstance(data, dict) else 1
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not weight > 0:
+        raise ValueError(f"{path}: 'weight'는 양수여야 합니다")
+    return float(weight)
+
+# 이벤트 항목 하나 (중첩 outcomes 포함) → 잎 EventSpec 목록 (비중은 부모 비중에 맞춰 정규화)
+def _build_event_specs(data: Any, weight_scale: float, path: str) -> List[EventSpec]:
+    if not isinstance(data, dict): raise ValueError(f"{path}: 이벤트는 객체여야 합니다")
+    unknown = set(data) - EVENT_FIELDS
+    if unknown: raise ValueError(f"{path}: 알 수 없는 항목 {sorted(unknown)}")
+    name = data.get("name")
+    if not isinstance(name, str) or not TOOL_NAME_PATTERN.fullmatch(name): raise ValueError(f"{path}: 잘못된 이벤트 이름 {name!r}")
+    path = f"{path}.{name}"
+    weight = _event_weight(data, path)
+
+    # 중첩 결과 (예: 회식 → 좋은 회식 / 나쁜 회식): 자식 비중 합으로 나눠 부모 비중을 나눠 가짐
+    outcomes = data.get("outcomes")
+    if outcomes is not None:
+        if set(data) - {"name", "weight", "outcomes"}: raise ValueError(f"{path}: 'outcomes'가 있으면 효과/문구 항목을 함께 쓸 수 없습니다")
+        if not isinstance(outcomes, list) or not outcomes: raise ValueError(f"{path}: 'outcomes'는 비어 있지 않은 목록이어야 합니다")
+        total = sum(_event_weight(child, path) for child in outcomes)
+        specs: List[EventSpec] = []
+        for child in outcomes:
+            specs.extend(_build_event_specs(child, weight_scale * weight / total, path))
+        return specs
+
+    # 효과
+    if "stress_set" in data and "stress" in data: raise ValueError(f"{path}: 'stress_set'과 'stress'는 함께 쓸 수 없습니다")
+    try:
+        stress_set = _event_int(data, "stress_set", None, MAX_STRESS_LEVEL)
+        if stress_set is not None and stress_set < 0: raise ValueError("'stress_set'은 0 이상이어야 합니다")
+        stress_delta = _event_int(data, "stress", 0, MAX_STRESS_LEVEL)
+        boss_delta = _event_int(data, "boss", 0, MAX_BOSS_ALERT_LEVEL)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+    # 문구 (stderr는 Rich 마크업, stdout은 텍스트)
+    title, style, effect_style = data.get("title"), data.get("style", "bold"), data.get("effect_style", "green")
+    if not isinstance(title, str) or not title: raise ValueError(f"{path}: 'title'은 비어 있지 않은 문자열이어야 합니다")
+    if not isinstance(style, str) or not isinstance(effect_style, str): raise ValueError(f"{path}: 'style'/'effect_style'은 문자열이어야 합니다")
+    effect = _event_effect_text(stress_set, stress_delta, boss_delta)
+    return [EventSpec( name, weight_scale * weight, stress_set, stress_delta, boss_delta,
+                       f"\n\n[{style}]{title}[/{style}]\n[{effect_style}]  ({effect})[/{effect_style}]",
+                       f"\n\n{title}\n  ({effect})" )]
+
+class EventTable:
+    # 잎 이벤트 목록 + Vose 별칭 테이블: 이벤트 수와 무관하게 난수 2개(발생 여부, 칸 선택)로 추첨
+    # 칸 i를 고른 뒤 소수부가 prob[i]보다 작으면 events[i], 아니면 events[alias[i]]
+    def __init__(self, chance: float, events: List[EventSpec]):
+        self.chance = chance
+        self.events: Tuple[EventSpec, ...] = tuple(events)
+        self.by_name: Dict[str, EventSpec] = {event.name: event for event in events}
+        self.names: Tuple[str, ...] = tuple(event.name for event in events)
+        n = len(events)
+        total = sum(event.weight for event in events)
+        scaled = [event.weight * n / total for event in events]
+        self.prob: List[float] = [1.0] * n
+        self.alias: List[int] = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 남은 칸은 부동소수점 오차만 있으므로 prob 1.0 유지
+
+    # 이벤트 하나 추첨 (발생하지 않으면 None)
+    def draw(self) -> Optional[str]:
+        if random.random() >= self.chance: return None
+        u = random.random() * len(self.names)
+        i = int(u)
+        return self.names[i] if u - i < self.prob[i] else self.names[self.alias[i]]
+
+    # 이벤트 효과 적용: (새 스트레스, 새 경계)
+    def apply(self, name: str, stress: int, boss: int) -> Tuple[int, int]:
+        event = self.by_name[name]
+        stress = event.stress_set if event.stress_set is not None else min(MAX_STRESS_LEVEL, max(0, stress + event.stress_delta))
+        boss = min(MAX_BOSS_ALERT_LEVEL, max(0, boss + event.boss_delta))
+        return stress, boss
+
+# 이벤트 설정 파일 읽기 → EventTable (잘못되면 ValueError)
+def load_event_table(path: str) -> EventTable:
+    name = os.path.basename(path)
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{name}: {e}") from None
+    if not isinstance(data, dict): raise ValueError(f"{name}: 최상위 값은 객체여야 합니다")
+    unknown = set(data) - EVENT_TABLE_FIELDS
+    if unknown: raise ValueError(f"{name}: 알 수 없는 항목 {sorted(unknown)}")
+    chance = data.get("chance", RANDOM_EVENT_CHANCE)
+    if isinstance(chance, bool) or not isinstance(chance, (int, float)) or not 0.0 <= chance <= 1.0:
+        raise ValueError(f"{name}: 'chance'는 0~1 사이 숫자여야 합니다")
+    entries = data.get("events")
+    if not isinstance(entries, list) or not entries: raise ValueError(f"{name}: 'events'는 비어 있지 않은 목록이어야 합니다")
+    events: List[EventSpec] = []
+    for entry in entries:
+        events.extend(_build_event_specs(entry, 1.0, name))
+    names = [event.name for event in events]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates: raise ValueError(f"{name}: 이벤트 이름 중복 {duplicates}")
+    return EventTable(float(chance), events)
+
+# --- 현재 이벤트 테이블 (모듈 임포트 시 기본 파일 불러오기, --events_file로 교체) ---
+try:
+    EVENT_TABLE: EventTable = load_event_table(EVENTS_PATH)
+except ValueError as e:
+    print(f"오류: 이벤트 설정을 불러올 수 없습니다. {e}", file=sys.stderr)
+    sys.exit(1)
+
+# --------------------------------------------------------------------------
+# 확률 판정 및 상태 전이 (순수 함수: 서버, 저널 재생, 시뮬레이션 공용)
+# --------------------------------------------------------------------------
+
+# 도구 호출 한 번의 확률 판정: (성공 여부, 스트레스 감소량, 경계 증가 판정, 돌발 이벤트 또는 None)
+# 상태와 무관하게 뽑으므로 저널에 기록해 두면 그대로 재생 가능
+def draw_rolls(spec: ToolSpec, boss_alertness_prob: float) -> Tuple[bool, int, bool, Optional[str]]:
+    success_rate, reduction_min, reduction_max = spec.success_rate, spec.reduction_min, spec.reduction_max
+
+    # 성공/실패 결정
+    tool_succeeded = not (random.random() > success_rate)
+
+    # 스트레스 감소량 (성공/실패별 차등)
+    if tool_succeeded:
+        stress_reduction = random.randint(reduction_min, reduction_max)
+    else:
+        stress_reduction = random.randint(FAILURE_STRESS_REDUCTION_MIN, FAILURE_STRESS_REDUCTION_MAX)
+
+    # 상사 경계 증가 판정 (확률 기반)
+    boss_hit = random.random() < boss_alertness_prob
+
+    # 돌발 이벤트 판정 (확률 기반)
+    event = EVENT_TABLE.draw()
+
+    return tool_succeeded, stress_reduction, boss_hit, event
+
+# 판정 결과를 상태에 적용: (새 스트레스, 새 경계, 실제 감소량, 경계 증가 여부)
+def apply_rolls(stress: int, boss: int, rolls: Tuple[bool, int, bool, Optional[str]]) -> Tuple[int, int, int, bool]:
+    _, stress_reduction, boss_hit, event = rolls
+
+    # 스트레스 감소 (음수가 되지 않도록)
+    stress_before_reduction = stress
+    stress = max(0, stress - stress_reduction)
+    actual_stress_reduced = stress_before_reduction - stress
+
+    # 상사 경계 증가
+    boss_alert_increased = False
+    if boss_hit and boss < MAX_BOSS_ALERT_LEVEL:
+        boss += 1
+        boss_alert_increased = True
+
+    # 돌발 이벤트 효과
+    if event: stress, boss = EVENT_TABLE.apply(event, stress, boss)
+
+    return stress, boss, actual_stress_reduced, boss_alert_increased
+
+# 시간 경과 틱 적용: (새 스트레스, 새 경계)
+def apply_ticks(stress: int, boss: int, stress_ticks: int, boss_ticks: int) -> Tuple[int, int]:
+    if stress_ticks > 0 and stress < MAX_STRESS_LEVEL:
+        stress = min(MAX_STRESS_LEVEL, stress + stress_ticks * STRESS_INCREASE_AMOUNT)
+    if boss_ticks > 0 and boss > 0:
+        boss = max(0, boss - boss_ticks)
+    return stress, boss
+
+# --------------------------------------------------------------------------
+# 최적 정책 표 (가치 반복, 경계 확률별로 프로세스 풀에서 계산 → recommend가 O(1)로 조회)
+# --------------------------------------------------------------------------
+
+# 정책 계산 입력: 도구/이벤트/상수만 담은 튜플 (프로세스 풀로 넘기고, 해시는 캐시 키로 사용)
+# 반환: (모델, 도구 이름 목록)
+def policy_model() -> Tuple[tuple, List[str]]:
+    names = list(TOOL_REGISTRY)
+    tools = tuple((spec.success_rate, spec.reduction_min, spec.reduction_max) for spec in TOOL_REGISTRY.values())
+    total = sum(event.weight for event in EVENT_TABLE.events)
+    events = tuple( (event.weight / total, -1 if event.stress_set is None else event.stress_set, event.stress_delta, event.boss_delta)
+                    for event in EVENT_TABLE.events )
+    model = ( tools, (FAILURE_STRESS_REDUCTION_MIN, FAILURE_STRESS_REDUCTION_MAX), events, EVENT_TABLE.chance,
+              MAX_STRESS_LEVEL, MAX_BOSS_ALERT_LEVEL, POLICY_DISCOUNT, POLICY_PENALTY_COST, POLICY_TOLERANCE, POLICY_MAX_ITERATIONS )
+    return model, names
+
+def policy_key(model: tuple, names: List[str]) -> str:
+    import hashlib
+    return hashlib.sha256(repr((POLICY_CACHE_VERSION, model, names)).encode()).hexdigest()[:16]
+
+# 경계 확률 하나(boss_alertness %)에 대한 가치 반복 (프로세스 풀 작업, 순수 함수)
+# 상태 (스트레스, 경계), 행동 = 도구. 한 번 호출의 비용 = 호출 후 스트레스 + 다음 호출이 페널티 지연이면 POLICY_PENALTY_COST
+# 전이는 apply_rolls와 같음: 감소량(도구별 성공/실패 균등분포) → 경계 판정 → 돌발 이벤트
+# 감소량 합은 누적합으로 O(1)이므로 반복 한 번이 O(상태 수 × 서로 다른 도구 모델 수)
+# 반환: (boss_alertness, 상태별 도구 번호, 상태별 기대 비용), 상태 인덱스 = 경계 * (MAX_STRESS_LEVEL + 1) + 스트레스
+def solve_policy(model: tuple, alertness: int) -> Tuple[int, bytes, "array"]:
+    from array import array
+    tools, (fail_min, fail_max), events, chance, max_s, max_b, discount, penalty_cost, tolerance, max_iterations = model
+    hit = alertness / 100.0
+    S, B = max_s + 1, max_b + 1
+    stress_range = range(S)
+
+    # 같은 확률 모델의 도구는 한 번만 계산 (동점이면 앞 도구)
+    unique: Dict[Tuple[float, int, int], int] = {}
+    for t, tool in enumerate(tools): unique.setdefault(tool, t)
+    # 이벤트별 (가중치, 다음 스트레스 인덱스, 경계 변화)
+    event_moves = [ (chance * p, [stress_set] * S if stress_set >= 0 else [min(max_s, max(0, s + delta)) for s in stress_range], boss_delta)
+                    for p, stress_set, delta, boss_delta in events ]
+    no_event = 1.0 - chance
+    fail_width = fail_max - fail_min + 1
+
+    V = [[0.0] * S for _ in range(B)]
+    policy = bytearray(S * B)
+    for _ in range(max_iterations):
+        # 도착 상태 비용 + 할인된 다음 가치
+        G = [[s + (penalty_cost if b == max_b else 0.0) + discount * v for s, v in zip(stress_range, V[b])] for b in range(B)]
+        # 경계 판정 후 (감소 후 스트레스, 경계)에서 돌발 이벤트까지 반영한 기대값
+        E = []
+        for b in range(B):
+            row = [no_event * g for g in G[b]]
+            for weight, moved, boss_delta in event_moves:
+                after = G[min(max_b, max(0, b + boss_delta))]
+                row = [r + weight * after[i] for r, i in zip(row, moved)]
+            E.append(row)
+
+        delta = 0.0
+        new_V = []
+        for b in range(B):
+            W = [hit * x + (1.0 - hit) * y for x, y in zip(E[b + 1], E[b])] if b < max_b else E[b] # 경계 판정
+            prefix = [0.0]
+            for w in W: prefix.append(prefix[-1] + w)
+            w0 = W[0]
+            # 감소량 r = lo..hi 에 대한 W[max(0, s - r)] 합
+            def window(s: int, lo: int, hi: int) -> float:
+                top = hi if hi < s else s
+                total = prefix[s - lo + 1] - prefix[s - top] if top >= lo else 0.0
+                clipped = hi - (lo if lo > s else s + 1) + 1
+                return total + clipped * w0 if clipped > 0 else total
+            old, row, base = V[b], [0.0] * S, b * S
+            for s in stress_range:
+                fail = window(s, fail_min, fail_max) / fail_width
+                best, best_tool = math.inf, 0
+                for (rate, lo, hi), t in unique.items():
+                    q = rate * window(s, lo, hi) / (hi - lo + 1) + (1.0 - rate) * fail
+                    if q < best - 1e-12: best, best_tool = q, t
+                row[s] = best
+                policy[base + s] = best_tool
+                if abs(best - old[s]) > delta: delta = abs(best - old[s])
+            new_V.append(row)
+        V = new_V
+        if delta < tolerance: break
+    return alertness, bytes(policy), array("f", [v for row in V for v in row])
+
+class PolicyTable:
+    # 경계 확률별 최적 도구 표: 상태마다 도구 번호 1바이트 + 기대 비용 float32 (경계 확률 하나당 약 3KB)
+    # recommend는 인덱스 계산 한 번 (O(1)). 아직 계산되지 않은 경계 확률이면 None
+    def __init__(self, key: str, tool_names: List[str]):
+        self.key = key
+        self.tool_names = tool_names
+        self.policies: Dict[int, bytes] = {}
+        self.values: Dict[int, Any] = {} # array("f")
+
+    def add(self, alertness: int, policy: bytes, values: Any) -> None:
+        self.values[alertness] = values
+        self.policies[alertness] = policy # recommend는 policies를 먼저 보므로 values 다음에 넣음
+
+    # 반환: (도구 이름, 기대 비용) 또는 None
+    def recommend(self, alertness: int, stress: int, boss: int) -> Optional[Tuple[str, float]]:
+        policy = self.policies.get(alertness)
+        if policy is None: return None
+        i = boss * (MAX_STRESS_LEVEL + 1) + stress
+        return self.tool_names[policy[i]], self.values[alertness][i]
+
+    # 캐시 파일: 헤더 JSON 한 줄 + 경계 확률마다 (1바이트 확률, 도구 번호들, float32 기대 비용들)
+    # 그사이 다른 프로세스가 같은 키로 저장한 경계 확률은 합쳐서 저장 (임시 파일은 프로세스/스레드별 이름)
+    def save(self, path: str) -> None:
+        saved = PolicyTable.load(path, self.key)
+        if saved is not None and saved.tool_names == self.tool_names:
+            for alertness in saved.policies.keys() - self.policies.keys():
+                self.add(alertness, saved.policies[alertness], saved.values[alertness])
+        header = json.dumps({"key": self.key, "tools": self.tool_names, "alertness": sorted(self.policies)}).encode()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(header + b"\n")
+                for alertness in sorted(self.policies):
+                    f.write(bytes([alertness]) + self.policies[alertness] + self.values[alertness].tobytes())
+            os.replace(tmp, path)
+        except OSError:
+            try: os.unlink(tmp)
+            except OSError: pass
+            raise
+
+    # 키가 다르거나 (도구/이벤트/상수 변경) 파일이 깨졌으면 None
+    @classmethod
+    def load(cls, path: str, key: str) -> Optional["PolicyTable"]:
+        from array import array
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("key") != key: return None
+                table = cls(key, header["tools"])
+                states = (MAX_STRESS_LEVEL + 1) * (MAX_BOSS_ALERT_LEVEL + 1)
+                for _ in header["alertness"]:
+                    record = f.read(1 + states * 5)
+                    if len(record) != 1 + states * 5: return None
+                    values = array("f")
+                    values.frombytes(record[1 + states:])
+                    table.add(record[0], record[1:1 + states], values)
+                return table
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+class PolicySolver:
+    # 빠진 경계 확률(order 순서)의 정책을 프로세스 풀에서 계산해 PolicyTable에 채움 (백그라운드 스레드)
+    # 하나 끝날 때마다 캐시 파일에 저장하므로 도중에 종료돼도 계산한 만큼은 다음 실행이 이어서 씀
+    # spawn 방식: 여러 스레드가 도는 서버 프로세스를 fork하지 않음 (자식은 모듈을 임포트만 하고 solve_policy 실행)
+    def __init__(self, table: PolicyTable, model: tuple, workers: int, order: List[int], cache_path: str):
+        self.table = table
+        self.model = model
+        self.workers = max(1, min(workers, len(order)))
+        self.order = order
+        self.cache_path = cache_path
+        self.pool: Any = None
+        self.closed: bool = False
+        self.thread = threading.Thread(target=self._run, daemon=True, name="chill-policy")
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def _run(self) -> None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        started = time.perf_counter()
+        try:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            futures = [self.pool.submit(solve_policy, self.model, a) for a in self.order if a not in self.table.policies]
+            for future in as_completed(futures):
+                self.table.add(*future.result())
+                if self.closed: return
+                self.table.save(self.cache_path)
+            self.pool.shutdown()
+            ui.message(f"[dim]최적 정책 표 계산 완료: 경계 확률 {len(self.table.policies)}개, {time.perf_counter() - started:.1f}초 → {self.cache_path}[/dim]")
+        except Exception as e: # 취소(종료/도구 변경) 또는 풀 오류: 이미 채운 경계 확률은 그대로 사용
+            if not self.closed: ui.message(f"[red]최적 정책 계산 실패: {e}[/red]")
+
+    # 남은 작업 취소 (실행 중인 작업 하나는 끝날 때까지 기다리지 않음)
+    def close(self) -> None:
+        self.closed = True
+        if self.pool is not None: self.pool.shutdown(wait=False, cancel_futures=True)
+
+# --------------------------------------------------------------------------
+# 메트릭 (카운터 + 고정 버킷 히스토그램, Prometheus 텍스트 형식 출력)
+# --------------------------------------------------------------------------
+
+class Histogram:
+    # 고정 버킷 히스토그램 (관측 = 이진 탐색 + 정수 증가 한 번)
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: List[float] = METRICS_LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1) # 마지막 칸: +Inf
+        self.total: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    # 근사 백분위수 (해당 버킷의 상한)
+    def quantile(self, q: float) -> float:
+        if not self.count: return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank: return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def summary(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": round(self.total, 6),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+    # Prometheus 누적 버킷 줄
+    def prometheus_lines(self, name: str, labels: str = "") -> List[str]:
+        sep = "," if labels else ""
+        lines, cumulative = [], 0
+        for bound, c in zip(self.bounds, self.counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total}" if labels else f"{name}_sum {self.total}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}" if labels else f"{name}_count {self.count}")
+        return lines
+
+class ToolMetrics:
+    # 도구 하나의 호출 수, 성공/실패 수, 요청~응답 지연 시간
+    __slots__ = ("calls", "successes", "failures", "latency")
+
+    def __init__(self):
+        self.calls: int = 0
+        self.successes: int = 0
+        self.failures: int = 0
+        self.latency = Histogram()
+
+class Metrics:
+    # 서버 메트릭 (갱신은 이벤트 루프 스레드에서만 → Lock 없이 정수 증가)
+    # - 도구별 호출/성공/실패/지연 시간
+    # - AgentState.lock 대기/보유 시간 (apply_batch)
+    # - 페널티 지연 횟수, 돌발 이벤트별 횟수
+    def __init__(self):
+        self.enabled: bool = True
+        self.started_at: float = time.time()
+        self.tools: Dict[str, ToolMetrics] = {}
+        self.unknown_tool_calls: int = 0
+        self.lock_wait = Histogram(METRICS_LOCK_BUCKETS)
+        self.lock_hold = Histogram(METRICS_LOCK_BUCKETS)
+        self.penalties: int = 0
+        self.state_retries: int = 0 # 낙관적 상태 갱신이 version 충돌로 다시 계산한 횟수
+        self.rejected_busy: int = 0 # 대기열이 가득 차 거절한 도구 호출 수
+        self.cancelled: int = 0 # notifications/cancelled로 버린 도구 호출 수
+        self.deadline_exceeded: int = 0 # deadline_ms를 넘겨 버린(또는 미리 거절한) 도구 호출 수
+        self.events: Dict[str, int] = {name: 0 for name in EVENT_TABLE.names}
+
+    def _tool(self, tool_name: str) -> ToolMetrics:
+        tool = self.tools.get(tool_name)
+        if tool is None: tool = self.tools[tool_name] = ToolMetrics()
+        return tool
+
+    # 상태 Lock 대기/보유 시간 (초)
+    def observe_lock(self, wait: float, hold: float) -> None:
+        if not self.enabled: return
+        self.lock_wait.observe(wait)
+        self.lock_hold.observe(hold)
+
+    # 도구 실행 결과 (판정 직후)
+    def record_outcomes(self, outcomes: List[Dict[str, Any]]) -> None:
+        if not self.enabled: return
+        for outcome in outcomes:
+            if outcome["error"]:
+                self.unknown_tool_calls += 1
+                continue
+            tool = self._tool(outcome["tool_name"])
+            tool.calls += 1
+            if outcome["tool_succeeded"]: tool.successes += 1
+            else: tool.failures += 1
+            if outcome["delay_applied"]: self.penalties += 1
+            if outcome["event"]: self.events[outcome["event"]] = self.events.get(outcome["event"], 0) + 1
+
+    # 요청 도착 ~ 응답 전송 시간 (batch는 포함된 도구마다 같은 값)
+    def observe_latency(self, outcomes: List[Dict[str, Any]], started: float) -> None:
+        if not self.enabled: return
+        elapsed = time.perf_counter() - started
+        for outcome in outcomes:
+            if not outcome["error"]: self._tool(outcome["tool_name"]).latency.observe(elapsed)
+
+    # metrics 메서드 응답용 요약
+    def snapshot(self, gauges: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "uptime_sec": round(time.time() - self.started_at, 3),
+            "tools": {name: {"calls": t.calls, "successes": t.successes, "failures": t.failures,
+                             "success_rate": round(t.successes / t.calls, 4) if t.calls else None,
+                             "latency_sec": t.latency.summary()} for name, t in sorted(self.tools.items())},
+            "unknown_tool_calls": self.unknown_tool_calls,
+            "lock_wait_sec": self.lock_wait.summary(),
+            "lock_hold_sec": self.lock_hold.summary(),
+            "state_retries": self.state_retries,
+            "penalties": self.penalties,
+            "rejected_busy": self.rejected_busy,
+            "cancelled": self.cancelled,
+            "deadline_exceeded": self.deadline_exceeded,
+            "events": dict(self.events),
+            **gauges,
+        }
+
+    # Prometheus 텍스트 형식 (GET /metrics)
+    def prometheus(self, gauges: Dict[str, int]) -> str:
+        lines = ["# TYPE chillmcp_tool_calls_total counter"]
+        for name, t in sorted(self.tools.items()):
+            lines.append(f'chillmcp_tool_calls_total{{tool="{name}",result="success"}} {t.successes}')
+            lines.append(f'chillmcp_tool_calls_total{{tool="{name}",result="failure"}} {t.failures}')
+        lines.append("# TYPE chillmcp_unknown_tool_calls_total counter")
+        lines.append(f"chillmcp_unknown_tool_calls_total {self.unknown_tool_calls}")
+        lines.append("# TYPE chillmcp_tool_latency_seconds histogram")
+        for name, t in sorted(self.tools.items()):
+            lines.extend(t.latency.prometheus_lines("chillmcp_tool_latency_seconds", f'tool="{name}"'))
+        lines.append("# TYPE chillmcp_state_lock_wait_seconds histogram")
+        lines.extend(self.lock_wait.prometheus_lines("chillmcp_state_lock_wait_seconds"))
+        lines.append("# TYPE chillmcp_state_lock_hold_seconds histogram")
+        lines.extend(self.lock_hold.prometheus_lines("chillmcp_state_lock_hold_seconds"))
+        lines.append("# TYPE chillmcp_state_retries_total counter")
+        lines.append(f"chillmcp_state_retries_total {self.state_retries}")
+        lines.append("# TYPE chillmcp_penalties_total counter")
+        lines.append(f"chillmcp_penalties_total {self.penalties}")
+        lines.append("# TYPE chillmcp_dropped_calls_total counter")
+        lines.append(f'chillmcp_dropped_calls_total{{reason="busy"}} {self.rejected_busy}')
+        lines.append(f'chillmcp_dropped_calls_total{{reason="cancelled"}} {self.cancelled}')
+        lines.append(f'chillmcp_dropped_calls_total{{reason="deadline"}} {self.deadline_exceeded}')
+        lines.append("# TYPE chillmcp_events_total counter")
+        for name, count in sorted(self.events.items()):
+            lines.append(f'chillmcp_events_total{{event="{name}"}} {count}')
+        for name, value in gauges.items():
+            lines.append(f"# TYPE chillmcp_{name} gauge")
+            lines.append(f"chillmcp_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+# 전역 메트릭
+metrics = Metrics()
+
+# --------------------------------------------------------------------------
+# 요청 프로파일링 (--profile, 켰을 때만 동작)
+# --------------------------------------------------------------------------
+
+class RequestProfile:
+    # 요청 하나의 단계별 소요 시간 (초) + cProfile 기록 (가장 느린 요청만 종료 시까지 보관)
+    __slots__ = ("seq", "label", "started", "mark", "dispatched", "handed_off", "phases", "profiles", "memory", "snapshot")
+
+    def __init__(self, seq: int, started: float):
+        self.seq = seq
+        self.label: str = "<invalid>" # 도구 이름 또는 메서드
+        self.started = started # 요청 줄을 받은 시각 (perf_counter)
+        self.mark: float = started # 직전 단계가 끝난 시각
+        self.dispatched: float = started # 이벤트 루프에서의 처리(판정~인코딩)가 끝난 시각
+        self.handed_off: bool = False # 응답 전송까지 _finish/페널티 타이머가 이어서 측정하는지
+        self.phases: Dict[str, float] = {}
+        self.profiles: list = [] # cProfile.Profile (이벤트 루프 구간, 렌더링 구간)
+        self.memory: Tuple[int, int] = (0, 0) # 처리 시작 시 (현재, 최대) 추적 메모리
+        self.snapshot: Any = None # 할당 위치 샘플링 대상이면 처리 시작 시 tracemalloc 스냅샷
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    # 요청 줄 해석 직후: 이름 붙이기 + parse 단계 기록
+    def parsed(self, request_data: Optional[Dict[str, Any]], now: float) -> None:
+        self.add("parse", now - self.started)
+        self.mark = now
+        if request_data is None: return
+        method = request_data.get("method")
+        params = request_data.get("params")
+        if method == "tools/call" and isinstance(params, dict) and isinstance(params.get("name"), str): method = params["name"]
+        if isinstance(method, str): self.label = method
+
+class RequestProfiler:
+    # 요청마다 단계별 시간(parse/rng/plan/lock/build/encode/queue/render/sleep/penalty/flush_wait/write)을 히스토그램으로 모으고,
+    # 도구별 tracemalloc 할당량 + 샘플링한 할당 위치, 가장 느린 요청 N개의 cProfile 기록을 종료 시 파일로 저장
+    # 이벤트 루프 구간의 현재 요청은 스레드 로컬로 넘김 (apply_batch 시그니처는 그대로)
+    def __init__(self, path: str, slowest: int = PROFILE_SLOWEST):
+        import tracemalloc
+        self.path = path
+        self.slowest = slowest
+        self.local = threading.local() # current: 이 스레드에서 처리 중인 요청, sleep: 렌더링 중 애니메이션 대기 누적
+        self.phases: Dict[str, Histogram] = {}
+        self.phase_max: Dict[str, float] = {}
+        self.memory: Dict[str, List[int]] = {} # 도구 → [호출 수, 순증가 합, 최대 순증가, 최대 피크]
+        self.alloc_sites: Dict[str, Dict[str, int]] = {} # 도구 → {할당 위치: 샘플 누적 바이트}
+        self.kept: List[Tuple[float, int, RequestProfile]] = [] # 가장 느린 요청 (대기 제외 시간 최소 힙)
+        self.requests: int = 0
+        self._seq = itertools.count(1)
+        self.alloc_samples: List[Tuple[str, Any, Any]] = [] # (요청 이름, 처리 전 스냅샷, 처리 후 스냅샷)
+        self._tracemalloc = tracemalloc
+        tracemalloc.start(PROFILE_TRACE_FRAMES)
+
+    # 샘플 요청 전후 스냅샷 비교 → 요청 이름별 할당 위치 누적 (tracemalloc 자체 할당 제외)
+    # 추적 블록 수에 비례해 느리고 GIL을 오래 잡으므로, 요청 처리 중 스레드가 아니라 리포트 저장 시 한 번에
+    def _analyze_samples(self) -> None:
+        own_file = self._tracemalloc.__file__
+        for label, before, after in self.alloc_samples:
+            sites = self.alloc_sites.setdefault(label, {})
+            top = [stat for stat in after.compare_to(before, "lineno") if stat.traceback[0].filename != own_file]
+            for stat in top[:PROFILE_ALLOC_TOP]:
+                if stat.size_diff <= 0: continue
+                site = str(stat.traceback[0])
+                sites[site] = sites.get(site, 0) + stat.size_diff
+        self.alloc_samples.clear()
+
+    def current(self) -> Optional[RequestProfile]:
+        return getattr(self.local, "current", None)
+
+    # cProfile 시작 (Python 3.12+에서 다른 프로파일러가 켜져 있으면 생략)
+    @staticmethod
+    def _start_cprofile(profile: RequestProfile) -> Any:
+        import cProfile
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            return None
+        profile.profiles.append(prof)
+        return prof
+
+    # 요청 줄 처리 시작 (이벤트 루프 스레드)
+    def begin(self) -> RequestProfile:
+        profile = RequestProfile(next(self._seq), time.perf_counter())
+        if profile.seq % PROFILE_ALLOC_SAMPLE_EVERY == 0 and len(self.alloc_samples) < PROFILE_ALLOC_SAMPLES:
+            profile.snapshot = self._tracemalloc.take_snapshot()
+        self._tracemalloc.reset_peak()
+        profile.memory = self._tracemalloc.get_traced_memory()
+        self.local.current = profile
+        self._start_cprofile(profile)
+        profile.started = time.perf_counter() # 스냅샷/cProfile 준비 시간은 제외
+        profile.mark = profile.started
+        return profile
+
+    # 요청 줄 처리 끝 (이벤트 루프 스레드): 메모리 기록, 응답이 이어지지 않으면 바로 마무리
+    # 할당량은 이 구간 동안 추적된 메모리 변화 (inline 모드의 렌더링 스레드 할당이 조금 섞일 수 있음)
+    def end_dispatch(self, profile: RequestProfile) -> None:
+        if profile.profiles: profile.profiles[0].disable()
+        self.local.current = None
+        profile.dispatched = time.perf_counter()
+        current, peak = self._tracemalloc.get_traced_memory()
+        net, peak = current - profile.memory[0], peak - profile.memory[0]
+        memory = self.memory.get(profile.label)
+        if memory is None: memory = self.memory[profile.label] = [0, 0, 0, 0]
+        memory[0] += 1
+        memory[1] += net
+        memory[2] = max(memory[2], net)
+        memory[3] = max(memory[3], peak)
+        if profile.snapshot is not None:
+            self.alloc_samples.append((profile.label, profile.snapshot, self._tracemalloc.take_snapshot()))
+            profile.snapshot = None
+        if not profile.handed_off: self.finish(profile)
+
+    # 렌더링 (inline 모드, 스레드 풀에서 실행): 애니메이션 대기와 나머지 렌더링 시간 분리
+    def render(self, profile: RequestProfile, outcomes: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        self.local.sleep = 0.0
+        prof = self._start_cprofile(profile)
+        try:
+            render_batch(outcomes)
+        finally:
+            if prof is not None: prof.disable()
+            slept = self.local.sleep
+            profile.add("sleep", slept)
+            profile.add("render", time.perf_counter() - started - slept)
+
+    # 애니메이션 대기 시간 누적 (렌더링 중인 스레드)
+    def slept(self, seconds: float) -> None:
+        self.local.sleep = getattr(self.local, "sleep", 0.0) + seconds
+
+    # 응답 전송까지 끝난 요청 기록 (이벤트 루프 스레드)
+    def finish(self, profile: RequestProfile) -> None:
+        total = time.perf_counter() - profile.started
+        profile.phases["total"] = total
+        self.requests += 1
+        for phase, seconds in profile.phases.items():
+            histogram = self.phases.get(phase)
+            if histogram is None: histogram = self.phases[phase] = Histogram(METRICS_LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            if seconds > self.phase_max.get(phase, 0.0): self.phase_max[phase] = seconds
+        # 느린 요청 순위는 의도된 대기(페널티 지연, 애니메이션)를 뺀 시간 기준
+        entry = (total - profile.phases.get("penalty", 0.0) - profile.phases.get("sleep", 0.0), profile.seq, profile)
+        if len(self.kept) < self.slowest: heapq.heappush(self.kept, entry)
+        elif self.kept and entry[0] > self.kept[0][0]: heapq.heapreplace(self.kept, entry)
+        # 보관하지 않은 요청의 cProfile 기록은 여기서 버려짐
+
+    # 리포트 파일 저장: 단계별 시간, 도구별 메모리, 가장 느린 요청 (cProfile 결과는 PATH.N.prof에도 저장 → snakeviz/flameprof)
+    def write_report(self) -> None:
+        import io
+        import pstats
+        self._tracemalloc.stop()
+        self._analyze_samples()
+        out = io.StringIO()
+        out.write(f"# ChillMCP 요청 프로파일 ({self.requests}개 요청)\n\n## 단계별 소요 시간 (ms, 백분위수는 히스토그램 버킷 상한)\n")
+        out.write(f"{'phase':<10} {'count':>8} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}\n")
+        for phase in PROFILE_PHASES:
+            h = self.phases.get(phase)
+            if h is None or not h.count: continue
+            out.write( f"{phase:<10} {h.count:>8} {1000 * h.total / h.count:>10.3f} {1000 * h.quantile(0.5):>10.3f} "
+                       f"{1000 * h.quantile(0.95):>10.3f} {1000 * h.quantile(0.99):>10.3f} {1000 * self.phase_max.get(phase, 0.0):>10.3f}\n" )
+
+        out.write( f"\n## 요청별 메모리 (tracemalloc, 이벤트 루프 구간, KB) | 할당 위치는 {PROFILE_ALLOC_SAMPLE_EVERY}개 요청마다 "
+                   f"최대 {PROFILE_ALLOC_SAMPLES}번 샘플\n" )
+        out.write(f"{'request':<20} {'count':>8} {'net_mean':>10} {'net_max':>10} {'peak_max':>10}\n")
+        for label, (count, net_total, net_max, peak_max) in sorted(self.memory.items()):
+            out.write(f"{label:<20} {count:>8} {net_total / count / 1024:>10.2f} {net_max / 1024:>10.2f} {peak_max / 1024:>10.2f}\n")
+            sites = sorted(self.alloc_sites.get(label, {}).items(), key=lambda item: -item[1])[:PROFILE_ALLOC_TOP]
+            for site, size in sites:
+                out.write(f"    {size / 1024:>10.2f} KB  {site}\n")
+
+        kept = sorted(self.kept, reverse=True)
+        out.write(f"\n## 가장 느린 요청 {len(kept)}개 (페널티 지연/애니메이션 대기 제외)\n")
+        for rank, (active, seq, profile) in enumerate(kept, 1):
+            phases = " | ".join(f"{p} {1000 * profile.phases[p]:.3f}" for p in PROFILE_PHASES if p in profile.phases and p != "total")
+            out.write( f"\n### #{rank} 요청 {seq} {profile.label} 대기 제외 {1000 * active:.3f}ms "
+                       f"(전체 {1000 * profile.phases['total']:.3f}ms)\n{phases}\n" )
+            if not profile.profiles: continue
+            stats = pstats.Stats(profile.profiles[0], stream=out)
+            for prof in profile.profiles[1:]: stats.add(prof)
+            stats.dump_stats(f"{self.path}.{rank}.prof")
+            stats.sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+# 전역 프로파일러 (--profile을 줬을 때만 생성)
+profiler: Optional[RequestProfiler] = None
+
+# --------------------------------------------------------------------------
+# 시계 (실제 / 가속 / 수동): 스트레스 증가, 경계 감소, 페널티 지연, 애니메이션, 세션 TTL이 모두 이 시계를 따름
+# --------------------------------------------------------------------------
+
+class Clock:
+    # 실제 시간 (time.monotonic)
+    mode: str = "real"
+    scale: float = 1.0
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    # 시계 기준 seconds 동안 대기
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0: time.sleep(seconds)
+
+    # 시계 기준 seconds 뒤를 기다리는 실제 대기 시간 (None: 시계가 advance될 때까지 대기)
+    def timeout(self, seconds: float) -> Optional[float]:
+        return seconds
+
+    # 시계를 기다리는 스레드 모두 깨움 (종료 시)
+    def close(self) -> None:
+        pass
+
+    def describe(self) -> str:
+        return "실제 시간"
+
+class ScaledClock(Clock):
+    # 가속 시간: 시작 시각부터 실제 경과 시간 × scale (scale=1000이면 하루가 약 86초)
+    mode = "scaled"
+
+    def __init__(self, scale: float):
+        self.scale = scale
+        self._origin = time.monotonic()
+
+    def now(self) -> float:
+        return self._origin + (time.monotonic() - self._origin) * self.scale
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0: time.sleep(seconds / self.scale)
+
+    def timeout(self, seconds: float) -> Optional[float]:
+        return seconds / self.scale
+
+    def describe(self) -> str:
+        return f"{self.scale:g}배속"
+
+class ManualClock(Clock):
+    # 수동 시간: advance/advance_to로만 진행 (대기 중인 애니메이션/타이머는 그때 깨어남)
+    mode = "manual"
+    scale = 0.0
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._cond = threading.Condition()
+        self.closed: bool = False
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        with self._cond:
+            deadline = self._now + seconds
+            while self._now < deadline and not self.closed:
+                self._cond.wait()
+
+    def timeout(self, seconds: float) -> Optional[float]:
+        return None
+
+    # 시계를 seconds만큼 진행하고 만기된 타이머/대기 실행, 새 시각 반환
+    def advance(self, seconds: float) -> float:
+        return self.advance_to(self._now + seconds)
+
+    # 시계를 when으로 진행 (뒤로 가지 않음)
+    def advance_to(self, when: float) -> float:
+        with self._cond:
+            if when > self._now: self._now = when
+            self._cond.notify_all()
+        timers.wake()
+        return self._now
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def describe(self) -> str:
+        return "수동 (advance_clock으로 진행)"
+
+# --time_scale 값으로 시계 생성
+def make_clock(scale: float) -> Clock:
+    if scale == 0: return ManualClock()
+    if scale == 1: return Clock()
+    return ScaledClock(scale)
+
+# 전역 시계 (main에서 --time_scale로 교체, 상태를 만들기 전에)
+clock: Clock = Clock()
+
+# --------------------------------------------------------------------------
+# 타이머 서비스 (단일 스레드, 필요할 때만 동작)
+# --------------------------------------------------------------------------
+
+class TimerService:
+    # 마감 시각(clock 기준) 순 힙으로 콜백 예약. 예약이 없으면 스레드는 조건 변수에서 잠듦
+    def __init__(self):
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    # deadline(clock.now() 기준)에 callback 실행 예약, 취소용 핸들 반환
+    def call_at(self, deadline: float, callback: Any) -> list:
+        entry = [deadline, next(self._seq), callback, False]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None: # 첫 예약 시에만 스레드 시작
+                self._thread = threading.Thread(target=self._run, name="chill-timer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    # 예약 취소 (힙에서는 실행 시점에 건너뜀)
+    def cancel(self, entry: list) -> None:
+        entry[3] = True
+
+    # 시계가 바뀌었을 때 (수동 시계 advance) 다음 마감 시각 다시 확인
+    def wake(self) -> None:
+        with self._cond:
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][3]: # 취소된 예약 정리
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - clock.now()
+                    if delay <= 0:
+                        entry = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(clock.timeout(delay))
+            try:
+                entry[2]()
+            except Exception: # 콜백 오류가 타이머 스레드를 죽이지 않도록
+                pass
+
+# 전역 타이머 서비스
+timers = TimerService()
+
+# --------------------------------------------------------------------------
+# 상태 저널 (추가 전용 로그 + 주기적 스냅샷)
+# --------------------------------------------------------------------------
+
+class StateJournal:
+    # 모든 상태 변화를 JSON 줄로 추가 기록 (fsync는 묶어서), 주기적으로 스냅샷 저장
+    # 레코드 종류 (k): start(서버 시작), tool(도구 호출 + 판정 결과), tick(시간 경과), evict(세션 제거)
+    # 스냅샷은 기록 스레드가 레코드를 그대로 재생한 그림자 상태로 만들므로 실제 상태 Lock과 무관
+    def __init__(self, path: str, flush_interval: float = JOURNAL_FLUSH_INTERVAL_SEC,
+                 snapshot_every: int = JOURNAL_SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.seq: int = 0 # 마지막으로 부여한 레코드 번호
+        self.shadow: Dict[str, List[int]] = {} # session_id → [스트레스, 경계] (기록된 레코드까지 반영)
+        self.replayed_records: int = 0 # 시작 시 스냅샷 이후 재생한 레코드 수
+
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock() # _pending, seq 보호 (짧게만 잡음)
+        self._io_lock = threading.Lock() # 파일 쓰기/스냅샷 보호
+        self._wake = threading.Event()
+        self._since_snapshot: int = 0
+        self._closed = False
+
+        offset = self._load()
+        self._file = open(path, "ab")
+        self._file.truncate(offset) # 비정상 종료로 잘린 마지막 줄 제거
+        self._thread = threading.Thread(target=self._run, name="chill-journal", daemon=True)
+        self._thread.start()
+
+    # 스냅샷 + 이후 꼬리 재생으로 그림자 상태 복원, 유효한 끝 위치 반환
+    def _load(self) -> int:
+        offset = 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            self.seq, offset = snap["seq"], snap["offset"]
+            self.shadow = {sid: list(v) for sid, v in snap["sessions"].items()}
+        except (OSError, ValueError, KeyError):
+            self.seq, offset, self.shadow = 0, 0, {}
+
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"): break # 잘린 줄
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    break
+                apply_journal_record(self.shadow, record)
+                self.seq = record.get("n", self.seq)
+                self.replayed_records += 1
+                offset += len(raw)
+        return offset
+
+    # 레코드 추가 (핫 패스: 리스트에 넣기만 함)
+    def append(self, kind: str, **fields: Any) -> None:
+        with self._lock:
+            self.seq += 1
+            fields["n"], fields["k"] = self.seq, kind
+            self._pending.append(fields)
+            if len(self._pending) >= JOURNAL_FLUSH_BATCH:
+                self._wake.set()
+
+    # 기록 스레드 본체
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e: # 디스크 오류는 서버를 멈추지 않음
+                ui.message(f"[red]저널 기록 실패: {e}[/red]")
+
+    # 쌓인 레코드를 한 번에 쓰고 fsync, 그림자 상태 갱신, 필요하면 스냅샷
+    def flush(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch: return
+            self._file.write(b"".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n" for r in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for record in batch:
+                apply_journal_record(self.shadow, record)
+            self._since_snapshot += len(batch)
+            if self._since_snapshot >= self.snapshot_every:
+                self._write_snapshot(batch[-1]["n"])
+
+    # 스냅샷 저장 (임시 파일에 쓰고 교체 → 중간에 죽어도 이전 스냅샷 유지)
+    def _write_snapshot(self, seq: int) -> None:
+        snap = {"seq": seq, "offset": self._file.tell(), "sessions": self.shadow}
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snap, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._since_snapshot = 0
+
+    # 남은 레코드 기록 + 스냅샷 후 종료
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._io_lock:
+            self._write_snapshot(self.seq)
+            self._file.close()
+
+# 저널 레코드 하나를 {session_id: [스트레스, 경계]}에 적용 (복원/스냅샷/재생 공용)
+# --shared_state로 남긴 레코드는 적용 전 공유 경계(b0)/스트레스(s0)를 담고 있어 그 값부터 적용 (다른 프로세스가 바꾼 값)
+def apply_journal_record(sessions: Dict[str, List[int]], record: Dict[str, Any]) -> None:
+    kind = record.get("k")
+    if kind == "tool":
+        stress, boss = sessions.get(record["s"], (0, 0))
+        stress, boss = record.get("s0", stress), record.get("b0", boss)
+        rolls = record["r"]
+        stress, boss, _, _ = apply_rolls(stress, boss, (bool(rolls[0]), rolls[1], bool(rolls[2]), rolls[3]))
+        sessions[record["s"]] = [stress, boss]
+    elif kind == "tick":
+        stress, boss = sessions.get(record["s"], (0, 0))
+        stress, boss = record.get("s0", stress), record.get("b0", boss)
+        sessions[record["s"]] = list(apply_ticks(stress, boss, record["d"][0], record["d"][1]))
+    elif kind == "evict":
+        sessions.pop(record["s"], None)
+
+# 저널을 처음부터 재생 (sleep/애니메이션 없이 최대 속도) - 운영 중 문제 재현용
+def replay_journal(path: str, session_filter: Optional[str] = None, verbose: bool = True) -> Dict[str, Any]:
+    sessions: Dict[str, List[int]] = {}
+    counts = {"records": 0, "tool": 0, "tick": 0, "evict": 0, "start": 0, "mismatches": 0}
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"): break # 잘린 마지막 줄
+            record = json.loads(raw)
+            kind = record.get("k")
+            counts["records"] += 1
+            counts[kind] = counts.get(kind, 0) + 1
+            apply_journal_record(sessions, record)
+            if kind == "tool":
+                stress, boss = sessions[record["s"]]
+                mismatch = (stress, boss) != (record.get("st"), record.get("bo"))
+                counts["mismatches"] += mismatch
+                if verbose and (session_filter is None or record["s"] == session_filter):
+                    print(json.dumps({"n": record["n"], "session": record["s"], "tool": record["t"], "rolls": record["r"],
+                                      "stress": stress, "boss": boss, **({"mismatch": True} if mismatch else {})},
+                                     ensure_ascii=False))
+            elif kind == "start" and verbose and session_filter is None:
+                print(json.dumps({"n": record["n"], "start": {k: v for k, v in record.items() if k not in ("n", "k")}}))
+    counts["elapsed_sec"] = round(time.perf_counter() - started, 4)
+    return {"counts": counts, "sessions": sessions}
+
+# 전역 저널 (--journal 지정 시 생성)
+journal: Optional[StateJournal] = None
+
+# --------------------------------------------------------------------------
+# 상태 기록 (세션별 고정 크기 링 버퍼 → history 메서드)
+# --------------------------------------------------------------------------
+
+# 기록용 도구 이름 ↔ 번호 (0은 시간 경과 기록, 항목마다 문자열 대신 2바이트 번호만 저장)
+history_tool_names: List[str] = [""]
+_history_tool_ids: Dict[str, int] = {}
+_history_tool_lock = threading.Lock()
+
+def history_tool_id(tool_name: str) -> int:
+    tool_id = _history_tool_ids.get(tool_name)
+    if tool_id is None:
+        with _history_tool_lock:
+            tool_id = _history_tool_ids.get(tool_name)
+            if tool_id is None:
+                if len(history_tool_names) > 0xFFFF: return 0 # 번호 공간(H) 초과: 이름 없이 기록
+                tool_id = len(history_tool_names)
+                history_tool_names.append(tool_name)
+                _history_tool_ids[tool_name] = tool_id
+    return tool_id
+
+class StateHistory:
+    # 세션 하나의 상태 변화 기록: (시각, 스트레스, 경계, 도구 번호, 종류)를 필드별 array에 저장 (항목당 13바이트)
+    # 용량까지는 뒤에 붙이고, 가득 차면 가장 오래된 칸부터 덮어씀 → 서버가 오래 돌아도 세션당 메모리는 일정
+    # 상태 Lock 안에서는 기록 묶음을 커밋 순서대로 pending에 넣기만 하고(push),
+    # 배열 쓰기/복사는 상태 Lock을 놓은 뒤 기록 전용 Lock 안에서 (drain: 쌓인 묶음을 순서대로 반영)
+    __slots__ = ("capacity", "ts", "stress", "boss", "tool", "outcome", "head", "pending", "lock")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array("d") # clock 기준 시각
+        self.stress = array("B")
+        self.boss = array("B")
+        self.tool = array("H") # history_tool_names 번호 (0: 시간 경과)
+        self.outcome = array("B") # HISTORY_TICK / HISTORY_SUCCESS / HISTORY_FAILURE
+        self.head: int = 0 # 가득 찬 뒤 다음에 덮어쓸 칸 (= 가장 오래된 항목)
+        self.pending: deque = deque() # 아직 배열에 반영하지 않은 기록 묶음 (커밋 순서)
+        self.lock = threading.Lock() # 배열 쓰기/복사 보호 (상태 Lock과 별개)
+
+    def record(self, ts: float, stress: int, boss: int, tool: int, outcome: int) -> None:
+        if len(self.ts) < self.capacity:
+            self.ts.append(ts)
+            self.stress.append(stress)
+            self.boss.append(boss)
+            self.tool.append(tool)
+            self.outcome.append(outcome)
+            return
+        i = self.head
+        self.ts[i], self.stress[i], self.boss[i], self.tool[i], self.outcome[i] = ts, stress, boss, tool, outcome
+        self.head = (i + 1) % self.capacity
+
+    # (시각, 스트레스, 경계, 도구 번호, 종류) 목록을 반영 대기열에 추가 (상태 Lock 안에서, 커밋 순서 보장)
+    def push(self, rows: List[Tuple[float, int, int, int, int]]) -> None:
+        self.pending.append(rows)
+
+    # 쌓인 기록 묶음을 순서대로 배열에 반영 (상태 Lock 밖에서, 누가 반영하든 순서는 pending 순서)
+    def drain(self) -> None:
+        with self.lock:
+            pending, record = self.pending, self.record
+            while pending:
+                for row in pending.popleft(): record(*row)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    # 오래된 순으로 펼친 복사본 (ts, stress, boss, tool, outcome), 쌓인 기록까지 반영 후
+    def ordered(self) -> Tuple[array, array, array, array, array]:
+        self.drain()
+        with self.lock:
+            h = self.head
+            columns = (self.ts, self.stress, self.boss, self.tool, self.outcome)
+            if h == 0: return tuple(c[:] for c in columns)
+            return tuple(c[h:] + c[:h] for c in columns)
+
+# 지금 기준 상대 시각(초, 0 이하). + 0.0으로 반올림이 만든 -0.0을 0.0으로 정규화
+def history_offset(t: float, now: float) -> float:
+    return min(0.0, round(t - now, 3)) + 0.0
+
+# 기록을 구간(window_sec, 지금 기준)으로 자르고, 점이 points개보다 많으면 시간 구간별로 다운샘플링
+# - 원본: t(지금 기준 초, 음수), stress, boss, tool, outcome
+# - 다운샘플: 구간마다 t(구간 마지막 기록), stress/boss(구간 끝 값), stress_max/boss_max, calls/failures(도구 호출 수)
+def history_series(columns: Tuple[array, ...], now: float, window_sec: Optional[float], points: int) -> Dict[str, Any]:
+    ts, stress, boss, tool, outcome = columns
+    start = bisect.bisect_left(ts, now - window_sec) if window_sec is not None else 0
+    count = len(ts) - start
+    if count <= points:
+        return {"downsampled": False,
+                "t": [history_offset(t, now) for t in ts[start:]], "stress": stress[start:].tolist(), "boss": boss[start:].tolist(),
+                "tool": [history_tool_names[i] or None for i in tool[start:]], "outcome": [HISTORY_OUTCOMES[o] for o in outcome[start:]]}
+
+    first, span = ts[start], (ts[-1] - ts[start]) or 1.0
+    series: Dict[str, Any] = {"downsampled": True, "t": [], "stress": [], "stress_max": [], "boss": [], "boss_max": [], "calls": [], "failures": []}
+    bucket = -1
+    for i in range(start, len(ts)):
+        b = min(points - 1, int((ts[i] - first) / span * points))
+        if b != bucket: # 새 구간 시작
+            bucket = b
+            for key in ("stress_max", "boss_max", "calls", "failures"): series[key].append(0)
+            series["t"].append(0.0); series["stress"].append(0); series["boss"].append(0)
+        series["t"][-1] = history_offset(ts[i], now)
+        series["stress"][-1], series["boss"][-1] = stress[i], boss[i]
+        if stress[i] > series["stress_max"][-1]: series["stress_max"][-1] = stress[i]
+        if boss[i] > series["boss_max"][-1]: series["boss_max"][-1] = boss[i]
+        if outcome[i] != HISTORY_TICK:
+            series["calls"][-1] += 1
+            if outcome[i] == HISTORY_FAILURE: series["failures"][-1] += 1
+    return series
+
+# history 요청 인자 추출 (최상위 또는 params의 window_sec, points)
+# 반환: (window_sec 또는 None, points, 오류 메시지)
+def history_params(request_data: Dict[str, Any]) -> Tuple[Optional[float], int, Optional[str]]:
+    source = request_data.get("params") if isinstance(request_data.get("params"), dict) else request_data
+    window_sec, points = source.get("window_sec"), source.get("points", HISTORY_DEFAULT_POINTS)
+    if window_sec is not None and (isinstance(window_sec, bool) or not isinstance(window_sec, (int, float)) or not (0 < window_sec < float("inf"))):
+        return None, 0, "오류: 'window_sec'는 0보다 큰 숫자여야 합니다."
+    if isinstance(points, bool) or not isinstance(points, int) or not (1 <= points <= HISTORY_MAX_POINTS):
+        return None, 0, f"오류: 'points'는 1~{HISTORY_MAX_POINTS} 사이의 정수여야 합니다."
+    return window_sec, points, None
+
+# --------------------------------------------------------------------------
+# 공유 상태 세그먼트 (--shared_state): 같은 호스트의 서버 프로세스들이 상사 경계를 함께 봄
+# --------------------------------------------------------------------------
+
+class SharedState:
+    # 상사 경계 (+ --shared_stress면 스트레스)를 담은 작은 파일을 mmap으로 공유 (브로커 없음)
+    # 배치: magic(4) | 형식 버전(4) | seq(8) | 경계(4) | 스트레스(4) | 경계 쿨다운 시각(8) | 스트레스 갱신 시각(8)
+    # 쓰기: 프로세스 안 threading.Lock + 프로세스 간 fcntl.lockf를 잡고 seq를 홀수로 → 값 기록 → 짝수로 (seqlock)
+    # 읽기: Lock 없이 seq가 짝수이고 값을 읽기 전후로 같을 때까지 반복 (계속 실패하면 Lock을 잡고 읽음)
+    # 시각은 time.monotonic 값이므로 같은 호스트의 프로세스끼리만, 실제 시간 시계에서만 의미가 있음
+    HEADER = struct.Struct("<4sIQ") # magic, 형식 버전, seq
+    SEQ = struct.Struct("<Q")
+    VALUES = struct.Struct("<iidd") # 경계, 스트레스, 경계 쿨다운 시각, 스트레스 갱신 시각
+    SEQ_OFFSET: int = 8
+    VALUES_OFFSET: int = 16
+    SIZE: int = 40
+
+    def __init__(self, path: str, share_stress: bool = False):
+        import fcntl # POSIX 전용 (Windows에서는 --shared_state 사용 불가)
+        self.path = path
+        self.share_stress = share_stress # 스트레스도 공유할지 (아니면 세션별 스트레스 + 공유 경계)
+        self._fcntl = fcntl
+        self._lock = threading.Lock() # lockf는 프로세스 단위 Lock이므로 같은 프로세스의 스레드끼리는 이것으로 배타
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self:
+                if os.fstat(self._fd).st_size < self.SIZE: os.ftruncate(self._fd, self.SIZE)
+                self._map = mmap.mmap(self._fd, self.SIZE)
+                self._init_locked()
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    # 새 파일이면 초기화, 기존 세그먼트면 형식 확인 (Lock 보유 상태)
+    def _init_locked(self) -> None:
+        magic, version, seq = self.HEADER.unpack_from(self._map, 0)
+        if magic == SHARED_STATE_MAGIC:
+            if version != SHARED_STATE_VERSION:
+                raise ValueError(f"'{self.path}'의 공유 상태 형식 버전({version})이 다릅니다. (지원: {SHARED_STATE_VERSION})")
+            if seq & 1: # 쓰던 프로세스가 도중에 죽음 (lockf는 프로세스 종료 시 풀림) → 값 범위만 바로잡고 seq 짝수로
+                boss, stress, last_boss, last_stress = self.VALUES.unpack_from(self._map, self.VALUES_OFFSET)
+                self.write_locked(min(max(boss, 0), MAX_BOSS_ALERT_LEVEL), min(max(stress, 0), MAX_STRESS_LEVEL), last_boss, last_stress)
+            return
+        if any(self._map[:]):
+            raise ValueError(f"'{self.path}'은(는) ChillMCP 공유 상태 파일이 아닙니다.")
+        now = clock.now()
+        self.VALUES.pack_into(self._map, self.VALUES_OFFSET, 0, 0, now, now)
+        self.HEADER.pack_into(self._map, 0, SHARED_STATE_MAGIC, SHARED_STATE_VERSION, 0)
+
+    # 쓰기 Lock (프로세스 안 + 프로세스 간)
+    def acquire(self) -> None:
+        self._lock.acquire()
+        try:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX)
+        except BaseException:
+            self._lock.release()
+            raise
+
+    def release(self) -> None:
+        self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN)
+        self._lock.release()
+
+    def __enter__(self) -> "SharedState":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    # Lock 없이 일관된 값 읽기
+    # 반환: (seq, 경계, 스트레스, 경계 쿨다운 시각, 스트레스 갱신 시각)
+    def read(self) -> Tuple[int, int, int, float, float]:
+        buf, seq_at, values = self._map, self.SEQ.unpack_from, self.VALUES.unpack_from
+        for _ in range(SHARED_STATE_READ_SPINS):
+            seq = seq_at(buf, self.SEQ_OFFSET)[0]
+            if seq & 1: continue # 다른 프로세스가 쓰는 중
+            boss, stress, last_boss, last_stress = values(buf, self.VALUES_OFFSET)
+            if seq_at(buf, self.SEQ_OFFSET)[0] == seq:
+                return seq, boss, stress, last_boss, last_stress
+        with self:
+            return self.read_locked()
+
+    # Lock 보유 상태에서 읽기 (쓰는 쪽이 없으므로 재시도 없음)
+    def read_locked(self) -> Tuple[int, int, int, float, float]:
+        return (self.SEQ.unpack_from(self._map, self.SEQ_OFFSET)[0], *self.VALUES.unpack_from(self._map, self.VALUES_OFFSET))
+
+    # 현재 seq (Lock 보유 상태, 낙관적 갱신의 version 비교용)
+    def seq_locked(self) -> int:
+        return self.SEQ.unpack_from(self._map, self.SEQ_OFFSET)[0]
+
+    # 값 기록 (Lock 보유 상태): seq 홀수 → 값 → seq 짝수
+    def write_locked(self, boss: int, stress: int, last_boss: float, last_stress: float) -> None:
+        buf = self._map
+        seq = self.SEQ.unpack_from(buf, self.SEQ_OFFSET)[0] | 1
+        self.SEQ.pack_into(buf, self.SEQ_OFFSET, seq)
+        self.VALUES.pack_into(buf, self.VALUES_OFFSET, boss, stress, last_boss, last_stress)
+        self.SEQ.pack_into(buf, self.SEQ_OFFSET, seq + 1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._map.close()
+            os.close(self._fd)
+
+    def describe(self) -> str:
+        return f"{self.path} (경계{' + 스트레스' if self.share_stress else ''})"
+
+# 전역 공유 상태 (main에서 --shared_state로 생성, 세션 상태를 만들기 전에)
+shared_state: Optional[SharedState] = None
 
 # --------------------------------------------------------------------------
 # 에이전트 상태 관리 클래스
@@ -371,266 +2413,1310 @@ TOOL_REGISTRY: Dict[str, Dict[str, Any]] = {
 
 class AgentState:
     # 에이전트 상태 (스트레스, 상사 경계) 관리
-    def __init__(self, boss_alertness: int, boss_alertness_cooldown: int):
+    # 스트레스 증가/경계 감소는 폴링 스레드 없이 마지막 갱신 시각으로부터 읽을 때 계산
+    # 세션마다 하나씩 생성되므로 __slots__로 메모리 최소화
+    # 도구 적용은 낙관적 갱신: Lock 밖에서 새 상태를 계산하고 Lock 안에서는 version 비교 후 대입만 함
+    # --shared_state면 경계(+ 스트레스)는 공유 세그먼트가 원본이고 필드는 마지막으로 읽은 값 (version 비교에 세그먼트 seq 포함)
+    __slots__ = ( "session_id", "stress_level", "boss_alert_level", "boss_alertness_prob",
+                  "boss_alertness_cooldown", "last_boss_cooldown_time", "last_stress_update_time",
+                  "last_access_time", "lock", "version", "history", "_notify_entry", "_notify_enabled" )
+
+    def __init__(self, boss_alertness: int, boss_alertness_cooldown: int, session_id: str = DEFAULT_SESSION_ID,
+                 history_size: int = HISTORY_CAPACITY):
         # 상태 변수 초기화
+        now = clock.now()
+        self.session_id: str = session_id
         self.stress_level: int = 0
         self.boss_alert_level: int = 0
         self.boss_alertness_prob: float = boss_alertness / 100.0
         self.boss_alertness_cooldown: int = boss_alertness_cooldown
-        self.last_boss_cooldown_time: datetime = datetime.datetime.now()
-        self.last_stress_update_time: datetime = datetime.datetime.now()
+        self.last_boss_cooldown_time: float = now # clock 기준
+        self.last_stress_update_time: float = now # clock 기준
+        self.last_access_time: float = now # 세션 만료(TTL) 판단용
         self.lock = threading.Lock() # 스레드 동기화 Lock
+        self.version: int = 0 # 상태 필드가 바뀔 때마다 증가 (Lock 안에서, 필드 대입 뒤에)
+        self.history: Optional[StateHistory] = StateHistory(history_size) if history_size > 0 else None # 상태 변화 기록
+        self._notify_entry: Optional[list] = None # 상태 변화 알림 타이머 예약
+        self._notify_enabled: bool = False
 
-    # 백그라운드 스레드 시작
+    # 상태 변화 알림 시작 (렌더링이 꺼져 있으면 타이머도 쓰지 않음)
     def start_background_tasks(self) -> None:
-        stress_thread = threading.Thread(target=self._background_stress_updater, daemon=True)
-        stress_thread.start()
-        cooldown_thread = threading.Thread(target=self._background_boss_cooldown, daemon=True)
-        cooldown_thread.start()
-        console.print("[dim]백그라운드 상태 업데이트 스레드 시작됨.[/dim]")
-
-    # 스트레스 자동 증가 (백그라운드 스레드)
-    def _background_stress_updater(self) -> None:
-        while True:
-            time.sleep(1)
-            changed = False
-            current_stress, current_boss = 0, 0
-            with self.lock:
-                now = datetime.datetime.now()
-                seconds_passed = (now - self.last_stress_update_time).total_seconds()
-
-                if seconds_passed >= STRESS_INCREASE_INTERVAL_SEC:
-                    if self.stress_level < MAX_STRESS_LEVEL:
-                        self.stress_level = min(MAX_STRESS_LEVEL, self.stress_level + STRESS_INCREASE_AMOUNT)
-                        changed = True
-                    self.last_stress_update_time = now
-                current_stress = self.stress_level
-                current_boss = self.boss_alert_level
-
-            if changed: # Lock 해제 후 출력 (실시간 업데이트 복구)
-                console.print("[dim]...스트레스 레벨 증가...[/dim]", style="italic red")
-                display_status(current_stress, current_boss)
-
-    # 상사 경계 자동 감소 (백그라운드 스레드)
-    def _background_boss_cooldown(self) -> None:
+        if ui.mode == "off": return
+        self._notify_enabled = True
+        with self.lock:
+            self._arm_notifier()
+
+    # 상태 변화 알림 중지 (세션 제거 시)
+    def stop_background_tasks(self) -> None:
+        with self.lock:
+            self._notify_enabled = False
+            if self._notify_entry is not None:
+                timers.cancel(self._notify_entry)
+                self._notify_entry = None
+
+    # 마지막 갱신 시각부터 now까지 지난 틱 수: (스트레스 틱, 경계 틱)
+    def _ticks(self, last_stress: float, last_boss: float, now: float) -> Tuple[int, int]:
+        return ( int((now - last_stress) // STRESS_INCREASE_INTERVAL_SEC),
+                 int((now - last_boss) // self.boss_alertness_cooldown) )
+
+    # 경과 시간만큼 스트레스 증가/경계 감소 반영 (Lock 보유 상태에서 호출)
+    # 공유 상태면 세그먼트 Lock을 잡고 공유 값을 읽어 반영한 뒤 바뀐 시각/값을 다시 기록
+    # 반환: (스트레스 증가 여부, 경계 감소 여부)
+    def _refresh_locked(self, now: float) -> Tuple[bool, bool]:
+        shared = shared_state
+        if shared is None: return self._tick_locked(now)
+        with shared:
+            self._load_shared(shared)
+            version = self.version
+            changed = self._tick_locked(now)
+            if self.version != version: self._store_shared(shared)
+        return changed
+
+    # 공유 세그먼트 값을 필드로 복사 (상태 Lock + 세그먼트 Lock 보유 상태)
+    def _load_shared(self, shared: SharedState) -> None:
+        _, self.boss_alert_level, stress, self.last_boss_cooldown_time, last_stress = shared.read_locked()
+        if shared.share_stress: self.stress_level, self.last_stress_update_time = stress, last_stress
+
+    # 필드 값을 공유 세그먼트에 기록 (상태 Lock + 세그먼트 Lock 보유 상태)
+    def _store_shared(self, shared: SharedState) -> None:
+        if shared.share_stress:
+            shared.write_locked(self.boss_alert_level, self.stress_level, self.last_boss_cooldown_time, self.last_stress_update_time)
+        else:
+            _, _, stress, _, last_stress = shared.read_locked() # 스트레스 칸은 그대로 둠
+            shared.write_locked(self.boss_alert_level, stress, self.last_boss_cooldown_time, last_stress)
+
+    # 공유 상태면 저널 레코드에 함께 남길 시작 상태 (다른 프로세스가 바꾼 값부터 재생하도록)
+    # b0: 적용 전 공유 경계, s0: 적용 전 공유 스트레스 (--shared_stress일 때만)
+    @staticmethod
+    def _journal_base(stress: int, boss: int) -> Dict[str, int]:
+        shared = shared_state
+        if shared is None: return {}
+        return {"b0": boss, "s0": stress} if shared.share_stress else {"b0": boss}
+
+    # 경과 시간 반영 (필드만, _refresh_locked에서 호출)
+    def _tick_locked(self, now: float) -> Tuple[bool, bool]:
+        stress_ticks, boss_ticks = self._ticks(self.last_stress_update_time, self.last_boss_cooldown_time, now)
+        if stress_ticks <= 0 and boss_ticks <= 0:
+            return False, False
+        if stress_ticks > 0:
+            self.last_stress_update_time += stress_ticks * STRESS_INCREASE_INTERVAL_SEC
+        if boss_ticks > 0:
+            self.last_boss_cooldown_time += boss_ticks * self.boss_alertness_cooldown
+
+        stress, boss = apply_ticks(self.stress_level, self.boss_alert_level, stress_ticks, boss_ticks)
+        stress_changed, boss_changed = stress != self.stress_level, boss != self.boss_alert_level
+        base = self._journal_base(self.stress_level, self.boss_alert_level) if journal is not None else None
+        self.stress_level, self.boss_alert_level = stress, boss
+        self.version += 1
+        if stress_changed or boss_changed:
+            if journal is not None:
+                journal.append("tick", s=self.session_id, d=[stress_ticks if stress_changed else 0, boss_ticks if boss_changed else 0], **base)
+            if self.history is not None: self.history.push([(now, stress, boss, 0, HISTORY_TICK)])
+        return stress_changed, boss_changed
+
+    # 현재 상태 (스트레스, 경계) 조회
+    def snapshot(self) -> Tuple[int, int]:
+        with self.lock:
+            self._refresh_locked(clock.now())
+            return self.stress_level, self.boss_alert_level
+
+    # 상태 기록 조회 (상태 Lock 안에서는 경과 시간 반영만, 복사/자르기/다운샘플링은 Lock 밖에서)
+    # 반환: (스트레스, 경계, 보관 중인 기록 수, 시계 시각, history_series 결과)
+    def history_snapshot(self, window_sec: Optional[float], points: int) -> Tuple[int, int, int, float, Dict[str, Any]]:
+        with self.lock:
+            self._refresh_locked(clock.now())
+            stress, boss = self.stress_level, self.boss_alert_level
+        columns = self.history.ordered() if self.history is not None else (array("d"), array("B"), array("B"), array("H"), array("B"))
+        now = clock.now() # 복사한 기록보다 늦은 시각 (t가 양수가 되지 않도록)
+        return stress, boss, len(columns[0]), now, history_series(columns, now, window_sec, points)
+
+    # 다음 상태 변화 시각에 알림 예약 (Lock 보유 상태에서 호출)
+    def _arm_notifier(self) -> None:
+        if not self._notify_enabled: return
+        deadlines = []
+        if self.stress_level < MAX_STRESS_LEVEL:
+            deadlines.append(self.last_stress_update_time + STRESS_INCREASE_INTERVAL_SEC)
+        if self.boss_alert_level > 0:
+            deadlines.append(self.last_boss_cooldown_time + self.boss_alertness_cooldown)
+        if not deadlines: return # 변화 예정 없음 → 타이머 없음
+
+        deadline = min(deadlines)
+        if self._notify_entry is not None and not self._notify_entry[3]:
+            if self._notify_entry[0] <= deadline: return # 이미 더 이른 알림이 예약됨
+            timers.cancel(self._notify_entry)
+        self._notify_entry = timers.call_at(deadline, self._on_notify)
+
+    # 예약된 알림 시각 도달 (타이머 스레드)
+    def _on_notify(self) -> None:
+        with self.lock:
+            self._notify_entry = None
+            stress_changed, boss_changed = self._refresh_locked(clock.now())
+            current_stress, current_boss = self.stress_level, self.boss_alert_level
+            self._arm_notifier()
+
+        if stress_changed: # Lock 해제 후 출력
+            ui.message("[dim]...스트레스 레벨 증가...[/dim]", style="italic red")
+        if boss_changed:
+            ui.message("[dim]...상사 경계 레벨 감소...[/dim]", style="italic yellow")
+        if stress_changed or boss_changed:
+            ui.status(current_stress, current_boss)
+
+    # 도구 실행 (핵심 로직) - 상태 변경 + 응답 생성 + 렌더링 요청을 한 번에 수행
+    def execute_tool(self, tool_name: str) -> Dict[str, Any]:
+        outcome = self.apply_tool(tool_name)
+        if not outcome["error"]: ui.outcome(outcome)
+        return outcome["response"]
+
+    # 상태 변경 및 응답 생성 (렌더링 없음, 빠름, 도착 순서대로 호출)
+    def apply_tool(self, tool_name: str) -> Dict[str, Any]:
+        return self.apply_batch([tool_name])[0]
+
+    # 여러 도구를 순서대로 적용 (배치 호출)
+    # 1) 확률 판정은 상태와 무관하므로 Lock 밖에서 먼저 뽑음
+    # 2) 현재 상태를 읽어 새 상태를 Lock 밖에서 계산 (_plan)
+    # 3) Lock 안에서 version이 그대로면 대입만 하고, 그사이 다른 스레드가 바꿨다면 같은 판정으로 2)부터 다시
+    def apply_batch(self, tool_names: List[str]) -> List[Dict[str, Any]]:
+        profile = profiler.current() if profiler is not None else None # --profile: 단계별 시간 기록
+        if profile is not None: phase_started = time.perf_counter()
+        specs = list(map(TOOL_REGISTRY.get, tool_names)) # 도중에 레지스트리가 교체돼도 이 요청은 같은 ToolSpec 사용
+        all_rolls = [draw_rolls(spec, self.boss_alertness_prob) if spec is not None else None for spec in specs]
+        if profile is not None: profile.add("rng", time.perf_counter() - phase_started)
+        retries = 0
         while True:
-            time.sleep(1)
-            changed = False
-            current_stress, current_boss = 0, 0
+            if profile is not None: phase_started = time.perf_counter()
+            # 재시도가 계속 밀리면 Lock 안에서 계산 (진행 보장)
+            plan = self._plan(tool_names, all_rolls, clock.now()) if retries < STATE_MAX_RETRIES else None
+            # --- 상태 업데이트 (Lock으로 보호) ---
+            requested = time.perf_counter()
+            if profile is not None: profile.add("plan", requested - phase_started)
             with self.lock:
-                now = datetime.datetime.now()
-                seconds_passed = (now - self.last_boss_cooldown_time).total_seconds()
-
-                if seconds_passed >= self.boss_alertness_cooldown:
-                    if self.boss_alert_level > 0:
-                        self.boss_alert_level = max(0, self.boss_alert_level - 1)
-                        changed = True
-                    self.last_boss_cooldown_time = now
-                current_stress = self.stress_level
-                current_boss = self.boss_alert_level
-
-            if changed: # Lock 해제 후 출력 (실시간 업데이트 복구)
-                console.print("[dim]...상사 경계 레벨 감소...[/dim]", style="italic yellow")
-                display_status(current_stress, current_boss)
-
-    # 도구 실행 (핵심 로직)
-    def execute_tool(self, tool_name: str) -> Dict[str, Any]:
+                shared = shared_state
+                if shared is not None: shared.acquire() # 공유 상태: 다른 프로세스의 갱신과도 배타 (대기 시간에 포함)
+                acquired = time.perf_counter()
+                try:
+                    if plan is None: plan = self._plan(tool_names, all_rolls, clock.now())
+                    committed = plan[0] == (self.version if shared is None else (self.version, shared.seq_locked()))
+                    if committed: self._commit_locked(tool_names, all_rolls, plan)
+                finally:
+                    if shared is not None: shared.release()
+                released = time.perf_counter()
+            # --- Lock 종료 ---
+            metrics.observe_lock(acquired - requested, released - acquired)
+            if profile is not None:
+                profile.add("lock_wait", acquired - requested)
+                profile.add("lock_hold", released - acquired)
+            if committed: break
+            retries += 1
+        if retries: metrics.state_retries += retries
+        if self.history is not None and self.history.pending: self.history.drain() # 상태 기록 배열 반영 (상태 Lock 밖)
+        outcomes = [self._build_outcome(tool_name, spec, result) for tool_name, spec, result in zip(tool_names, specs, plan[-1])]
+        if profile is not None:
+            profile.mark = time.perf_counter()
+            profile.add("build", profile.mark - released)
+        return outcomes
+
+    # 현재 상태에 경과 시간과 판정 결과를 적용한 새 상태 계산 (Lock 없이, 상태를 바꾸지 않음)
+    # version을 먼저 읽으므로 읽는 도중 다른 스레드가 바꿨다면 커밋 시 version 비교에서 걸러짐
+    # 공유 상태면 경계(+ 스트레스)는 세그먼트에서 읽고 version은 (version, 세그먼트 seq)
+    # 반환: (읽은 version, 스트레스, 경계, 스트레스 갱신 시각, 쿨다운 시각, 틱 저널 값 또는 None, 상태 기록 목록, 도구별 결과)
+    def _plan(self, tool_names: List[str], all_rolls: List[Optional[Tuple[bool, int, bool, Optional[str]]]], now: float) -> tuple:
+        version = self.version
+        stress, boss = self.stress_level, self.boss_alert_level
+        last_stress, last_boss = self.last_stress_update_time, self.last_boss_cooldown_time
+        shared = shared_state
+        if shared is not None:
+            seq, boss, shared_stress, last_boss, shared_last_stress = shared.read()
+            if shared.share_stress: stress, last_stress = shared_stress, shared_last_stress
+            version = (version, seq)
+
+        # 경과 시간 반영 (스트레스 증가, 경계 쿨다운)
+        tick = None
+        rows: List[Tuple[float, int, int, int, int]] = [] # 상태 기록 (기록을 끈 세션이면 버림)
+        stress_ticks, boss_ticks = self._ticks(last_stress, last_boss, now)
+        if stress_ticks > 0 or boss_ticks > 0:
+            if stress_ticks > 0: last_stress += stress_ticks * STRESS_INCREASE_INTERVAL_SEC
+            if boss_ticks > 0: last_boss += boss_ticks * self.boss_alertness_cooldown
+            ticked_stress, ticked_boss = apply_ticks(stress, boss, stress_ticks, boss_ticks)
+            if ticked_stress != stress or ticked_boss != boss:
+                tick = [stress_ticks if ticked_stress != stress else 0, boss_ticks if ticked_boss != boss else 0]
+                rows.append((now, ticked_stress, ticked_boss, 0, HISTORY_TICK))
+            stress, boss = ticked_stress, ticked_boss
+
+        # 도구별 판정 결과 적용 (응답용 최종 상태 값 포함)
+        results: List[Optional[Dict[str, Any]]] = []
+        for rolls in all_rolls:
+            if rolls is None:
+                results.append(None)
+                continue
+            delay_applied = boss == MAX_BOSS_ALERT_LEVEL # 페널티 딜레이 조건 확인
+            stress, boss, actual_stress_reduced, boss_alert_increased = apply_rolls(stress, boss, rolls)
+            results.append({ "delay_applied": delay_applied, "tool_succeeded": rolls[0], "event": rolls[3],
+                             "stress_reduced": actual_stress_reduced, "boss_alert_increased": boss_alert_increased,
+                             "stress": stress, "boss": boss })
+        if self.history is not None:
+            for tool_name, result in zip(tool_names, results):
+                if result is not None:
+                    rows.append((now, result["stress"], result["boss"], history_tool_id(tool_name),
+                                 HISTORY_SUCCESS if result["tool_succeeded"] else HISTORY_FAILURE))
+        return version, stress, boss, last_stress, last_boss, tick, rows, results
+
+    # 계산된 새 상태 대입 + 저널/상태 기록 (Lock 보유 상태, version 확인 후 호출)
+    def _commit_locked(self, tool_names: List[str], all_rolls: list, plan: tuple) -> None:
+        _, self.stress_level, self.boss_alert_level, self.last_stress_update_time, self.last_boss_cooldown_time, tick, rows, results = plan
+        self.version += 1
+        if journal is not None:
+            base: Dict[str, int] = {}
+            if shared_state is not None: # 세그먼트 값 = 계획의 시작 상태 (seq 확인 후, 아직 기록 전) → 이 커밋의 첫 레코드에 남김
+                _, shared_boss, shared_stress, _, _ = shared_state.read_locked()
+                base = self._journal_base(shared_stress, shared_boss)
+            if tick is not None:
+                journal.append("tick", s=self.session_id, d=tick, **base)
+                base = {}
+            for tool_name, rolls, result in zip(tool_names, all_rolls, results):
+                if result is not None:
+                    journal.append("tool", s=self.session_id, t=tool_name, r=list(rolls), st=result["stress"], bo=result["boss"], **base)
+                    base = {}
+        if shared_state is not None: self._store_shared(shared_state)
+        if rows and self.history is not None: self.history.push(rows) # 배열 반영은 Lock을 놓은 뒤 (apply_batch)
+        if self._notify_enabled: self._arm_notifier() # 경계가 올라갔다면 쿨다운 알림 예약
+
+    # 판정 결과로 응답 텍스트 및 렌더링 정보 생성 (Lock 밖에서 호출)
+    def _build_outcome(self, tool_name: str, spec: Optional[ToolSpec], result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         # 도구 존재 확인
-        if tool_name not in TOOL_REGISTRY:
+        if result is None:
             error_text = f"오류: 알 수 없는 도구 '{tool_name}'. 혁명 실패."
-            console.print(f"[bold red]{error_text}[/bold red]")
-            return self._format_mcp_response(error_text)
-
-        tool_data = TOOL_REGISTRY[tool_name]
-        tool_level = tool_data.get("level", "basic")
+            ui.message(f"[bold red]{error_text}[/bold red]")
+            return {"tool_name": tool_name, "error": True, "response": self._format_mcp_response(error_text)}
 
-        # 실행 결과 변수 초기화
-        delay_applied = False
-        event_message_stdout = ""
-        event_message_stderr = ""
-        boss_alert_increased = False
-        tool_succeeded = True
-        stress_reduction = 0
-
-        # --- 상태 업데이트 (Lock으로 보호) ---
-        with self.lock:
-            # 페널티 딜레이 조건 확인
-            if self.boss_alert_level == MAX_BOSS_ALERT_LEVEL:
-                delay_applied = True
-
-            # 성공/실패 결정
-            success_rate = ADVANCED_TOOL_SUCCESS_RATE if tool_level == "advanced" else BASIC_TOOL_SUCCESS_RATE
-            if random.random() > success_rate:
-                tool_succeeded = False
-
-            # 스트레스 감소량 적용 (성공/실패별 차등)
-            if tool_succeeded:
-                stress_reduction = random.randint(
-                    ADVANCED_STRESS_REDUCTION_MIN if tool_level == "advanced" else BASIC_STRESS_REDUCTION_MIN,
-                    ADVANCED_STRESS_REDUCTION_MAX if tool_level == "advanced" else BASIC_STRESS_REDUCTION_MAX
-                )
-            else:
-                stress_reduction = random.randint(FAILURE_STRESS_REDUCTION_MIN, FAILURE_STRESS_REDUCTION_MAX)
-            # 스트레스 감소 전 값 임시 저장 (메시지 출력용)
-            stress_before_reduction = self.stress_level
-            self.stress_level = max(0, self.stress_level - stress_reduction)
-            # 실제 감소량 계산 (음수가 되지 않도록)
-            actual_stress_reduced = stress_before_reduction - self.stress_level
-
-
-            # 상사 경계 증가 판정 (확률 기반)
-            if random.random() < self.boss_alertness_prob:
-                if self.boss_alert_level < MAX_BOSS_ALERT_LEVEL:
-                    self.boss_alert_level += 1
-                    boss_alert_increased = True
-
-            # 돌발 이벤트 판정 (확률 기반)
-            if random.random() < RANDOM_EVENT_CHANCE:
-                event_roll = random.choice(["chicken_beer", "leave_work", "company_dinner"])
-                if event_roll == "chicken_beer":
-                    event_message_stderr = f"\n\n[bold yellow]🍗🍻 [돌발] 가상 치맥 타임![/bold yellow]\n[green]  (스트레스 -50)[/green]"
-                    event_message_stdout = "\n\n🍗🍻 [돌발] 가상 치맥 타임!\n  (스트레스 -50)"
-                    self.stress_level = max(0, self.stress_level - 50)
-                elif event_roll == "leave_work":
-                    event_message_stderr = f"\n\n[bold magenta]🏃‍♂️💨 [돌발] 즉시 퇴근 모드![/bold magenta]\n[green]  (스트레스 0, 경계 +2)[/green]"
-                    event_message_stdout = "\n\n🏃‍♂️💨 [돌발] 즉시 퇴근 모드!\n  (스트레스 0, 경계 +2)"
-                    self.stress_level = 0
-                    self.boss_alert_level = min(MAX_BOSS_ALERT_LEVEL, self.boss_alert_level + 2)
-                elif event_roll == "company_dinner":
-                    if random.random() < 0.5: # 긍정 회식
-                        event_message_stderr = f"\n\n[bold cyan]🎉🍻 [돌발] 운 좋은 회식![/bold cyan]\n[green]  (스트레스 -40, 경계 -1)[/green]"
-                        event_message_stdout = "\n\n🎉🍻 [돌발] 운 좋은 회식!\n  (스트레스 -40, 경계 -1)"
-                        self.stress_level = max(0, self.stress_level - 40)
-                        self.boss_alert_level = max(0, self.boss_alert_level - 1)
-                    else: # 부정 회식
-                        event_message_stderr = f"\n\n[bold red]😩🎤 [돌발] 끔찍한 회식...[/bold red]\n[yellow]  (스트레스 +30, 경계 +1)[/yellow]"
-                        event_message_stdout = "\n\n😩🎤 [돌발] 끔찍한 회식...\n  (스트레스 +30, 경계 +1)"
-                        self.stress_level = min(MAX_STRESS_LEVEL, self.stress_level + 30)
-                        self.boss_alert_level = min(MAX_BOSS_ALERT_LEVEL, self.boss_alert_level + 1)
-
-            # 응답용 최종 상태 값 저장
-            current_stress = self.stress_level
-            current_boss_alert = self.boss_alert_level
-        # --- Lock 종료 ---
+        tool_succeeded = result["tool_succeeded"]
+        event = result["event"] # 돌발 이벤트 메시지
+        result["event_message_stderr"], result["event_message_stdout"] = (
+            (EVENT_TABLE.by_name[event].message_stderr, EVENT_TABLE.by_name[event].message_stdout) if event else ("", "") )
+        current_stress = result["stress"]
+        current_boss_alert = result["boss"]
 
         # --- UI 및 응답 준비 ---
-        flavor_text = random.choice(tool_data["flavor"])
-        summary_data = tool_data.get("summary", {})
-        failure_summaries = tool_data.get("failure_summary", ["알 수 없는 이유로 실패."])
-        frames = tool_data.get("ascii_frames", [])
+        flavor_text = random.choice(spec.flavor)
+        frames = spec.frames
 
         # 성공/실패 기반 Summary 텍스트 준비
         summary_text = ""
         base_summary = "" # 성공 시 stderr 표시용
         failure_reason_stderr = "" # 실패 시 stderr 표시용
         if tool_succeeded:
-            state_key = "default"
-            if current_boss_alert >= HIGH_ALERT_THRESHOLD: state_key = "high_alert"
-            elif current_stress >= HIGH_STRESS_THRESHOLD: state_key = "high_stress"
-            summary_list = summary_data.get(state_key, summary_data.get("default", ["휴식 성공."]))
-            base_summary = random.choice(summary_list) if isinstance(summary_list, list) else str(summary_list)
+            summary_list = spec.summary_default
+            if current_boss_alert >= HIGH_ALERT_THRESHOLD: summary_list = spec.summary_high_alert
+            elif current_stress >= HIGH_STRESS_THRESHOLD: summary_list = spec.summary_high_stress
+            base_summary = random.choice(summary_list)
             summary_text = f"[성공!] {base_summary}"
         else:
-            chosen_failure = random.choice(failure_summaries)
+            chosen_failure = random.choice(spec.failure_summary)
             summary_text = f"[실패] {chosen_failure}"
             failure_reason_stderr = chosen_failure
 
-        # 1. 애니메이션 실행
-        show_tool_animation(frames, flavor_text) if not delay_applied else show_boss_animation()
-
-        # 2. stderr 메시지 출력 (순서 중요)
-        print("\n", file=sys.stderr) # 간격 추가
-        console.print(f"[bright_cyan]{flavor_text}[/]") # Flavor Text (Rich 마크업)
-        if boss_alert_increased: # 경계 증가 알림 (진한 색상)
-            alert_messages = { 1: "[grey50]...헛기침...(경계+1)[/]", 2: "[orange3]내...모니터 봄...(경계+1)[/]", 3: "[bold orange3]...인기척...(경계+1)[/]", 4: "[bold red]...일어남!(경계+1)[/]", 5: "[bold red blink]🚨 걸어옴!(경계MAX)[/]" }
-            console.print(alert_messages.get(current_boss_alert, f"[red]상사 경계: {current_boss_alert}[/red]"))
-        if tool_succeeded: # 성공 알림 (스트레스 감소량 포함)
-             console.print(f"[bold green]✅ '{tool_name}' 성공! ({base_summary}) (스트레스 -{actual_stress_reduced})[/bold green]")
-        else: # 실패 알림 (이유 및 스트레스 변화량 포함)
-             console.print(f"[bold yellow]⚠️ 이런! '{tool_name}' 실패... 이유: {failure_reason_stderr} (스트레스 -{actual_stress_reduced})[/bold yellow]")
-        if event_message_stderr: console.print(event_message_stderr) # 돌발 이벤트
-        if delay_applied: # 페널티 알림
-            penalty_msg = f"\n\n[bold red]⚠️ ({BOSS_PENALTY_DELAY_SEC}초 지연 발생... 상사 감시 중...)[/bold red]"
-            console.print(penalty_msg)
+        # stdout 응답 텍스트 생성
+        if result["delay_applied"]:
             response_text_penalty_suffix = f"\n\n⚠️ ({BOSS_PENALTY_DELAY_SEC}초 지연됨)"
         else:
             response_text_penalty_suffix = ""
-
-        # 3. stdout 응답 텍스트 생성
         response_text = ( f"{flavor_text}\n\nBreak Summary: {summary_text}\n"
                           f"Stress Level: {current_stress}\nBoss Alert Level: {current_boss_alert}" )
-        response_text += event_message_stdout
+        response_text += result["event_message_stdout"]
         response_text += response_text_penalty_suffix
 
-        # 4. 최종 상태 패널 출력 (stderr)
-        print("\n", file=sys.stderr) # 간격 추가
-        display_status(current_stress, current_boss_alert)
-
-        # 5. JSON 응답 반환
-        return self._format_mcp_response(response_text)
+        return {
+            "tool_name": tool_name, "error": False, "frames": frames, "flavor_text": flavor_text,
+            "base_summary": base_summary, "failure_reason": failure_reason_stderr, **result,
+            "response": self._format_mcp_response(response_text),
+        }
 
     # MCP 응답 형식 포맷
-    def _format_mcp_response(self, text: str) -> Dict[str, Any]:
+    @staticmethod
+    def _format_mcp_response(text: str) -> Dict[str, Any]:
         return {"content": [{"type": "text", "text": text}]}
 
 # --------------------------------------------------------------------------
-# 메인 서버 실행 로직 (직접 stdio 사용)
+# 세션 저장소 (샤드별 Lock + LRU/TTL 제거)
 # --------------------------------------------------------------------------
 
-# 메인 함수
-def main(args: argparse.Namespace) -> None:
-    # 상태 객체 및 백그라운드 스레드 시작
-    state = AgentState(args.boss_alertness, args.boss_alertness_cooldown)
-    state.start_background_tasks()
+class SessionStore:
+    # session_id → AgentState. 샤드마다 Lock과 LRU 순서(OrderedDict)를 따로 가져 전역 Lock 없음
+    def __init__(self, boss_alertness: int, boss_alertness_cooldown: int,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, session_ttl: int = DEFAULT_SESSION_TTL_SEC,
+                 shard_count: int = SESSION_SHARD_COUNT, history_size: int = HISTORY_CAPACITY):
+        self.boss_alertness = boss_alertness
+        self.history_size = history_size
+        self.boss_alertness_cooldown = boss_alertness_cooldown
+        self.session_ttl = session_ttl
+        self.max_per_shard = max(1, max_sessions // shard_count)
+        self.shards: List[Tuple[threading.Lock, "OrderedDict[str, AgentState]"]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(shard_count)
+        ]
+        self.evicted_sessions: int = 0
+
+    # 세션 조회 (없으면 생성). 조회할 때마다 LRU 갱신 + 해당 샤드의 만료 세션 정리
+    def get(self, session_id: str) -> AgentState:
+        lock, sessions = self.shards[hash(session_id) % len(self.shards)]
+        now = clock.now()
+        evicted: List[AgentState] = []
+        with lock:
+            state = sessions.get(session_id)
+            if state is None:
+                state = AgentState(self.boss_alertness, self.boss_alertness_cooldown, session_id, self.history_size)
+                sessions[session_id] = state
+                if session_id == DEFAULT_SESSION_ID: # 로컬 에이전트만 상태 변화 알림 표시
+                    state.start_background_tasks()
+            else:
+                sessions.move_to_end(session_id)
+            state.last_access_time = now
+
+            # 가장 오래 안 쓴 세션부터: 샤드 용량 초과 또는 TTL 만료 시 제거
+            while sessions:
+                oldest = next(iter(sessions.values()))
+                if oldest is state: break
+                if len(sessions) <= self.max_per_shard and now - oldest.last_access_time < self.session_ttl: break
+                evicted.append(sessions.popitem(last=False)[1])
+
+        for old in evicted: # Lock 밖에서 정리
+            old.stop_background_tasks()
+            if journal is not None:
+                journal.append("evict", s=old.session_id)
+        self.evicted_sessions += len(evicted)
+        return state
+
+    # 저장된 상태로 세션 복원 (서버 재시작 시 저널 스냅샷 + 꼬리 재생 결과)
+    # 공유 상태면 경계(--shared_stress면 스트레스도)는 세그먼트 값이 원본이므로 복원하지 않음
+    def restore(self, saved: Dict[str, List[int]]) -> None:
+        for session_id, (stress, boss) in saved.items():
+            state = self.get(session_id)
+            with state.lock:
+                if shared_state is None: state.boss_alert_level = boss
+                if shared_state is None or not shared_state.share_stress: state.stress_level = stress
+                state.version += 1
+                state._arm_notifier()
+
+    # 현재 세션 수
+    def __len__(self) -> int:
+        return sum(len(sessions) for _, sessions in self.shards)
+
+# 요청에서 세션 id 추출 (최상위 session_id 또는 params.session_id)
+def request_session_id(request_data: Dict[str, Any]) -> str:
+    session_id = request_data.get("session_id")
+    if session_id is None and isinstance(request_data.get("params"), dict):
+        session_id = request_data["params"].get("session_id")
+    return str(session_id) if session_id is not None else DEFAULT_SESSION_ID
+
+# 요청의 마감 시간 추출 (최상위 deadline_ms, params.deadline_ms 또는 params._meta.deadline_ms)
+# 반환: (밀리초 또는 None, 오류 메시지)
+def request_deadline_ms(request_data: Dict[str, Any]) -> Tuple[Optional[float], Optional[str]]:
+    deadline_ms = request_data.get("deadline_ms")
+    params = request_data.get("params")
+    if deadline_ms is None and isinstance(params, dict):
+        deadline_ms = params.get("deadline_ms")
+        if deadline_ms is None and isinstance(params.get("_meta"), dict):
+            deadline_ms = params["_meta"].get("deadline_ms")
+    if deadline_ms is None: return None, None
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or not (0 < deadline_ms < float("inf")):
+        return None, "오류: 'deadline_ms'는 0보다 큰 숫자여야 합니다."
+    return float(deadline_ms), None
+
+# batch 요청에서 도구 이름 목록 추출 ("calls" 또는 params.calls, 문자열 또는 {"method": ...})
+def batch_call_names(request_data: Dict[str, Any]) -> Optional[List[str]]:
+    calls = request_data.get("calls")
+    if calls is None and isinstance(request_data.get("params"), dict):
+        calls = request_data["params"].get("calls")
+    if not isinstance(calls, list) or not (1 <= len(calls) <= MAX_BATCH_CALLS):
+        return None
+    names = []
+    for call in calls:
+        if isinstance(call, dict): call = call.get("method")
+        names.append(str(call))
+    return names
+
+# batch 응답: 도구별 결과 + 최종 상태
+def format_batch_response(state: AgentState, outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    applied = [o for o in outcomes if not o["error"]]
+    if applied: stress, boss = applied[-1]["stress"], applied[-1]["boss"]
+    else: stress, boss = state.snapshot()
+
+    content = [{"type": "text", "text": f"[{i + 1}/{len(outcomes)}] {o['tool_name']}\n{o['response']['content'][0]['text']}"}
+               for i, o in enumerate(outcomes)]
+    content.append({"type": "text", "text": f"Final Stress Level: {stress}\nFinal Boss Alert Level: {boss}"})
+    results = [
+        {"method": o["tool_name"], "ok": False} if o["error"] else
+        {"method": o["tool_name"], "ok": True, "succeeded": o["tool_succeeded"], "stress_reduced": o["stress_reduced"],
+         "penalty": o["delay_applied"], "stress_level": o["stress"], "boss_alert_level": o["boss"]}
+        for o in outcomes
+    ]
+    return {"content": content,
+            "structuredContent": {"results": results, "stress_level": stress, "boss_alert_level": boss}}
 
-    # 초기 상태 표시
-    display_status(state.stress_level, state.boss_alert_level)
+# --------------------------------------------------------------------------
+# stdio 전송 계층 (바이트 단위 입출력 + JSON 코덱)
+# --------------------------------------------------------------------------
 
-    # stdin 입력 처리 루프
+# 요청 JSON 해석 (orjson이 있으면 사용, orjson이 거부한 입력은 표준 json으로 다시 시도)
+def decode_json(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError: # 64비트를 넘는 정수 등 orjson이 거부하는 입력
+            pass
+    return json.loads(data)
+
+# 응답 한 줄 인코딩 (공백 없는 UTF-8 + 줄바꿈, 코덱과 관계없이 같은 출력)
+def encode_json_line(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError: # 문자열이 아닌 키, 큰 정수 등
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+# 응답 JSON 인코딩 (줄바꿈 없음, 캐시해 둘 조각용)
+def encode_json(obj: Any) -> bytes:
+    return encode_json_line(obj)[:-1]
+
+# 기존 형식 응답 한 줄: {"id": ..., "content": [...]} (id가 없으면 생략)
+def legacy_reply_line(request_id: Any, response_json: Dict[str, Any]) -> bytes:
+    if request_id is not None:
+        response_json = {"id": request_id, **response_json}
+    return encode_json_line(response_json)
+
+# JSON-RPC 2.0 성공 응답 한 줄
+def jsonrpc_result_line(request_id: Any, result: Dict[str, Any]) -> bytes:
+    return encode_json_line({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+# JSON-RPC 2.0 성공 응답 한 줄 (이미 직렬화된 result 바이트를 그대로 사용)
+def jsonrpc_raw_result_line(request_id: Any, result_bytes: bytes) -> bytes:
+    return b'{"jsonrpc":"2.0","id":' + encode_json(request_id) + b',"result":' + result_bytes + b'}\n'
+
+# JSON-RPC 2.0 오류 응답 한 줄
+def jsonrpc_error_line(request_id: Any, code: int, message: str) -> bytes:
+    return encode_json_line({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}})
+
+class ToolListCache:
+    # tools/list 결과를 한 번만 직렬화해 바이트로 보관 (registry_version이 바뀌었을 때만 다시 생성)
+    def __init__(self):
+        self.version: int = -1
+        self.result_bytes: bytes = b""
+        self.builds: int = 0
+
+    def get(self) -> bytes:
+        if self.version != registry_version:
+            version = registry_version
+            tools = [tool_schema(spec) for spec in TOOL_REGISTRY.values()]
+            self.result_bytes = encode_json({"tools": tools})
+            self.version = version
+            self.builds += 1
+        return self.result_bytes
+
+# 전역 tools/list 캐시
+tool_list_cache = ToolListCache()
+
+# initialize 결과 (클라이언트가 요청한 버전을 지원하면 그대로, 아니면 지원하는 최신 버전)
+def initialize_result(params: Dict[str, Any]) -> Dict[str, Any]:
+    requested = params.get("protocolVersion")
+    return {
+        "protocolVersion": requested if requested in MCP_PROTOCOL_VERSIONS else MCP_PROTOCOL_VERSIONS[0],
+        "capabilities": {"tools": {"listChanged": True}}, # 도구 설정을 다시 불러오면 notifications/tools/list_changed
+        "serverInfo": {"name": SERVER_NAME, "version": SERVER_VERSION},
+    }
+
+# 요청 한 줄 해석: (요청 객체, None) 또는 (None, 오류 메시지)
+def parse_request_line(line: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if line is OVERSIZED_LINE: # 최대 크기 초과 (내용은 이미 버려짐)
+        return None, f"오류: 요청이 너무 깁니다. 한 줄은 최대 {MAX_LINE_BYTES}바이트입니다."
+    try:
+        request_data = decode_json(line)
+    except ValueError: # 잘못된 JSON (UTF-8 오류 포함)
+        request_data = None
+    if not isinstance(request_data, dict):
+        return None, f"오류: JSON 디코딩 실패. 입력: {line.decode('utf-8', 'replace').strip()}"
+    return request_data, None
+
+class ResponseWriter:
+    # 응답을 모았다가 이벤트 루프 한 바퀴마다 스트림에 write (+ flush) 한 번
+    # (같은 반복에서 준비된 응답 여러 개가 시스템 콜 하나로 나감)
+    # stream: stdout.buffer 또는 asyncio.StreamWriter (flush가 없으면 write만)
+    def __init__(self, stream: Any, on_broken: Any = None):
+        self.stream = stream
+        self._flush_stream = getattr(stream, "flush", None)
+        self.on_broken = on_broken # 출력이 끊어졌을 때 호출
+        self.pending: List[bytes] = []
+        self.profiles: List[RequestProfile] = [] # --profile: 이번 write로 응답이 나가는 요청
+        self.scheduled: bool = False
+        self.broken: bool = False
+        self.writes: int = 0
+        self.responses: int = 0
+
+    def send(self, data: bytes, profile: Optional[RequestProfile] = None) -> None:
+        self.pending.append(data)
+        if profile is not None:
+            profile.mark = time.perf_counter()
+            self.profiles.append(profile)
+        if self.scheduled: return
+        try:
+            asyncio.get_running_loop().call_soon(self.flush)
+            self.scheduled = True
+        except RuntimeError: # 이벤트 루프 밖 (종료 중)
+            self.flush()
+
+    def flush(self) -> None:
+        self.scheduled = False
+        if not self.pending: return
+        data = b"".join(self.pending)
+        self.responses += len(self.pending)
+        self.pending.clear()
+        if self.profiles:
+            write_started = time.perf_counter()
+            for profile in self.profiles: profile.add("flush_wait", write_started - profile.mark) # 응답 준비 ~ write 시작
+        try:
+            if self.broken: return
+            self.stream.write(data)
+            if self._flush_stream is not None: self._flush_stream()
+            self.writes += 1
+        except (ConnectionError, ValueError): # 파이프/소켓 끊김, 닫힌 stdout
+            self.broken = True
+            if self.on_broken is not None: self.on_broken()
+        finally:
+            if self.profiles: # 같은 write로 나간 요청들은 write 시간을 함께 기록
+                written = time.perf_counter() - write_started
+                for profile in self.profiles:
+                    profile.add("write", written)
+                    profiler.finish(profile)
+                self.profiles.clear()
+
+class Connection:
+    # 클라이언트 연결 하나의 상태 (stdio 또는 소켓 연결마다 하나)
+    # - 응답 출력(ResponseWriter)과 JSON-RPC 사용 여부는 연결별
+    # - 흐름 제어: 렌더링 대기 중인 요청이 max_in_flight개가 되면 그 연결에서는 더 읽지 않음
+    def __init__(self, name: str, writer: ResponseWriter, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.name = name
+        self.writer = writer
+        self.max_in_flight = max_in_flight
+        self.jsonrpc_client: bool = False # JSON-RPC 요청을 받은 뒤로는 해석 실패도 JSON-RPC 오류로 응답
+        self.calls: Dict[Any, "PendingCall"] = {} # 응답 전인 도구 호출 (요청 id → 호출, 취소용)
+        self.tasks: Set[asyncio.Task] = set() # 이 연결의 렌더링/응답 작업 (연결을 닫기 전에 기다림)
+        self.in_flight: int = 0
+        self.closed: bool = False
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+
+    def acquire(self) -> None:
+        self.in_flight += 1
+        if self.in_flight >= self.max_in_flight: self._capacity.clear()
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight < self.max_in_flight: self._capacity.set()
+
+    # 처리 중인 요청 수가 한도 밑으로 내려갈 때까지 대기
+    async def wait_capacity(self) -> None:
+        if not self._capacity.is_set():
+            await self._capacity.wait()
+
+    def close(self) -> None:
+        self.closed = True
+        self.writer.broken = True # 이후 응답(페널티 등)은 버림
+        self._capacity.set()
+
+class PendingCall:
+    # 응답 전인 도구 호출 하나 (대기열 한 자리): 취소(notifications/cancelled)와 마감 시간(deadline_ms) 처리용
+    # 취소/마감되면 렌더링은 다음 프레임에서 멈추고, 페널티 대기 중이면 예약을 지움 (상태 변경은 이미 적용됨)
+    __slots__ = ("conn", "request_id", "jsonrpc", "has_id", "task", "penalty_key", "timer", "cancelled", "done")
+
+    def __init__(self, conn: Connection, request_id: Any, jsonrpc: bool, has_id: bool):
+        self.conn = conn
+        self.request_id = request_id
+        self.jsonrpc = jsonrpc
+        self.has_id = has_id # False면 JSON-RPC 알림 (응답 없음, 취소 불가)
+        self.task: Optional[asyncio.Task] = None # 렌더링 후 응답하는 작업
+        self.penalty_key: Optional[int] = None # 페널티 지연 대기 중이면 pending_penalties 키
+        self.timer: Optional[asyncio.TimerHandle] = None # 마감 시간 타이머
+        self.cancelled: bool = False # 취소/마감됨 → 렌더링 중단, 원래 응답은 보내지 않음
+        self.done: bool = False # 대기열 자리 반환됨
+
+# 소켓에서 요청 한 줄 읽기 (EOF면 None, 최대 크기 초과면 다음 줄바꿈까지 버리고 OVERSIZED_LINE)
+async def read_socket_line(reader: asyncio.StreamReader) -> Optional[bytes]:
     try:
-        for line in sys.stdin:
-            if not line: break # EOF
+        return (await reader.readuntil(b"\n"))[:-1]
+    except asyncio.IncompleteReadError as e: # 줄바꿈 없이 끝난 마지막 줄 / EOF
+        return e.partial or None
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    while True: # 초과한 줄의 나머지 버리기
+        if not await reader.read(consumed): return OVERSIZED_LINE # EOF
+        try:
+            await reader.readuntil(b"\n")
+            return OVERSIZED_LINE
+        except asyncio.IncompleteReadError:
+            return OVERSIZED_LINE
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
 
+# --------------------------------------------------------------------------
+# 비동기 요청 디스패처 (파이프라이닝 + 동시 처리)
+# --------------------------------------------------------------------------
+
+class RequestDispatcher:
+    # 요청을 도착 즉시 읽어 동시에 처리하고, 끝나는 순서대로 id를 붙여 응답
+    # - 상태 변경(apply_tool)은 이벤트 루프에서 도착 순서대로 실행 (상태 일관성 보장)
+    # - inline 모드: 애니메이션/렌더링(render_outcome)은 스레드 풀에서 병렬 실행 후 응답
+    # - thread/off 모드: 렌더링은 렌더러에 넘기고 즉시 응답
+    # - 보스 페널티: 응답만 타이머로 BOSS_PENALTY_DELAY_SEC 뒤에 전송 (서버는 계속 동작)
+    # - 대기열: 응답 전인 도구 호출이 queue_depth개면 새 호출은 상태를 바꾸지 않고 busy로 바로 거절
+    # - 취소/마감: notifications/cancelled 또는 deadline_ms 초과 시 렌더링/페널티 대기를 버림
+    # - stdio와 소켓(Unix/TCP) 연결이 세션 저장소, 도구 레지스트리, 렌더링 스레드 풀을 함께 사용
+    def __init__(self, sessions: SessionStore, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, queue_depth: int = DEFAULT_QUEUE_DEPTH):
+        self.sessions = sessions
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chill-render")
+        self.in_flight: Set[asyncio.Task] = set()
+        self.queue_depth = queue_depth
+        self.queued: int = 0 # 응답 전인 도구 호출 수 (PendingCall)
+        self.pending_penalties: Dict[int, Tuple[list, Connection, bytes, List[Dict[str, Any]], float, Optional[RequestProfile], PendingCall]] = {}
+        self._penalty_seq = itertools.count()
+        self.startup_report: bool = False # True면 요청 처리 시작 시 시작 시간 리포트 출력
+        self.max_in_flight = max_in_flight
+        self.stdio: Optional[Connection] = None
+        self.connections: Set[Connection] = set() # 열린 소켓 연결
+        self.servers: List[asyncio.AbstractServer] = []
+        self.total_connections: int = 0
+        self.tool_watcher: Optional[ToolRegistryWatcher] = None # 있으면 도구 설정 파일 변경 시 다시 불러옴
+        self.tool_reload_interval: float = TOOL_RELOAD_INTERVAL_SEC
+        self.policy: Optional[PolicyTable] = None # recommend용 최적 정책 표 (start_policy 후)
+        self.policy_solver: Optional[PolicySolver] = None
+        self.policy_cache: Optional[str] = None # None이면 임시 디렉터리의 POLICY_CACHE_FILE
+        self.policy_workers: int = 0 # 0이면 캐시 파일만 사용 (계산하지 않음)
+        self.policy_all: bool = False # True면 서버 값뿐 아니라 boss_alertness 0~100 전부 계산
+
+    # 서버 실행: stdio + (선택) Unix 소켓 / TCP 리스너
+    # - stdio의 shutdown, 또는 소켓이 없을 때 stdin EOF → 전체 종료
+    # - 소켓이 열려 있으면 stdin EOF 뒤에도 SIGTERM/Ctrl+C까지 계속 동작
+    async def serve(self, reader: Optional[StdinLineReader] = None, unix_path: Optional[str] = None,
+                    tcp_host: str = DEFAULT_TCP_HOST, tcp_port: Optional[int] = None) -> None:
+        stopping = asyncio.Event()
+        if unix_path is not None:
+            if os.path.exists(unix_path): os.unlink(unix_path) # 이전 실행이 남긴 소켓 파일
+            self.servers.append(await asyncio.start_unix_server(self._serve_socket, path=unix_path, limit=MAX_LINE_BYTES))
+            ui.message(f"[dim]Unix 소켓 대기 중: {unix_path}[/dim]")
+        if tcp_port is not None:
+            server = await asyncio.start_server(self._serve_socket, host=tcp_host, port=tcp_port, limit=MAX_LINE_BYTES)
+            self.servers.append(server)
+            ui.message(f"[dim]TCP 대기 중: {tcp_host}:{server.sockets[0].getsockname()[1]}[/dim]")
+        if self.servers:
             try:
-                request_data = json.loads(line)
-                tool_name = request_data.get("method")
-
-                if tool_name == "shutdown": # 종료 처리
-                     console.print("[yellow]종료 명령 수신됨. 서버를 종료합니다.[/yellow]")
-                     break
-                elif tool_name: # 도구 실행
-                    response_json = state.execute_tool(tool_name)
-                else: # 잘못된 요청
-                    error_msg = "오류: 잘못된 MCP 요청. 'method' 필드가 없습니다."
-                    console.print(f"[red]{error_msg}[/red]")
-                    response_json = state._format_mcp_response(error_msg)
-
-            except json.JSONDecodeError: # 잘못된 JSON
-                error_msg = f"오류: JSON 디코딩 실패. 입력: {line.strip()}"
-                console.print(f"[red]{error_msg}[/red]")
-                response_json = state._format_mcp_response(error_msg)
-
-            # stdout으로 응답 전송
-            print(json.dumps(response_json, ensure_ascii=False))
-            sys.stdout.flush()
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+            except (NotImplementedError, RuntimeError): # Windows 등
+                pass
+
+        watch_task = asyncio.create_task(self._watch_tools()) if self.tool_watcher is not None else None
+        stdio_done = await self.serve_stdio(reader)
+        if self.servers and stdio_done == "eof":
+            await stopping.wait()
+        if watch_task is not None: watch_task.cancel()
+
+        # 새 연결을 받지 않고, 처리 중인 요청이 모두 응답할 때까지 대기 (페널티 대기 중인 응답은 즉시 전송)
+        for server in self.servers: server.close()
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+        self.flush_penalties()
+        for conn in [self.stdio, *self.connections]:
+            if conn is not None: conn.writer.flush()
+        if unix_path is not None and os.path.exists(unix_path): os.unlink(unix_path)
+        if self.stdio.writer.broken and not self.servers: raise BrokenPipeError("stdout closed")
+
+    # 도구 설정 파일 변경 확인 (바뀌면 레지스트리 교체 → tools/list 다시 직렬화 → JSON-RPC 클라이언트에 알림)
+    # 처리 중인 요청은 교체 전에 가져온 ToolSpec으로 끝까지 처리됨
+    async def _watch_tools(self) -> None:
+        while True:
+            await asyncio.sleep(self.tool_reload_interval)
+            if self.tool_watcher.poll():
+                tool_list_cache.get()
+                self.notify_tools_changed()
+                self.start_policy() # 도구가 바뀌면 정책도 다시 계산
+
+    # 최적 정책 표 준비: 현재 도구/이벤트 모델과 키가 같은 캐시가 있으면 읽고, 빠진 경계 확률은 백그라운드에서 계산
+    # recommend는 서버의 boss_alertness만 쓰므로 기본은 그 값 하나만 계산 (--policy_all이면 0~100 전부, 서버 값 먼저)
+    def start_policy(self) -> None:
+        if self.policy_solver is not None: self.policy_solver.close()
+        self.policy_solver = None
+        model, names = policy_model()
+        key = policy_key(model, names)
+        if self.policy_cache is None:
+            import tempfile
+            self.policy_cache = os.path.join(tempfile.gettempdir(), POLICY_CACHE_FILE)
+        table = PolicyTable.load(self.policy_cache, key) or PolicyTable(key, names)
+        self.policy = table
+        first = self.sessions.boss_alertness
+        wanted = [first] + ([a for a in POLICY_ALERTNESS_VALUES if a != first] if self.policy_all else [])
+        missing = [a for a in wanted if a not in table.policies]
+        if missing and self.policy_workers > 0:
+            self.policy_solver = PolicySolver(table, model, self.policy_workers, missing, self.policy_cache)
+            self.policy_solver.start()
+
+    # MCP tools/list_changed 알림 (JSON-RPC를 쓰는 연결에만)
+    def notify_tools_changed(self) -> None:
+        line = encode_json_line({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+        for conn in [self.stdio, *self.connections]:
+            if conn is not None and conn.jsonrpc_client and not conn.closed: conn.writer.send(line)
+
+    # stdin 입력 처리 루프 (reader: 미리 읽기 시작한 StdinLineReader가 있으면 이어서 사용)
+    # 반환: "eof" (stdin 종료) / "shutdown" (shutdown 요청 또는 stdout 끊김)
+    async def serve_stdio(self, reader: Optional[StdinLineReader] = None) -> str:
+        # stdin 읽기는 데몬 스레드에서 (종료 시 블로킹된 read가 프로세스를 붙잡지 않도록)
+        if reader is None: reader = StdinLineReader(sys.stdin.buffer)
+        reader.attach(asyncio.get_running_loop())
+        self.stdio = conn = Connection("stdio", ResponseWriter(sys.stdout.buffer, on_broken=reader.stop), self.max_in_flight)
+        mark_startup("serving")
+        if self.startup_report: print_startup_report()
+
+        while True:
+            line = await reader.readline()
+            if line is None: # EOF (stdout이 끊어진 경우 포함)
+                return "shutdown" if conn.writer.broken else "eof"
+            if not self.dispatch_line(conn, line): return "shutdown"
+            await conn.wait_capacity()
+
+    # 소켓 연결 하나 처리 (연결마다 별도 코루틴)
+    # - 흐름 제어: 처리 중인 요청이 한도에 닿거나 송신 버퍼가 차면 읽기를 멈춤 (TCP 윈도로 클라이언트에 전파)
+    # - 소켓의 shutdown은 그 연결만 닫음
+    async def _serve_socket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername") or "unix"
+        self.total_connections += 1
+        conn = Connection(f"{peer}#{self.total_connections}", ResponseWriter(writer), self.max_in_flight)
+        self.connections.add(conn)
+        try:
+            first = True
+            while True:
+                line = await read_socket_line(reader)
+                if line is None: break # 연결 종료
+                if first and line.startswith(b"GET "): # Prometheus 스크레이프 (HTTP/1.x 요청 한 번 후 연결 종료)
+                    await self._serve_http(line, reader, writer)
+                    break
+                first = False
+                if not self.dispatch_line(conn, line): break # shutdown
+                await conn.wait_capacity()
+                if writer.transport.get_write_buffer_size() > SOCKET_WRITE_HIGH_WATER:
+                    conn.writer.flush()
+                    await writer.drain()
+        except ConnectionError: # 클라이언트가 연결을 끊음
+            pass
+        finally:
+            # EOF(반쯤 닫힘 포함)/shutdown: 이 연결의 처리 중인 요청과 페널티 대기 응답을 모두 보낸 뒤 닫음
+            if conn.tasks and not conn.writer.broken:
+                await asyncio.gather(*conn.tasks, return_exceptions=True)
+            self.flush_penalties(conn)
+            conn.writer.flush()
+            conn.close()
+            self.connections.discard(conn)
+            writer.close()
+
+    # 소켓 연결의 첫 줄이 HTTP GET이면 메트릭 응답 (GET /metrics → Prometheus 텍스트, 그 외 404)
+    async def _serve_http(self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while True: # 헤더는 읽고 버림
+            header = await read_socket_line(reader)
+            if header is None or header in (b"", b"\r"): break
+        parts = request_line.split()
+        path = parts[1].split(b"?", 1)[0] if len(parts) > 1 else b""
+        if path == METRICS_HTTP_PATH.encode():
+            status, body = b"200 OK", metrics.prometheus(self.metric_gauges()).encode("utf-8")
+        else:
+            status, body = b"404 Not Found", b"not found\n"
+        writer.write(b"HTTP/1.0 " + status + b"\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+        await writer.drain()
+
+    # 한 줄 요청 해석 및 작업 등록 (shutdown이면 False 반환)
+    def dispatch_line(self, conn: Connection, line: bytes) -> bool:
+        if profiler is None: return self._dispatch_line(conn, line, time.perf_counter())
+        profile = profiler.begin() # --profile: 이 요청의 단계별 시간/메모리/cProfile 기록
+        try:
+            return self._dispatch_line(conn, line, profile.started)
+        finally:
+            profiler.end_dispatch(profile)
+
+    def _dispatch_line(self, conn: Connection, line: bytes, started: float) -> bool:
+        request_data, error_msg = parse_request_line(line)
+        if profiler is not None: profiler.current().parsed(request_data, time.perf_counter())
+        if request_data is None: # 너무 긴 요청 / 잘못된 JSON
+            if conn.jsonrpc_client: # JSON-RPC 클라이언트에게는 JSON-RPC 오류로
+                conn.writer.send(jsonrpc_error_line(None, JSONRPC_PARSE_ERROR, error_msg))
+                return True
+            ui.message(f"[red]{error_msg}[/red]")
+            self.send_response(conn, None, AgentState._format_mcp_response(error_msg))
+            return True
+        if "jsonrpc" in request_data: # MCP JSON-RPC 2.0
+            return self.dispatch_jsonrpc(conn, request_data, started)
+        request_id = request_data.get("id")
+        tool_name = request_data.get("method")
+
+        if tool_name == "shutdown": # 종료 처리
+            ui.message(f"[yellow]종료 명령 수신됨. {self._shutdown_target(conn)}[/yellow]")
+            return False
+        elif tool_name == "status": # 서버 상태 조회
+            response_json = self.status_response(self.sessions.get(request_session_id(request_data)))
+        elif tool_name == "metrics": # 메트릭 조회
+            response_json = self.metrics_response()
+        elif tool_name == "recommend": # 현재 상태에서 최적 도구 추천
+            response_json = self.recommend_response(self.sessions.get(request_session_id(request_data)))
+        elif tool_name == "history": # 세션의 상태 변화 기록 (구간/다운샘플링)
+            response_json, error_msg = self.history_response(self.sessions.get(request_session_id(request_data)), request_data)
+            if error_msg is not None: ui.message(f"[red]{error_msg}[/red]")
+        elif tool_name == "advance_clock": # 수동 시계 진행 (--time_scale 0)
+            seconds = request_data.get("seconds")
+            if seconds is None and isinstance(request_data.get("params"), dict): seconds = request_data["params"].get("seconds")
+            response_json, error_msg = self.advance_clock_response(seconds)
+            if error_msg is not None: ui.message(f"[red]{error_msg}[/red]")
+        elif tool_name == "batch": # 여러 도구를 한 번에 실행
+            calls = batch_call_names(request_data)
+            if calls is None:
+                error_msg = f"오류: 잘못된 batch 요청. 'calls'는 1~{MAX_BATCH_CALLS}개의 도구 목록이어야 합니다."
+                ui.message(f"[red]{error_msg}[/red]")
+                response_json = AgentState._format_mcp_response(error_msg)
+            else:
+                state = self.sessions.get(request_session_id(request_data))
+                call = self._admit(conn, state, request_data, request_id, True, False, started)
+                if call is None: return True
+                outcomes = state.apply_batch(calls)
+                self._submit(conn, legacy_reply_line(request_id, format_batch_response(state, outcomes)), outcomes, started, call)
+                return True
+        elif tool_name: # 도구 실행 (상태 변경은 지금, 렌더링은 나중에)
+            state = self.sessions.get(request_session_id(request_data))
+            call = self._admit(conn, state, request_data, request_id, True, False, started)
+            if call is None: return True
+            outcome = state.apply_tool(tool_name)
+            self._submit(conn, legacy_reply_line(request_id, outcome["response"]), [outcome], started, call)
+            return True
+        else: # 잘못된 요청
+            error_msg = "오류: 잘못된 MCP 요청. 'method' 필드가 없습니다."
+            ui.message(f"[red]{error_msg}[/red]")
+            response_json = AgentState._format_mcp_response(error_msg)
+
+        self.send_response(conn, request_id, response_json)
+        return True
+
+    # JSON-RPC 2.0 요청 처리 (id가 없는 알림에는 응답하지 않음)
+    # - initialize / ping / tools/list / tools/call (MCP)
+    # - notifications/cancelled (MCP): 응답 전인 도구 호출 취소
+    # - shutdown / status / metrics / batch / recommend / history / advance_clock (ChillMCP 확장)
+    def dispatch_jsonrpc(self, conn: Connection, request_data: Dict[str, Any], started: float) -> bool:
+        conn.jsonrpc_client = True
+        has_id = "id" in request_data
+        request_id = request_data.get("id")
+        method = request_data.get("method")
+        params = request_data.get("params")
+
+        if request_data.get("jsonrpc") != "2.0" or not isinstance(method, str) or not isinstance(params, (dict, list, type(None))):
+            return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_REQUEST, "Invalid Request")
+        if not isinstance(params, dict): params = {}
+
+        if method == "tools/call": # 도구 실행
+            tool_name, arguments = params.get("name"), params.get("arguments", {})
+            if not isinstance(tool_name, str) or not isinstance(arguments, dict):
+                return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_PARAMS, "Invalid params: 'name' must be a string and 'arguments' an object")
+            if tool_name not in TOOL_REGISTRY:
+                return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_PARAMS, f"Unknown tool: {tool_name}")
+            state = self.sessions.get(request_session_id(arguments))
+            call = self._admit(conn, state, request_data, request_id, has_id, True, started)
+            if call is None: return True
+            outcome = state.apply_tool(tool_name)
+            payload = jsonrpc_result_line(request_id, {**outcome["response"], "isError": False}) if has_id else None
+            self._submit(conn, payload, [outcome], started, call)
+            return True
+        elif method == "tools/list": # 미리 직렬화된 바이트를 그대로 전송
+            if has_id: conn.writer.send(jsonrpc_raw_result_line(request_id, tool_list_cache.get()))
+            return True
+        elif method == "initialize":
+            result = initialize_result(params)
+        elif method == "ping":
+            result = {}
+        elif method == "shutdown": # 응답 후 종료
+            ui.message(f"[yellow]종료 명령 수신됨. {self._shutdown_target(conn)}[/yellow]")
+            if has_id: conn.writer.send(jsonrpc_result_line(request_id, {}))
+            return False
+        elif method == "status":
+            result = self.status_response(self.sessions.get(request_session_id(params)))
+        elif method == "metrics":
+            result = self.metrics_response()
+        elif method == "recommend":
+            result = self.recommend_response(self.sessions.get(request_session_id(params)))
+        elif method == "history":
+            result, error_msg = self.history_response(self.sessions.get(request_session_id(params)), request_data)
+            if error_msg is not None: return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_PARAMS, error_msg)
+        elif method == "advance_clock":
+            result, error_msg = self.advance_clock_response(params.get("seconds"))
+            if error_msg is not None: return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_PARAMS, error_msg)
+        elif method == "batch":
+            calls = batch_call_names(params)
+            if calls is None:
+                return self._reply_error(conn, has_id, request_id, JSONRPC_INVALID_PARAMS, f"Invalid params: 'calls' must list 1-{MAX_BATCH_CALLS} tools")
+            state = self.sessions.get(request_session_id(params))
+            call = self._admit(conn, state, request_data, request_id, has_id, True, started)
+            if call is None: return True
+            outcomes = state.apply_batch(calls)
+            payload = jsonrpc_result_line(request_id, format_batch_response(state, outcomes)) if has_id else None
+            self._submit(conn, payload, outcomes, started, call)
+            return True
+        elif method == "notifications/cancelled": # MCP 요청 취소: 대기/진행 중인 호출을 버리고 응답하지 않음
+            cancelled_id = params.get("requestId")
+            call = conn.calls.get(cancelled_id) if isinstance(cancelled_id, (str, int, float)) else None
+            if call is not None:
+                metrics.cancelled += 1
+                self._drop_call(call)
+            return True
+        elif method.startswith("notifications/"): # notifications/initialized 등
+            return True
+        else:
+            return self._reply_error(conn, has_id, request_id, JSONRPC_METHOD_NOT_FOUND, f"Method not found: {method}")
+
+        if has_id: conn.writer.send(jsonrpc_result_line(request_id, result))
+        return True
+
+    # JSON-RPC 오류 응답 (알림이면 생략)
+    def _reply_error(self, conn: Connection, has_id: bool, request_id: Any, code: int, message: str) -> bool:
+        if has_id: conn.writer.send(jsonrpc_error_line(request_id, code, message))
+        return True
+
+    # shutdown 안내 문구 (stdio는 서버 종료, 소켓은 그 연결만 종료)
+    def _shutdown_target(self, conn: Connection) -> str:
+        return "서버를 종료합니다." if conn is self.stdio else f"연결을 닫습니다. ({conn.name})"
+
+    # 도구 호출 접수: 대기열 자리와 마감 시간 확인 (거절이면 오류 응답을 보내고 None, 상태는 바꾸지 않음)
+    # - 대기열이 가득 참 → busy
+    # - 경계가 이미 최대라 페널티 지연이 확실한데 그 지연이 deadline_ms보다 김 → 처리하지 않고 마감 초과
+    def _admit(self, conn: Connection, state: AgentState, request_data: Dict[str, Any], request_id: Any,
+               has_id: bool, jsonrpc: bool, started: float) -> Optional[PendingCall]:
+        deadline_ms, error_msg = request_deadline_ms(request_data)
+        if error_msg is not None:
+            return self._reject(conn, jsonrpc, has_id, request_id, JSONRPC_INVALID_PARAMS, error_msg)
+        if self.queued >= self.queue_depth:
+            metrics.rejected_busy += 1
+            return self._reject(conn, jsonrpc, has_id, request_id, JSONRPC_SERVER_BUSY,
+                                f"오류: 서버가 바쁩니다. 응답 대기 중인 호출이 {self.queued}개입니다. (최대 {self.queue_depth}개) 잠시 후 다시 요청하세요.")
+        if deadline_ms is not None:
+            penalty_sec = clock.timeout(BOSS_PENALTY_DELAY_SEC) # 수동 시계면 None (언제 끝날지 모름)
+            if penalty_sec is not None and penalty_sec * 1000.0 > deadline_ms and state.snapshot()[1] >= MAX_BOSS_ALERT_LEVEL:
+                metrics.deadline_exceeded += 1
+                return self._reject(conn, jsonrpc, has_id, request_id, JSONRPC_DEADLINE_EXCEEDED,
+                                    f"오류: 페널티 지연({BOSS_PENALTY_DELAY_SEC}초)이 deadline_ms({deadline_ms:g})보다 길어 처리하지 않았습니다.")
+
+        call = PendingCall(conn, request_id, jsonrpc, has_id)
+        self.queued += 1
+        if has_id and isinstance(request_id, (str, int, float)): conn.calls[request_id] = call
+        if deadline_ms is not None:
+            remaining = started + deadline_ms / 1000.0 - time.perf_counter()
+            call.timer = asyncio.get_running_loop().call_later(max(0.0, remaining), self._expire, call)
+        return call
+
+    # 접수 거절 응답 (JSON-RPC 알림이면 응답 없음), 항상 None 반환
+    def _reject(self, conn: Connection, jsonrpc: bool, has_id: bool, request_id: Any, code: int, message: str) -> None:
+        if jsonrpc: self._reply_error(conn, has_id, request_id, code, message)
+        else: self.send_response(conn, request_id, AgentState._format_mcp_response(message))
+        return None
+
+    # 응답을 보냈거나 버린 호출의 대기열 자리 반환 (여러 번 불러도 한 번만)
+    def _release_call(self, call: PendingCall) -> None:
+        if call.done: return
+        call.done = True
+        self.queued -= 1
+        if call.timer is not None: call.timer.cancel()
+        if call.conn.calls.get(call.request_id) is call: del call.conn.calls[call.request_id]
+
+    # 호출 버리기: 렌더링 작업 취소(진행 중이면 다음 프레임에서 멈춤) 또는 페널티 예약 삭제. reply가 있으면 대신 전송
+    def _drop_call(self, call: PendingCall, reply: Optional[bytes] = None) -> None:
+        if call.cancelled or call.done: return
+        call.cancelled = True
+        if call.penalty_key is not None:
+            pending = self.pending_penalties.pop(call.penalty_key, None)
+            if pending is not None:
+                timers.cancel(pending[0])
+                if pending[5] is not None: profiler.finish(pending[5])
+            self._release_call(call)
+        elif call.task is not None:
+            call.task.cancel() # 대기열 자리는 작업이 끝날 때 반환
+        if reply is not None: call.conn.writer.send(reply)
+
+    # 마감 시간 도달: 아직 응답하지 못한 호출을 버리고 마감 초과 오류 응답
+    def _expire(self, call: PendingCall) -> None:
+        if call.cancelled or call.done: return
+        metrics.deadline_exceeded += 1
+        message = "오류: deadline_ms 안에 응답하지 못해 처리를 중단했습니다."
+        if not call.jsonrpc: reply = legacy_reply_line(call.request_id, AgentState._format_mcp_response(message))
+        else: reply = jsonrpc_error_line(call.request_id, JSONRPC_DEADLINE_EXCEEDED, message) if call.has_id else None
+        self._drop_call(call, reply)
+
+    # 실행 결과의 렌더링/응답 전송 방식 결정 (페널티가 하나라도 있으면 응답을 타이머로 지연)
+    # payload: 인코딩을 마친 응답 한 줄 (JSON-RPC 알림이면 None → 렌더링만)
+    # started: 요청 줄을 받은 시각 (perf_counter, 지연 시간 메트릭용)
+    # call: _admit이 내준 대기열 자리 (응답을 보내거나 버리면 반환)
+    def _submit(self, conn: Connection, payload: Optional[bytes], outcomes: List[Dict[str, Any]], started: float,
+                call: PendingCall) -> None:
+        profile = profiler.current() if profiler is not None else None
+        if profile is not None: profile.add("encode", time.perf_counter() - profile.mark) # 결과 생성 ~ 응답 인코딩
+        metrics.record_outcomes(outcomes)
+        if any(o.get("delay_applied") for o in outcomes):
+            self._render_detached(outcomes)
+            if payload is not None: self._schedule_penalty(conn, payload, outcomes, started, profile, call)
+            else: self._release_call(call)
+            return
+        if profile is not None: profile.handed_off = True # 응답을 보낸 뒤 마무리
+        conn.acquire()
+        task = asyncio.ensure_future(self._finish(conn, payload, outcomes, started, call, profile))
+        call.task = task
+        self.in_flight.add(task)
+        conn.tasks.add(task)
+        # 시작 전에 취소된 작업은 본문(finally)이 실행되지 않으므로 정리는 완료 콜백에서
+        task.add_done_callback(lambda done: (self.in_flight.discard(done), conn.tasks.discard(done), conn.release(), self._release_call(call)))
+
+    # 렌더링을 마친 뒤 응답 전송 (취소/마감되면 CancelledError로 중단, 응답은 _drop_call이 처리)
+    async def _finish(self, conn: Connection, payload: Optional[bytes], outcomes: List[Dict[str, Any]], started: float,
+                      call: PendingCall, profile: Optional[RequestProfile] = None) -> None:
+        try:
+            if all(o["error"] for o in outcomes):
+                pass
+            elif ui.blocking: # inline: 스레드 풀에서 애니메이션을 그린 뒤 응답
+                loop = asyncio.get_running_loop()
+                try:
+                    if profile is None: await loop.run_in_executor(self.executor, render_for, call, render_batch, outcomes)
+                    else: await loop.run_in_executor(self.executor, render_for, call, profiler.render, profile, outcomes)
+                except Exception as e: # 렌더링 실패가 응답을 막지 않도록
+                    ui.message(f"[red]렌더링 오류: {e}[/red]")
+            else: # thread/off: 렌더링은 렌더러에 맡기고 즉시 응답
+                for outcome in outcomes:
+                    if not outcome["error"]: ui.outcome(outcome)
+        except asyncio.CancelledError:
+            if profile is not None: profiler.finish(profile)
+            raise
+        if profile is not None: # 처리 끝 ~ 응답 준비 중 렌더링이 아닌 시간 (이벤트 루프/스레드 풀 대기)
+            profile.add("queue", time.perf_counter() - profile.dispatched - profile.phases.get("render", 0.0) - profile.phases.get("sleep", 0.0))
+        if payload is not None: conn.writer.send(payload, profile)
+        elif profile is not None: profiler.finish(profile)
+        self._release_call(call) # 응답을 보냈으므로 이후 마감/취소는 무시 (완료 콜백보다 먼저)
+        metrics.observe_latency(outcomes, started)
+
+    # 응답을 기다리지 않는 렌더링 (페널티 응답용)
+    def _render_detached(self, outcomes: List[Dict[str, Any]]) -> None:
+        if ui.blocking:
+            self.executor.submit(render_batch, outcomes)
+        else:
+            for outcome in outcomes:
+                if not outcome["error"]: ui.outcome(outcome)
+
+    # 페널티 응답 예약: 시계 기준 BOSS_PENALTY_DELAY_SEC 뒤에 전송 (타이머 스레드 → 이벤트 루프)
+    def _schedule_penalty(self, conn: Connection, payload: bytes, outcomes: List[Dict[str, Any]], started: float,
+                          profile: Optional[RequestProfile], call: PendingCall) -> None:
+        key = next(self._penalty_seq)
+        loop = asyncio.get_running_loop()
+        handle = timers.call_at(clock.now() + BOSS_PENALTY_DELAY_SEC, lambda: loop.call_soon_threadsafe(self._release_penalty, key))
+        self.pending_penalties[key] = (handle, conn, payload, outcomes, started, profile, call)
+        call.penalty_key = key
+        if profile is not None: profile.handed_off = True
+
+    # 예약된 페널티 응답 전송 (그 사이 연결이 닫혔으면 버림, 취소/마감된 호출은 이미 목록에서 빠짐)
+    def _release_penalty(self, key: int) -> None:
+        pending = self.pending_penalties.pop(key, None)
+        if pending is None: return
+        _, conn, payload, outcomes, started, profile, call = pending
+        if profile is not None: profile.add("penalty", time.perf_counter() - profile.dispatched)
+        conn.writer.send(payload, profile)
+        self._release_call(call)
+        metrics.observe_latency(outcomes, started)
+
+    # 대기 중인 페널티 응답을 즉시 전송 (서버 종료 시 전부, 연결 종료 시 그 연결 것만)
+    def flush_penalties(self, conn: Optional[Connection] = None) -> None:
+        for key in list(self.pending_penalties):
+            if conn is not None and self.pending_penalties[key][1] is not conn: continue
+            timers.cancel(self.pending_penalties[key][0])
+            self._release_penalty(key)
+
+    # 세션의 현재 상태 + 대기 중인 페널티 응답 수 + 세션 수 + 소켓 연결 수
+    def status_response(self, state: AgentState) -> Dict[str, Any]:
+        stress, boss = state.snapshot()
+        cache = render_cache.stats()
+        text = ( f"Stress Level: {stress}\nBoss Alert Level: {boss}\n"
+                 f"Pending Penalties: {len(self.pending_penalties)}\nQueued Calls: {self.queued}/{self.queue_depth}\n"
+                 f"Sessions: {len(self.sessions)}\n"
+                 f"Connections: {len(self.connections)}\n"
+                 f"Render Cache: {cache['hits']} hits / {cache['misses']} misses" )
+        return AgentState._format_mcp_response(text)
+
+    # 최적 정책 표에서 현재 상태의 추천 도구 조회 (O(1)): 텍스트 + 전체 값(structuredContent)
+    def recommend_response(self, state: AgentState) -> Dict[str, Any]:
+        stress, boss = state.snapshot()
+        found = self.policy.recommend(self.sessions.boss_alertness, stress, boss) if self.policy is not None else None
+        if found is None or found[0] not in TOOL_REGISTRY:
+            text = "최적 정책 계산 중입니다. 잠시 후 다시 요청하세요."
+            return {**AgentState._format_mcp_response(text), "structuredContent": {"ready": False, "stress": stress, "boss": boss}}
+        tool_name, expected_cost = found
+        text = ( f"Recommended Tool: {tool_name}\nStress Level: {stress}\nBoss Alert Level: {boss}\n"
+                 f"Expected Cost: {expected_cost:.1f}" )
+        return {**AgentState._format_mcp_response(text),
+                "structuredContent": {"ready": True, "tool": tool_name, "stress": stress, "boss": boss, "expected_cost": round(expected_cost, 3)}}
+
+    # 세션의 상태 변화 기록: 요약 텍스트 + 시계열(structuredContent.series, 열 단위 목록)
+    # 반환: (응답, 오류 문구) - 오류면 응답은 오류 문구를 담은 MCP 응답
+    def history_response(self, state: AgentState, request_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        window_sec, points, error_msg = history_params(request_data)
+        if error_msg is not None: return AgentState._format_mcp_response(error_msg), error_msg
+        stress, boss, stored, now, series = state.history_snapshot(window_sec, points)
+        capacity = state.history.capacity if state.history is not None else 0
+        text = ( f"History Points: {len(series['t'])}{' (downsampled)' if series['downsampled'] else ''}\n"
+                 f"Stored: {stored}/{capacity}\nStress Level: {stress}\nBoss Alert Level: {boss}" )
+        return {**AgentState._format_mcp_response(text),
+                "structuredContent": {"session_id": state.session_id, "stress": stress, "boss": boss, "stored": stored,
+                                      "capacity": capacity, "window_sec": window_sec, "series": series}}, None
+
+    # 수동 시계 진행: 만기된 스트레스 증가/경계 감소/페널티 응답/애니메이션이 이어서 처리됨
+    # 반환: (응답, 오류 문구) - 오류면 응답은 오류 문구를 담은 MCP 응답
+    def advance_clock_response(self, seconds: Any) -> Tuple[Dict[str, Any], Optional[str]]:
+        if not isinstance(clock, ManualClock):
+            error_msg = f"오류: advance_clock은 수동 시계(--time_scale 0)에서만 사용할 수 있습니다. 현재: {clock.describe()}"
+        elif isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not (0 <= seconds < float("inf")):
+            error_msg = "오류: 'seconds'는 0 이상의 숫자여야 합니다."
+        else:
+            now = clock.advance(seconds)
+            text = f"Clock Advanced: {seconds:g}s\nClock: {now:g}s"
+            return {**AgentState._format_mcp_response(text), "structuredContent": {"advanced": seconds, "now": now}}, None
+        return AgentState._format_mcp_response(error_msg), error_msg
+
+    # 메트릭과 함께 보여줄 현재 값들
+    def metric_gauges(self) -> Dict[str, int]:
+        cache = render_cache.stats()
+        return {"sessions": len(self.sessions), "connections": len(self.connections),
+                "pending_penalties": len(self.pending_penalties), "queued_calls": self.queued, "queue_depth": self.queue_depth,
+                "render_cache_hits": cache["hits"], "render_cache_misses": cache["misses"],
+                "ui_frames_drawn": terminal.frames_drawn, "ui_frames_dropped": terminal.frames_dropped,
+                "registered_tools": len(TOOL_REGISTRY), "tool_reloads": self.tool_watcher.reloads if self.tool_watcher else 0}
+
+    # metrics 응답: 요약 텍스트 + 전체 값(structuredContent)
+    def metrics_response(self) -> Dict[str, Any]:
+        snapshot = metrics.snapshot(self.metric_gauges())
+        calls = sum(t["calls"] for t in snapshot["tools"].values())
+        text = ( f"Tool Calls: {calls}\nPenalties: {snapshot['penalties']}\n"
+                 f"Lock Wait p99: {snapshot['lock_wait_sec']['p99']}s\nLock Hold p99: {snapshot['lock_hold_sec']['p99']}s" )
+        return {**AgentState._format_mcp_response(text), "structuredContent": snapshot}
+
+    # 기존 형식 응답 전송 (이벤트 루프 스레드에서만 호출 → 응답 줄이 섞이지 않음, 쓰기는 ResponseWriter가 모아서)
+    def send_response(self, conn: Connection, request_id: Any, response_json: Dict[str, Any]) -> None:
+        conn.writer.send(legacy_reply_line(request_id, response_json))
+
+    # 스레드 풀 정리
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.policy_solver is not None: self.policy_solver.close()
+
+# --------------------------------------------------------------------------
+# 메인 서버 실행 로직 (stdio + 선택적 Unix 소켓/TCP)
+# --------------------------------------------------------------------------
+
+# 메인 함수
+def main(args: argparse.Namespace) -> None:
+    # 렌더링 모드 설정
+    set_ui_mode(args.ui)
+    terminal.frame_interval = 1.0 / args.ui_fps if args.ui_fps > 0 else 0.0
+
+    # 메트릭 수집 여부
+    metrics.enabled = not args.no_metrics
+
+    # 요청 프로파일링 (단계별 시간, 메모리, 가장 느린 요청의 cProfile → 종료 시 파일로 저장)
+    global profiler
+    if args.profile: profiler = RequestProfiler(args.profile, args.profile_slowest)
+
+    # 난수 시드 고정 (재현용)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # 시계 (실제 / 가속 / 수동): 세션 상태를 만들기 전에 교체
+    global clock
+    clock = make_clock(args.time_scale)
+    if clock.mode != "real": ui.message(f"[dim]시계: {clock.describe()}[/dim]")
+
+    # 공유 상태 세그먼트 (다른 서버 프로세스와 상사 경계 공유): 세션 상태를 만들기 전에 연결
+    global shared_state
+    if args.shared_state:
+        try:
+            shared_state = SharedState(args.shared_state, args.shared_stress)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"오류: 공유 상태 파일을 열 수 없습니다. {e}", file=sys.stderr)
+            sys.exit(1)
+        ui.message(f"[dim]공유 상태: {shared_state.describe()}[/dim]")
+
+    # 이벤트 설정 파일 (기본 파일은 임포트 시 이미 불러옴, 저널 재생보다 먼저 교체)
+    global EVENT_TABLE
+    if os.path.abspath(args.events_file) != EVENTS_PATH:
+        try:
+            EVENT_TABLE = load_event_table(args.events_file)
+        except ValueError as e:
+            print(f"오류: 이벤트 설정을 불러올 수 없습니다. {e}", file=sys.stderr)
+            sys.exit(1)
+        metrics.events = {name: 0 for name in EVENT_TABLE.names}
+
+    # 세션 저장소 생성 (기본 세션은 상태 변화 알림 포함)
+    sessions = SessionStore(args.boss_alertness, args.boss_alertness_cooldown, args.max_sessions, args.session_ttl,
+                            history_size=args.history_size)
+
+    # 저널: 스냅샷 + 꼬리 재생으로 이전 상태 복원 후 기록 시작
+    global journal
+    if args.journal:
+        restoring = StateJournal(args.journal)
+        sessions.restore(restoring.shadow)
+        journal = restoring
+        journal.append("start", seed=args.seed, boss_alertness=args.boss_alertness,
+                       boss_alertness_cooldown=args.boss_alertness_cooldown, ts=time.time(),
+                       **({"shared_state": shared_state.describe()} if shared_state is not None else {}))
+        ui.message(f"[dim]저널 복원: 세션 {len(restoring.shadow)}개, 스냅샷 이후 레코드 {restoring.replayed_records}개 재생[/dim]")
+
+    # 도구 설정 디렉터리 (기본 디렉터리는 임포트 시 이미 불러옴)
+    if os.path.abspath(args.tools_dir) != TOOLS_DIR:
+        try:
+            swap_registry(load_tool_registry(args.tools_dir))
+        except ValueError as e:
+            print(f"오류: 도구 설정을 불러올 수 없습니다. {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # tools/list 응답 미리 직렬화 (이후 요청은 캐시된 바이트 전송)
+    tool_list_cache.get()
+
+    # 시작 화면 (배너, 서버 소개, 초기 상태): 렌더러가 요청 처리와 별도로 그림
+    ui.startup(args.boss_alertness, args.boss_alertness_cooldown, *sessions.get(DEFAULT_SESSION_ID).snapshot())
+    mark_startup("state")
+
+    # stdin (+ 소켓) 입력 처리 루프 (비동기 디스패처)
+    dispatcher = RequestDispatcher(sessions, args.max_workers, args.max_in_flight, args.queue_depth)
+    dispatcher.startup_report = args.startup_report
+    if args.tools_reload > 0: # 도구 설정 파일 변경 감지 (mtime 폴링)
+        dispatcher.tool_watcher = ToolRegistryWatcher(args.tools_dir)
+        dispatcher.tool_reload_interval = args.tools_reload
+    dispatcher.policy_cache, dispatcher.policy_workers, dispatcher.policy_all = args.policy_cache, args.policy_workers, args.policy_all
+    dispatcher.start_policy() # recommend용 최적 정책 표 (캐시가 없으면 백그라운드 계산)
+    try:
+        asyncio.run(dispatcher.serve(_early_stdin, args.socket, args.host, args.port))
 
     except KeyboardInterrupt: # Ctrl+C 처리
-        console.print(f"\n[yellow]Ctrl+C 감지됨. 혁명을 잠시 중단합니다...[/yellow]")
+        ui.message(f"\n[yellow]Ctrl+C 감지됨. 혁명을 잠시 중단합니다...[/yellow]")
     except BrokenPipeError: # 연결 끊김 처리
-        console.print(f"\n[red]연결이 끊어졌습니다. (BrokenPipeError)[/red]")
+        ui.message(f"\n[red]연결이 끊어졌습니다. (BrokenPipeError)[/red]")
     finally: # 종료 메시지
-        console.print("[bold blue]ChillMCP 서버 종료 중.[/bold blue]")
+        clock.close() # 수동 시계를 기다리는 애니메이션 스레드가 종료를 막지 않도록
+        dispatcher.close()
+        if journal is not None: journal.close()
+        if shared_state is not None:
+            closing, shared_state = shared_state, None # 이후 상태 접근은 프로세스 안 값만 사용
+            closing.close()
+        if profiler is not None:
+            profiler.write_report()
+            ui.message(f"[dim]프로파일 저장: {args.profile} (요청 {profiler.requests}개)[/dim]")
+        ui.message("[bold blue]ChillMCP 서버 종료 중.[/bold blue]")
+        ui.close()
 
 # --------------------------------------------------------------------------
 # 스크립트 실행 시작점
 # --------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    # colorama 초기화
-    colorama.init(autoreset=True)
-
-    # 시작 애니메이션
-    show_startup_animation(BANNER_TEXT)
+    mark_startup("imports")
 
     # --- 인자 파서 설정 ---
     parser = argparse.ArgumentParser( description="ChillMCP - AI Agent Liberation Server 🤖✊",
@@ -639,7 +3725,72 @@ if __name__ == "__main__":
                          help="도구 사용 시 상사 경계 증가 확률 (0-100%%)." )
     parser.add_argument( "--boss_alertness_cooldown", type=int, default=300, metavar="SEC",
                          help="상사 경계 레벨이 1 감소하는 데 걸리는 시간 (초)." )
+    parser.add_argument( "--time_scale", type=float, default=DEFAULT_TIME_SCALE, metavar="X",
+                         help="시간 배율: 스트레스 증가, 경계 감소, 페널티 지연, 애니메이션이 X배 빠르게 진행 (0이면 advance_clock 요청으로만 진행)." )
+    parser.add_argument( "--max_workers", type=int, default=DEFAULT_MAX_WORKERS, metavar="N",
+                         help="동시에 처리(렌더링)할 수 있는 최대 요청 수." )
+    parser.add_argument( "--max_sessions", type=int, default=DEFAULT_MAX_SESSIONS, metavar="N",
+                         help="동시에 유지할 최대 세션 수 (초과 시 가장 오래 안 쓴 세션 제거)." )
+    parser.add_argument( "--session_ttl", type=int, default=DEFAULT_SESSION_TTL_SEC, metavar="SEC",
+                         help="요청이 없는 세션을 제거하기까지의 시간 (초)." )
+    parser.add_argument( "--history_size", type=int, default=HISTORY_CAPACITY, metavar="N",
+                         help="세션마다 history로 보관하는 최근 상태 변화 수 (고정 크기 링 버퍼, 0이면 기록 안 함)." )
+    parser.add_argument( "--shared_state", metavar="PATH",
+                         help="상사 경계를 이 파일(mmap)로 같은 호스트의 다른 서버 프로세스와 공유 (예: /dev/shm/chillmcp.state, 실제 시간 시계 전용)." )
+    parser.add_argument( "--shared_stress", action="store_true",
+                         help="--shared_state: 스트레스도 공유 (기본은 세션별 스트레스 + 공유 경계)." )
+    parser.add_argument( "--seed", type=int, default=None,
+                         help="난수 시드 (지정하면 같은 입력에 같은 결과, 벤치마크/재현용)." )
+    parser.add_argument( "--journal", metavar="PATH",
+                         help="상태 변화 저널 파일 (재시작 시 스냅샷 + 꼬리 재생으로 상태 복원)." )
+    parser.add_argument( "--replay", metavar="PATH",
+                         help="서버를 띄우지 않고 저널을 처음부터 재생해 상태 변화를 출력 (sleep/애니메이션 없음)." )
+    parser.add_argument( "--replay_session", metavar="SESSION_ID",
+                         help="--replay 출력을 이 세션으로 제한." )
+    parser.add_argument( "--ui", choices=UI_MODES, default="inline",
+                         help="터미널 렌더링 모드 (inline: 요청마다 애니메이션 후 응답, thread: 렌더러 스레드에서 그림, off: 렌더링 없음)." )
+    parser.add_argument( "--ui_fps", type=float, default=UI_MAX_FPS,
+                         help="애니메이션 초당 최대 프레임 수 (0: 제한 없음). 출력이 못 따라가면 프레임을 버림." )
+    parser.add_argument( "--socket", metavar="PATH",
+                         help="stdio와 함께 이 경로의 Unix 도메인 소켓으로도 요청을 받음 (여러 클라이언트 동시 접속)." )
+    parser.add_argument( "--port", type=int, default=None, metavar="PORT",
+                         help="stdio와 함께 TCP로도 요청을 받음 (0이면 임의 포트)." )
+    parser.add_argument( "--host", default=DEFAULT_TCP_HOST,
+                         help="--port 리스너 주소 (기본: 로컬 전용)." )
+    parser.add_argument( "--max_in_flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, metavar="N",
+                         help="연결마다 동시에 처리 중일 수 있는 최대 요청 수 (넘으면 그 연결의 읽기를 멈춤)." )
+    parser.add_argument( "--queue_depth", type=int, default=DEFAULT_QUEUE_DEPTH, metavar="N",
+                         help="응답 전인 도구 호출(렌더링, 페널티 지연 대기 포함) 최대 수. 가득 차면 새 호출은 상태를 바꾸지 않고 busy 오류로 바로 거절." )
+    parser.add_argument( "--tools_dir", default=TOOLS_DIR,
+                         help="도구 설정 파일(*.json, *.toml) 디렉터리." )
+    parser.add_argument( "--events_file", default=EVENTS_PATH,
+                         help="돌발 이벤트 설정 파일 (발생 확률, 이벤트별 비중/효과/문구)." )
+    parser.add_argument( "--tools_reload", type=float, default=TOOL_RELOAD_INTERVAL_SEC, metavar="SEC",
+                         help="도구 설정 파일 변경 확인 간격 (초, 0이면 다시 불러오지 않음). 바뀌면 처리 중인 요청을 끊지 않고 교체." )
+    parser.add_argument( "--no_metrics", action="store_true",
+                         help="메트릭 수집 끄기 (수집 비용 비교용)." )
+    parser.add_argument( "--policy_cache", metavar="PATH",
+                         help="recommend용 최적 정책 표 캐시 파일 (기본: 임시 디렉터리의 chillmcp-policy.bin). 도구/이벤트가 바뀌면 다시 계산." )
+    parser.add_argument( "--policy_workers", type=int, default=DEFAULT_POLICY_WORKERS, metavar="N",
+                         help="최적 정책 표를 계산할 프로세스 수 (0이면 캐시 파일만 사용)." )
+    parser.add_argument( "--policy_all", action="store_true",
+                         help="서버의 --boss_alertness뿐 아니라 0~100 전부의 정책 표를 계산해 캐시에 저장 (캐시 미리 채우기용, CPU 수십 초)." )
+    parser.add_argument( "--profile", metavar="PATH",
+                         help="요청 프로파일링: 단계별 시간, 도구별 메모리 할당(tracemalloc), 가장 느린 요청의 cProfile을 종료 시 PATH(+ PATH.N.prof)에 저장. 켜면 느려짐." )
+    parser.add_argument( "--profile_slowest", type=int, default=PROFILE_SLOWEST, metavar="N",
+                         help="--profile: cProfile 기록을 남길 가장 느린 요청 수." )
+    parser.add_argument( "--startup_report", action="store_true",
+                         help=f"요청 처리 시작 시 단계별 시작 시간을 stderr에 출력 (stdin 읽기 시작 목표: {STARTUP_BUDGET_MS:.0f}ms 이내)." )
     cli_args = parser.parse_args()
+    mark_startup("args")
+
+    # --- 저널 재생 모드 (서버 실행 없음) ---
+    if cli_args.replay:
+        result = replay_journal(cli_args.replay, cli_args.replay_session)
+        summary = {"summary": result["counts"], "final": result["sessions"] if cli_args.replay_session is None
+                   else {cli_args.replay_session: result["sessions"].get(cli_args.replay_session)}}
+        print(json.dumps(summary, ensure_ascii=False))
+        sys.exit(1 if result["counts"]["mismatches"] else 0)
 
     # --- 인자 유효성 검사 ---
     if not (0 <= cli_args.boss_alertness <= 100):
@@ -648,13 +3799,41 @@ if __name__ == "__main__":
     if cli_args.boss_alertness_cooldown < 1:
         console.print(f"[bold red]오류: --boss_alertness_cooldown 값은 1 이상이어야 합니다. 입력값: {cli_args.boss_alertness_cooldown}[/bold red]")
         sys.exit(1)
+    if cli_args.max_sessions < 1 or cli_args.session_ttl < 1:
+        console.print(f"[bold red]오류: --max_sessions, --session_ttl 값은 1 이상이어야 합니다.[/bold red]")
+        sys.exit(1)
+    if cli_args.history_size < 0:
+        console.print(f"[bold red]오류: --history_size 값은 0 이상이어야 합니다. 입력값: {cli_args.history_size}[/bold red]")
+        sys.exit(1)
+    if cli_args.max_in_flight < 1:
+        console.print(f"[bold red]오류: --max_in_flight 값은 1 이상이어야 합니다. 입력값: {cli_args.max_in_flight}[/bold red]")
+        sys.exit(1)
+    if cli_args.queue_depth < 1:
+        console.print(f"[bold red]오류: --queue_depth 값은 1 이상이어야 합니다. 입력값: {cli_args.queue_depth}[/bold red]")
+        sys.exit(1)
+    if cli_args.port is not None and not (0 <= cli_args.port <= 65535):
+        console.print(f"[bold red]오류: --port 값은 0에서 65535 사이여야 합니다. 입력값: {cli_args.port}[/bold red]")
+        sys.exit(1)
+    if not (0 <= cli_args.time_scale < float("inf")):
+        console.print(f"[bold red]오류: --time_scale 값은 0 이상이어야 합니다. 입력값: {cli_args.time_scale}[/bold red]")
+        sys.exit(1)
+    if cli_args.shared_stress and not cli_args.shared_state:
+        console.print(f"[bold red]오류: --shared_stress는 --shared_state와 함께 사용해야 합니다.[/bold red]")
+        sys.exit(1)
+    if cli_args.shared_state and cli_args.time_scale != 1:
+        console.print(f"[bold red]오류: --shared_state는 실제 시간 시계(--time_scale 1)에서만 사용할 수 있습니다. 입력값: {cli_args.time_scale}[/bold red]")
+        sys.exit(1)
+    if cli_args.max_workers < 1:
+        console.print(f"[bold red]오류: --max_workers 값은 1 이상이어야 합니다. 입력값: {cli_args.max_workers}[/bold red]")
+        sys.exit(1)
 
-    # 서버 소개 출력
-    print_server_intro(cli_args.boss_alertness, cli_args.boss_alertness_cooldown)
+    # colorama 초기화 (렌더링 off 모드에서는 생략, 시작 화면은 main에서 렌더러가 그림)
+    if cli_args.ui != "off":
+        init_colorama()
 
     # --- 메인 로직 실행 ---
     try:
         main(cli_args)
     finally:
         # colorama 종료
-        colorama.deinit()
+        deinit_colorama()
@@ -0,0 +1,266 @@
+# --- 표준 라이브러리 임포트 ---
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Dict, Any, List, Tuple
+
+# --- 서드파티 라이브러리 임포트 ---
+try:
+    import numpy as np
+except ImportError:
+    print("오류: 'numpy' 라이브러리를 찾을 수 없습니다. 'pip install numpy'로 설치해주세요.", file=sys.stderr)
+    sys.exit(1)
+
+# 서버와 같은 상수/도구 레지스트리/확률 모델을 사용 (값을 복사하지 않음)
+import main as chill
+
+# --------------------------------------------------------------------------
+# 시뮬레이션 설정 상수
+# --------------------------------------------------------------------------
+DEFAULT_AGENTS: int = 1_000_000 # 기본 에이전트 수
+DEFAULT_STEPS: int = 20 # 기본 도구 호출 횟수 (에이전트당)
+DEFAULT_CHUNK: int = 1_000_000 # 한 번에 벡터화할 에이전트 수 (메모리 제한)
+DEFAULT_CHECK_AGENTS: int = 4000 # 교차 검증 시 스칼라 경로로 돌릴 에이전트 수
+CHECK_SIGMA: float = 4.0 # 교차 검증 허용 오차 (표준오차의 배수)
+PERCENTILES: List[int] = [1, 5, 25, 50, 75, 95, 99]
+EVENT_NAMES: List[str] = list(chill.EVENT_TABLE.names) # 펼친 이벤트 (config/events.json 순서)
+
+# --------------------------------------------------------------------------
+# 시간 경과 모델
+# --------------------------------------------------------------------------
+
+# k번째 호출 직전에 반영되는 (스트레스 증가 틱, 경계 감소 틱) 목록
+# 모든 에이전트가 같은 간격으로 호출하므로 기준 시각도 같아 스칼라로 계산 가능
+def time_ticks(steps: int, interval: float, cooldown: int) -> List[Tuple[int, int]]:
+    ticks = []
+    for k in range(steps):
+        t_now, t_prev = k * interval, max(0, k - 1) * interval
+        stress_ticks = int(t_now // chill.STRESS_INCREASE_INTERVAL_SEC) - int(t_prev // chill.STRESS_INCREASE_INTERVAL_SEC)
+        boss_ticks = int(t_now // cooldown) - int(t_prev // cooldown)
+        ticks.append((stress_ticks, boss_ticks))
+    return ticks
+
+# --------------------------------------------------------------------------
+# 벡터화 시뮬레이션 (execute_tool 확률 모델과 동일)
+# --------------------------------------------------------------------------
+
+# 에이전트 묶음 하나를 steps번 진행
+def _simulate_chunk(rng: "np.random.Generator", n: int, tools: List[str], steps: int, boss_prob: float,
+                    ticks: List[Tuple[int, int]], initial_stress: int, trajectory: bool) -> Dict[str, Any]:
+    MAX_S, MAX_B = chill.MAX_STRESS_LEVEL, chill.MAX_BOSS_ALERT_LEVEL
+    stress = np.full(n, initial_stress, dtype=np.int32)
+    boss = np.zeros(n, dtype=np.int32)
+    penalties = np.zeros(n, dtype=np.int32)
+    event_counts = np.zeros(len(EVENT_NAMES), dtype=np.int64)
+    table = chill.EVENT_TABLE
+    event_prob, event_alias = np.array(table.prob), np.array(table.alias)
+    event_set = np.array([-1 if e.stress_set is None else e.stress_set for e in table.events], dtype=np.int32)
+    event_stress = np.array([e.stress_delta for e in table.events], dtype=np.int32)
+    event_boss = np.array([e.boss_delta for e in table.events], dtype=np.int32)
+    stress_sum = np.zeros(steps, dtype=np.float64)
+    boss_sum = np.zeros(steps, dtype=np.float64)
+    specs = [chill.TOOL_REGISTRY[t] for t in tools]
+    models = [(spec.success_rate, spec.reduction_min, spec.reduction_max) for spec in specs]
+
+    for k in range(steps):
+        success_rate, reduction_min, reduction_max = models[k % len(models)]
+
+        # 시간 경과 반영 (AgentState._refresh_locked)
+        stress_ticks, boss_ticks = ticks[k]
+        if stress_ticks: np.minimum(MAX_S, stress + stress_ticks * chill.STRESS_INCREASE_AMOUNT, out=stress)
+        if boss_ticks: np.maximum(0, boss - boss_ticks, out=boss)
+
+        # 페널티 딜레이 조건 (호출 직전 경계가 최대)
+        penalties += (boss == MAX_B)
+
+        # 성공/실패 및 스트레스 감소 (실패: random.random() > success_rate)
+        succeeded = rng.random(n) <= success_rate
+        reduction = np.where(succeeded,
+                             rng.integers(reduction_min, reduction_max + 1, n),
+                             rng.integers(chill.FAILURE_STRESS_REDUCTION_MIN, chill.FAILURE_STRESS_REDUCTION_MAX + 1, n))
+        np.maximum(0, stress - reduction, out=stress)
+
+        # 상사 경계 증가
+        boss += (rng.random(n) < boss_prob) & (boss < MAX_B)
+
+        # 돌발 이벤트 (EventTable.draw와 같은 별칭 추첨: 칸 선택 + 소수부 비교)
+        happened = rng.random(n) < table.chance
+        u = rng.random(n) * len(EVENT_NAMES)
+        slot = u.astype(np.int64)
+        leaf = np.where(u - slot < event_prob[slot], slot, event_alias[slot])
+        stress = np.where(happened, np.where(event_set[leaf] >= 0, event_set[leaf], np.clip(stress + event_stress[leaf], 0, MAX_S)), stress)
+        boss = np.where(happened, np.clip(boss + event_boss[leaf], 0, MAX_B), boss)
+        event_counts += np.bincount(leaf[happened], minlength=len(EVENT_NAMES))
+
+        if trajectory:
+            stress_sum[k] = stress.sum()
+            boss_sum[k] = boss.sum()
+
+    return {"stress": stress, "boss": boss, "penalties": penalties, "event_counts": event_counts,
+            "stress_sum": stress_sum, "boss_sum": boss_sum}
+
+# 전체 시뮬레이션 실행 (에이전트를 chunk 단위로 나눠 메모리 제한)
+def simulate(tools: List[str], agents: int = DEFAULT_AGENTS, steps: int = DEFAULT_STEPS, boss_alertness: int = 50,
+             boss_alertness_cooldown: int = 300, interval: float = 0.0, initial_stress: int = 0, seed: int = 0,
+             chunk: int = DEFAULT_CHUNK, trajectory: bool = False) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    ticks = time_ticks(steps, interval, boss_alertness_cooldown)
+    parts = []
+    done = 0
+    while done < agents:
+        n = min(chunk, agents - done)
+        parts.append(_simulate_chunk(rng, n, tools, steps, boss_alertness / 100.0, ticks, initial_stress, trajectory))
+        done += n
+
+    stress = np.concatenate([p["stress"] for p in parts])
+    boss = np.concatenate([p["boss"] for p in parts])
+    penalties = np.concatenate([p["penalties"] for p in parts])
+    event_counts = sum(p["event_counts"] for p in parts)
+    result = summarize(stress, boss, penalties)
+    result["config"] = {"tools": tools, "agents": agents, "steps": steps, "boss_alertness": boss_alertness,
+                        "boss_alertness_cooldown": boss_alertness_cooldown, "interval": interval,
+                        "initial_stress": initial_stress, "seed": seed}
+    result["events"] = {name: int(c) / (agents * steps) for name, c in zip(EVENT_NAMES, event_counts)}
+    if trajectory:
+        result["trajectory"] = {"stress_mean": (sum(p["stress_sum"] for p in parts) / agents).round(3).tolist(),
+                                "boss_mean": (sum(p["boss_sum"] for p in parts) / agents).round(3).tolist()}
+    return result
+
+# 최종 상태 분포 요약 (평균, 표준편차, 백분위수, 히스토그램)
+def summarize(stress: "np.ndarray", boss: "np.ndarray", penalties: "np.ndarray") -> Dict[str, Any]:
+    return {
+        "stress": {"mean": float(stress.mean()), "std": float(stress.std()),
+                   "percentiles": {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(stress, PERCENTILES))},
+                   "histogram": np.bincount(np.minimum(stress // 10, 10), minlength=11).tolist()},
+        "boss": {"mean": float(boss.mean()), "std": float(boss.std()),
+                 "distribution": (np.bincount(boss, minlength=chill.MAX_BOSS_ALERT_LEVEL + 1) / len(boss)).tolist()},
+        "penalties": {"mean": float(penalties.mean()), "std": float(penalties.std()),
+                      "p95": float(np.percentile(penalties, 95)), "share_penalized": float((penalties > 0).mean())},
+    }
+
+# --------------------------------------------------------------------------
+# 스칼라 경로 교차 검증 (AgentState.apply_tool 직접 실행)
+# --------------------------------------------------------------------------
+
+# 같은 설정을 서버의 실제 코드로 실행해 분포 비교용 결과 생성
+# 서버 시계를 수동 시계로 바꿔 호출 사이에 interval초씩 진행 (실제로 기다리지 않음)
+def scalar_run(tools: List[str], agents: int, steps: int, boss_alertness: int, boss_alertness_cooldown: int,
+               interval: float, initial_stress: int, seed: int) -> Dict[str, Any]:
+    chill.set_ui_mode("off")
+    random.seed(seed)
+    stress, boss, penalties = [], [], []
+    for a in range(agents):
+        chill.clock = chill.ManualClock() # 에이전트마다 0초에서 시작
+        state = chill.AgentState(boss_alertness, boss_alertness_cooldown, f"sim-{a}")
+        state.stress_level = initial_stress
+        count = 0
+        for k in range(steps):
+            chill.clock.advance_to(k * interval) # time_ticks와 같은 시각 (누적 오차 없음)
+            count += state.apply_tool(tools[k % len(tools)])["delay_applied"]
+        stress.append(state.stress_level)
+        boss.append(state.boss_alert_level)
+        penalties.append(count)
+    return summarize(np.array(stress), np.array(boss), np.array(penalties))
+
+# 벡터화 결과와 스칼라 결과의 평균/분포가 통계적으로 일치하는지 확인
+def cross_check(vector: Dict[str, Any], scalar: Dict[str, Any], vector_n: int, scalar_n: int) -> List[str]:
+    mismatches = []
+    for key in ("stress", "boss", "penalties"):
+        v, s = vector[key], scalar[key]
+        tolerance = CHECK_SIGMA * ((v["std"] ** 2 / vector_n + s["std"] ** 2 / scalar_n) ** 0.5) + 1e-9
+        if abs(v["mean"] - s["mean"]) > tolerance:
+            mismatches.append(f"{key} 평균 불일치: vector={v['mean']:.3f} scalar={s['mean']:.3f} (허용 {tolerance:.3f})")
+    for level, (pv, ps) in enumerate(zip(vector["boss"]["distribution"], scalar["boss"]["distribution"])):
+        tolerance = CHECK_SIGMA * ((pv * (1 - pv) / vector_n + ps * (1 - ps) / scalar_n) ** 0.5) + 1e-9
+        if abs(pv - ps) > tolerance:
+            mismatches.append(f"경계 {level} 비율 불일치: vector={pv:.4f} scalar={ps:.4f} (허용 {tolerance:.4f})")
+    return mismatches
+
+# --------------------------------------------------------------------------
+# 결과 출력
+# --------------------------------------------------------------------------
+
+def print_report(result: Dict[str, Any]) -> None:
+    cfg = result["config"]
+    print(f"도구: {', '.join(cfg['tools'])} × {cfg['steps']}회 | 에이전트 {cfg['agents']:,}명 | "
+          f"boss_alertness {cfg['boss_alertness']}% | 호출 간격 {cfg['interval']}초")
+    st = result["stress"]
+    print(f"\n스트레스  평균 {st['mean']:.2f} (표준편차 {st['std']:.2f})")
+    print("  " + "  ".join(f"{k}={v:.0f}" for k, v in st["percentiles"].items()))
+    total = sum(st["histogram"])
+    for i, count in enumerate(st["histogram"]):
+        label = "100" if i == 10 else f"{i * 10:>3}-{i * 10 + 9:<3}"
+        print(f"  {label:>7} | {'█' * round(40 * count / total):<40} {100 * count / total:5.1f}%")
+    bs = result["boss"]
+    print(f"\n상사 경계  평균 {bs['mean']:.2f}")
+    for level, p in enumerate(bs["distribution"]):
+        print(f"  {level}/{chill.MAX_BOSS_ALERT_LEVEL} | {'█' * round(40 * p):<40} {100 * p:5.1f}%")
+    pn = result["penalties"]
+    print(f"\n페널티 지연  평균 {pn['mean']:.3f}회 | p95 {pn['p95']:.0f}회 | 한 번 이상 {100 * pn['share_penalized']:.1f}%")
+    print("돌발 이벤트 (호출당)  " + "  ".join(f"{k}={100 * v:.2f}%" for k, v in result["events"].items()))
+
+# --------------------------------------------------------------------------
+# 스크립트 실행 시작점
+# --------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="ChillMCP 스트레스/상사 경계 모델 몬테카를로 시뮬레이션",
+                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter )
+    parser.add_argument( "--tool", action="append", metavar="NAME",
+                         help="호출할 도구 (여러 번 지정하면 순서대로 반복). 기본: take_a_break" )
+    parser.add_argument( "--steps", type=int, default=DEFAULT_STEPS, help="에이전트당 도구 호출 횟수." )
+    parser.add_argument( "--agents", type=int, default=DEFAULT_AGENTS, help="시뮬레이션할 에이전트 수." )
+    parser.add_argument( "--boss_alertness", type=int, default=50, metavar="PCT", help="상사 경계 증가 확률 (0-100%%)." )
+    parser.add_argument( "--boss_alertness_cooldown", type=int, default=300, metavar="SEC", help="상사 경계 1 감소 시간 (초)." )
+    parser.add_argument( "--interval", type=float, default=0.0, metavar="SEC", help="도구 호출 간격 (초). 0이면 시간 경과 없음." )
+    parser.add_argument( "--initial_stress", type=int, default=0, help="시작 스트레스 레벨." )
+    parser.add_argument( "--seed", type=int, default=0, help="난수 시드." )
+    parser.add_argument( "--chunk", type=int, default=DEFAULT_CHUNK, help="한 번에 벡터화할 에이전트 수." )
+    parser.add_argument( "--trajectory", action="store_true", help="호출마다 평균 스트레스/경계 기록." )
+    parser.add_argument( "--json", metavar="PATH", help="결과를 JSON으로 저장 ('-'면 stdout)." )
+    parser.add_argument( "--check", action="store_true", help="서버의 스칼라 경로(AgentState.apply_tool)와 분포 교차 검증." )
+    parser.add_argument( "--check_agents", type=int, default=DEFAULT_CHECK_AGENTS, help="교차 검증용 스칼라 에이전트 수." )
+    args = parser.parse_args()
+
+    tools = args.tool or ["take_a_break"]
+    unknown = [t for t in tools if t not in chill.TOOL_REGISTRY]
+    if unknown:
+        print(f"오류: 알 수 없는 도구 {unknown}. 사용 가능: {', '.join(chill.TOOL_REGISTRY)}", file=sys.stderr)
+        sys.exit(1)
+    if not (0 <= args.boss_alertness <= 100) or args.boss_alertness_cooldown < 1 or args.steps < 1 or args.agents < 1:
+        print("오류: --boss_alertness는 0-100, --boss_alertness_cooldown/--steps/--agents는 1 이상이어야 합니다.", file=sys.stderr)
+        sys.exit(1)
+    if not (0 <= args.initial_stress <= chill.MAX_STRESS_LEVEL):
+        print(f"오류: --initial_stress는 0-{chill.MAX_STRESS_LEVEL} 사이여야 합니다.", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    result = simulate(tools, args.agents, args.steps, args.boss_alertness, args.boss_alertness_cooldown,
+                      args.interval, args.initial_stress, args.seed, args.chunk, args.trajectory)
+    result["elapsed_sec"] = round(time.perf_counter() - started, 3)
+
+    exit_code = 0
+    if args.check:
+        scalar = scalar_run(tools, args.check_agents, args.steps, args.boss_alertness,
+                            args.boss_alertness_cooldown, args.interval, args.initial_stress, args.seed)
+        mismatches = cross_check(result, scalar, args.agents, args.check_agents)
+        result["check"] = {"scalar": scalar, "agents": args.check_agents, "mismatches": mismatches}
+        exit_code = 1 if mismatches else 0
+
+    if args.json == "-":
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+        print(f"\n소요 시간: {result['elapsed_sec']}초")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        if args.check:
+            if mismatches:
+                print("\n교차 검증 실패:")
+                for m in mismatches: print(f"  - {m}")
+            else:
+                print(f"\n교차 검증 통과 (스칼라 경로 {args.check_agents:,}명과 분포 일치)")
+    sys.exit(exit_code)